@@ -0,0 +1,37 @@
+import datetime
+
+from lobster.core import AdvancedOptions, Category, Config, EmptyDataset, StorageConfiguration, Workflow
+
+version = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+
+storage = StorageConfiguration(
+    output=["file:///tmp/$USER/lobster_bench_" + version]
+)
+
+processing = Category(
+    name='processing',
+    cores=1,
+    runtime=900,
+    memory=1000
+)
+
+workflows = []
+for label, tasks in [('short', 20000), ('medium', 5000), ('long', 1000)]:
+    workflows.append(Workflow(
+        label=label,
+        dataset=EmptyDataset(number_of_tasks=tasks),
+        category=processing,
+        command='true',
+        outputs=[]
+    ))
+
+config = Config(
+    workdir='/tmp/$USER/lobster_bench_' + version,
+    storage=storage,
+    workflows=workflows,
+    advanced=AdvancedOptions(
+        dashboard=False,
+        proxy=False,
+        log_level=1
+    )
+)
@@ -1,8 +1,9 @@
-import datetime
 import imp
 import logging
+import math
 import multiprocessing
 import os
+import threading
 import time
 import traceback
 
@@ -19,23 +20,132 @@ def runplots(plotter, foremen):
         logger.error("plotting failed with: {}. Trace: {}".format(e, traceback.format_exc()))
 
 
+class Chore(object):
+
+    """A recurring housekeeping task.
+
+    The result of the last execution is cached in `value`, together with
+    the time it was obtained in `timestamp`.
+
+    Parameters
+    ----------
+        name : str
+            The name of the chore, used for logging.
+        action : function
+            The function to execute, without arguments.
+        interval : int
+            How often to execute the chore, in seconds.
+        background : bool
+            Execute the chore in a separate thread, without blocking the
+            caller.  Only one execution of the chore is active at any
+            time.
+    """
+
+    def __init__(self, name, action, interval, background=False):
+        self.name = name
+        self.action = action
+        self.interval = interval
+        self.background = background
+        self.value = None
+        self.timestamp = None
+        self.__thread = None
+
+    def __execute(self):
+        try:
+            self.value = self.action()
+            self.timestamp = time.time()
+        except Exception:
+            logger.exception("caught exception while executing chore '{}'".format(self.name))
+
+    def run(self):
+        if not self.background:
+            self.__execute()
+        elif self.__thread and self.__thread.is_alive():
+            logger.debug("chore '{}' still running, skipping".format(self.name))
+        else:
+            self.__thread = threading.Thread(target=self.__execute, name=self.name)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+
+class TimerWheel(object):
+
+    """A hashed timer wheel to execute chores in regular intervals.
+
+    Chores are sorted into slots according to the tick they are due at.
+    Advancing the wheel only inspects the slots of the ticks that have
+    passed since the last advancement.
+
+    Parameters
+    ----------
+        resolution : int
+            The duration of one tick, in seconds.
+        slots : int
+            The number of slots in the wheel.
+    """
+
+    def __init__(self, resolution=1, slots=256):
+        self.__resolution = resolution
+        self.__slots = [[] for _ in range(slots)]
+        self.__tick = self.__ticks(time.time())
+
+    def __ticks(self, timestamp):
+        return int(timestamp / self.__resolution)
+
+    def add(self, chore, delay=None):
+        """Schedule `chore` to be run after `delay` seconds, by default
+        after its interval.
+        """
+        if delay is None:
+            delay = chore.interval
+        due = self.__tick + max(1, int(math.ceil(delay / float(self.__resolution))))
+        self.__slots[due % len(self.__slots)].append((due, chore))
+
+    def advance(self, now=None):
+        """Run all chores that are due, and reschedule them.
+        """
+        now = self.__ticks(now if now is not None else time.time())
+        ticks = range(self.__tick + 1, now + 1)[-len(self.__slots):]
+        self.__tick = now
+
+        due = []
+        for tick in ticks:
+            slot = self.__slots[tick % len(self.__slots)]
+            due += [(t, c) for (t, c) in slot if t <= now]
+            slot[:] = [(t, c) for (t, c) in slot if t > now]
+
+        for _, chore in sorted(due, key=lambda (t, c): t):
+            logger.debug("running chore '{}'".format(chore.name))
+            chore.run()
+            self.add(chore)
+
+
 class Actions(object):
 
     def __init__(self, config, source):
         self.config = config
         self.source = source
+        self.wheel = TimerWheel()
 
         if config.plotdir:
             logger.info('plots in {0} will be updated automatically'.format(config.plotdir))
             if config.foremen_logs:
                 logger.info('foremen logs will be included from: {0}'.format(', '.join(config.foremen_logs)))
             self.plotter = Plotter(config)
+            self.wheel.add(Chore('plotting', self.plot, 15 * 60))
+
+        self.proxy = None
+        if config.advanced.proxy:
+            self.proxy = Chore('proxy', self.check_proxy, 10 * 60, background=True)
+            self.proxy.run()
+            self.wheel.add(self.proxy)
 
-        self.__last = datetime.datetime.now()
-        self.__last_config_update = util.checkpoint(config.workdir, 'configuration_check')
+        self.wheel.add(Chore('configuration', self.update_configuration, 60))
+
+        self.__last_config_update = util.checkpoints(config.workdir).get('configuration_check')
         if not self.__last_config_update:
             self.__last_config_update = time.time()
-            util.register_checkpoint(config.workdir, 'configuration_check', self.__last_config_update)
+            util.checkpoints(config.workdir).set('configuration_check', self.__last_config_update)
 
     def update_configuration(self):
         configfile = os.path.join(self.config.workdir, 'config.py')
@@ -46,7 +156,7 @@ class Actions(object):
                 new_config = imp.load_source('userconfig', configfile).config
                 self.config.update(new_config)
                 self.config.save()
-                util.register_checkpoint(self.config.workdir, 'configuration_check', self.__last_config_update)
+                util.checkpoints(self.config.workdir).set('configuration_check', self.__last_config_update)
             except Exception:
                 logger.exception('failed to update configuration:')
                 util.PartiallyMutable.purge()
@@ -67,23 +177,52 @@ class Actions(object):
                 except Exception:
                     logger.exception("caught exception while executing callback '{}' with arguments {}".format(method, args))
 
+    def check_proxy(self):
+        left = self.config.advanced.proxy.time_left()
+        if 0 < left < 4 * 3600:
+            logger.warn("only {0}:{1:02} left in proxy lifetime!".format(left / 3600, left / 60 % 60))
+        return left
+
+    def proxy_time_left(self):
+        """Returns the proxy lifetime left based on the last check, or
+        `None` if no proxy is used or the lifetime is unknown.
+        """
+        if self.proxy is None or self.proxy.timestamp is None:
+            return None
+        return max(0, int(self.proxy.timestamp + self.proxy.value - time.time()))
+
+    def proxy_expiry(self):
+        """Returns the expiration time of the proxy, as seconds since the
+        epoch, based on the last check.
+        """
+        if self.proxy is None or self.proxy.timestamp is None:
+            return None
+        return int(self.proxy.timestamp + self.proxy.value)
+
+    def plot(self, force=False):
+        if not force and hasattr(self, 'p') and self.p.is_alive():
+            logger.info('plotting still running, skipping')
+        else:
+            if hasattr(self, 'p'):
+                self.p.join()
+            logger.info('starting plotting process')
+            self.p = multiprocessing.Process(target=runplots, args=(self.plotter, self.config.foremen_logs))
+            self.p.start()
+
+    def schedule(self, chore, delay=None):
+        """Add a chore to be executed when taking actions.
+        """
+        self.wheel.add(chore, delay)
+
     def take(self, force=False):
-        self.update_configuration()
+        self.wheel.advance()
 
-        if self.config.advanced.proxy and not self.config.advanced.proxy.check():
+        if self.proxy and self.proxy_time_left() == 0:
             logger.error("proxy expired!")
             from lobster.commands.process import Terminate
             Terminate().kill(self.config)
 
-        now = datetime.datetime.now()
-        if hasattr(self, 'plotter'):
-            if (now - self.__last).seconds > 15 * 60 or force:
-                if not force and hasattr(self, 'p') and self.p.is_alive():
-                    logger.info('plotting still running, skipping')
-                else:
-                    if hasattr(self, 'p'):
-                        self.p.join()
-                    logger.info('starting plotting process')
-                    self.p = multiprocessing.Process(target=runplots, args=(self.plotter, self.config.foremen_logs))
-                    self.p.start()
-                self.__last = now
+        if force:
+            self.update_configuration()
+            if hasattr(self, 'plotter'):
+                self.plot(force)
@@ -57,7 +57,7 @@ def patch_dash(dash):
 class Monitor(object):
 
     def setup(self, config):
-        self._workflowid = util.checkpoint(config.workdir, 'id')
+        self._workflowid = util.checkpoints(config.workdir).get('id')
 
     def generate_ids(self, taskid):
         return "dummy", "dummy"
@@ -152,10 +152,11 @@ class Dashboard(Monitor, util.Configurable):
 
     def setup(self, config):
         super(Dashboard, self).setup(config)
-        if util.checkpoint(config.workdir, "sandbox cmssw version"):
-            self.__cmssw_version = str(util.checkpoint(config.workdir, "sandbox cmssw version"))
-        if util.checkpoint(config.workdir, "executable"):
-            self.__executable = str(util.checkpoint(config.workdir, "executable"))
+        checkpoints = util.checkpoints(config.workdir)
+        if checkpoints.get("sandbox cmssw version"):
+            self.__cmssw_version = str(checkpoints.get("sandbox cmssw version"))
+        if checkpoints.get("executable"):
+            self.__executable = str(checkpoints.get("executable"))
 
     def generate_ids(self, taskid):
         seid = 'https://{}/{}'.format(self._ce, sha1(self._workflowid).hexdigest()[-16:])
@@ -80,8 +80,9 @@ class Dataset(Configurable):
             How many luminosity sections to process in one task.  May be
             modified by Lobster to match the user-specified task runtime.
         events_per_task : int
-            Adjust `lumis_per_task` to contain as many luminosity sections
-            to process the specified amount of events.
+            Fill each task with as many luminosity sections as needed to
+            process the specified amount of events, estimated from the
+            event density of each file.  Overrides `lumis_per_task`.
         lumi_mask : str
             The URL or filename of a JSON luminosity section mask, as
             customary in CMS.
@@ -142,6 +143,7 @@ class Dataset(Configurable):
             res = self.query_database()
 
             if self.events_per_task:
+                res.events_per_task = self.events_per_task
                 if res.total_events > 0:
                     res.tasksize = int(math.ceil(self.events_per_task / float(res.total_events) * res.total_units))
                 else:
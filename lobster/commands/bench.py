@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from lobster import util
+from lobster.cmssw import dash
+from lobster.commands import process
+from lobster.core import source, task, workflow
+from lobster.core.command import Command
+from lobster.sim import work_queue
+
+logger = logging.getLogger('lobster.bench')
+
+
+class Bench(Command):
+
+    @property
+    def help(self):
+        return 'benchmark the throughput of the master against a simulated WorkQueue'
+
+    def setup(self, argparser):
+        argparser.add_argument('--cores', type=int, default=100,
+                               help='how many cores the simulated pool provides')
+        argparser.add_argument('--latency', type=float, default=0.1,
+                               help='how long each task occupies a core, in seconds')
+        argparser.add_argument('--failure-rate', type=float, default=0., dest='failure_rate',
+                               help='the fraction of tasks that fail')
+        argparser.add_argument('--interval', type=int, default=5,
+                               help='how long to wait for tasks to return in each iteration, in seconds')
+        argparser.add_argument('--seed', type=int, default=None,
+                               help='seed for the simulated failures')
+        argparser.add_argument('--wrapper', action='store_true', default=False,
+                               help='benchmark the startup of the task wrapper with a stubbed command instead')
+        argparser.add_argument('--repeat', type=int, default=10,
+                               help='how often to start the task wrapper')
+
+    def run(self, args):
+        if args.wrapper:
+            self.run_wrapper(args)
+            return
+
+        config = args.config
+
+        checkpoints = util.checkpoints(config.workdir)
+        if checkpoints.get('version'):
+            logger.error("the working directory '{0}' is not empty; "
+                         "benchmarks need a fresh project".format(config.workdir))
+            return
+        if not os.path.exists(config.workdir):
+            os.makedirs(config.workdir)
+        checkpoints.set('version', util.get_version())
+
+        work_queue.setup(cores=args.cores, latency=args.latency,
+                         failure_rate=args.failure_rate, seed=args.seed)
+
+        master = process.Process()
+        master.config = config
+        master.interval = args.interval
+        master.interval_minimum = 0
+
+        with work_queue.patch(process, source, task, workflow, dash):
+            start = time.time()
+            master.sprint()
+            elapsed = time.time() - start
+
+        self.report(master, elapsed)
+
+    def report(self, master, elapsed):
+        returned = sum(master.tasks_returned.values())
+        lines = [
+            "ran for {0:.1f} s".format(elapsed),
+            "created {0} tasks, {1:.2f} per second".format(master.tasks_created, master.tasks_created / elapsed),
+            "returned {0} tasks ({1} failed), {2:.2f} per second".format(
+                returned, master.tasks_returned['failed'], returned / elapsed),
+            "peak memory usage {0:.1f} MB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.)
+        ]
+        for label, times in (('process', master.times), ('source', master.source.times)):
+            for phase, value in sorted(times.items(), key=lambda (k, v): -v):
+                lines.append("{0:>8} {1:<10} {2:10.2f} s {3:6.1%}".format(
+                    label, phase, value / 1e6, value / 1e6 / elapsed))
+        logger.info("benchmark summary:\n" + "\n".join(lines))
+
+    def run_wrapper(self, args):
+        """Run the task wrapper with a command that only marks its start,
+        and without inputs or outputs, to measure the fixed overhead of a
+        task.
+        """
+        datadir = os.path.join(os.path.dirname(source.__file__), 'data')
+        parameters = {
+            'mask': {'files': [], 'lumis': None, 'events': None},
+            'monitoring': {'monitorid': None, 'syncid': None, 'taskid': None},
+            'default host': 'localhost',
+            'default ce': 'localhost',
+            'default se': 'localhost',
+            'arguments': [],
+            'output files': [],
+            'want summary': False,
+            'executable': 'touch started',
+            'pset': None,
+            'prologue': None,
+            'epilogue': None,
+            'gridpack': False,
+            'input': [],
+            'output': [],
+            'disable streaming': False
+        }
+
+        startup = []
+        total = []
+        for _ in range(args.repeat):
+            workdir = tempfile.mkdtemp()
+            try:
+                for fn in ('task.py', 'report.json.in'):
+                    shutil.copy(os.path.join(datadir, fn), workdir)
+                with open(os.path.join(workdir, 'parameters.json'), 'w') as f:
+                    json.dump(parameters, f)
+                for fn in ('t_wrapper_start', 't_wrapper_ready'):
+                    with open(os.path.join(workdir, fn), 'w') as f:
+                        f.write('{0}\n'.format(int(time.time())))
+
+                with open(os.devnull, 'w') as devnull:
+                    start = time.time()
+                    subprocess.check_call([sys.executable, 'task.py', 'parameters.json'],
+                                          cwd=workdir, stdout=devnull, stderr=subprocess.STDOUT)
+                    total.append(time.time() - start)
+                startup.append(os.path.getmtime(os.path.join(workdir, 'started')) - start)
+            finally:
+                shutil.rmtree(workdir)
+
+        logger.info("wrapper summary over {0} runs:\n".format(args.repeat) + "\n".join(
+            "{0:>8} mean {1:6.2f} s, min {2:6.2f} s, max {3:6.2f} s".format(
+                label, sum(values) / len(values), min(values), max(values))
+            for label, values in (('startup', startup), ('total', total))))
@@ -1225,6 +1225,20 @@ class Plotter(object):
                     label=[self.wflow_labels[w] for w in wflows]
                 )
 
+                # Only tasks sized by a runtime model carry a prediction
+                if 'runtime_predicted' in tasks.dtype.names:
+                    predicted = tasks[tasks['runtime_predicted'] > 0]
+                    if len(predicted) > 0:
+                        wflows, wtasks = split_by_column(predicted, 'workflow')
+                        self.plot(
+                            [(t['time_retrieved'],
+                              (t['time_epilogue_end'] - t['time_stage_in_end'] - t['runtime_predicted']) * 1. /
+                              t['runtime_predicted']) for t in wtasks],
+                            'runtime prediction error / relative', os.path.join(subdir,
+                                                                                prefix + 'runtime-prediction-error'),
+                            label=[self.wflow_labels[w] for w in wflows]
+                        )
+
                 self.plot(
                     [(tasks['time_retrieved'], tasks['exhausted_attempts'])],
                     'exhausted attempts', os.path.join(
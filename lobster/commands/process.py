@@ -12,9 +12,11 @@ import time
 import traceback
 
 from lobster import actions, util
+from lobster.commands.profiling import Profile, Profiler
 from lobster.commands.status import Status
 from lobster.core.command import Command
 from lobster.core.source import TaskProvider
+from lobster.monitor.metrics import Sample
 
 import work_queue as wq
 
@@ -37,7 +39,9 @@ class Terminate(Command):
         logger.info("setting flag to quit at the next checkpoint")
         logger.debug("the following stack trace doesn't indicate a crash; it's just for debugging purposes.")
         logger.debug("stack:\n{0}".format(''.join(traceback.format_stack())))
-        util.register_checkpoint(config.workdir, 'KILLED', 'PENDING')
+        checkpoints = util.checkpoints(config.workdir)
+        checkpoints.set('KILLED', 'PENDING')
+        checkpoints.raise_flag('KILLED')
 
         if config.elk:
             config.elk.end()
@@ -45,6 +49,11 @@ class Terminate(Command):
 
 class Process(Command, util.Timing):
 
+    # time in seconds to wait for WQ to return tasks, with minimum wait
+    # time in case no more tasks are waiting
+    interval = 120
+    interval_minimum = 30
+
     def __init__(self):
         util.Timing.__init__(self, 'action', 'create', 'fetch', 'return', 'status', 'update')
 
@@ -74,7 +83,8 @@ class Process(Command, util.Timing):
                     ["#timestamp", "units_left"] +
                     ["total_{}_time".format(k) for k in sorted(self.times.keys())] +
                     ["total_source_{}_time".format(k) for k in sorted(self.source.times.keys())] +
-                    self.log_attributes
+                    self.log_attributes +
+                    ["eviction_scale", "eviction_loss"]
                 ) + "\n"
             )
 
@@ -85,13 +95,20 @@ class Process(Command, util.Timing):
         else:
             stats = self.queue.stats_category(category)
 
+        # the smallest task size scale and largest expected loss of
+        # runtime due to evictions of the workflows in the category
+        labels = [w.label for w in self.config.workflows if category in ('all', w.category.name)]
+        estimates = [(scale, loss) for (label, scale, loss) in self.source.eviction_estimates() if label in labels]
+
         with open(filename, "a") as statsfile:
             now = datetime.datetime.now()
             statsfile.write(" ".join(map(str,
                                          [int(int(now.strftime('%s')) * 1e6 + now.microsecond), left] +
                                          [self.times[k] for k in sorted(self.times.keys())] +
                                          [self.source.times[k] for k in sorted(self.source.times.keys())] +
-                                         [getattr(stats, a) for a in self.log_attributes]
+                                         [getattr(stats, a) for a in self.log_attributes] +
+                                         [min([s for s, _ in estimates] or [1.]),
+                                          max([l for _, l in estimates] or [0.])]
                                          )) + "\n"
                             )
 
@@ -99,6 +116,41 @@ class Process(Command, util.Timing):
             stats = self.queue.stats_hierarchy
             self.config.elk.index_stats(now, left, self.times, self.log_attributes, stats, category)
 
+    def export(self, categories, units_left, tasks_left):
+        sample = Sample()
+        sample.add('lobster_units_left', units_left, doc='Units left to process.')
+        sample.add('lobster_tasks_left', tasks_left, doc='Estimated tasks left to create.')
+        sample.add('lobster_tasks_created_total', self.tasks_created, kind='counter',
+                   doc='Tasks created and submitted to WorkQueue.')
+        for status in ('successful', 'failed'):
+            sample.add('lobster_tasks_returned_total', self.tasks_returned[status], {'status': status},
+                       kind='counter', doc='Tasks returned by WorkQueue.')
+
+        for source, times in (('process', self.times), ('source', self.source.times)):
+            for phase, value in sorted(times.items()):
+                sample.add('lobster_time_microseconds_total', value, {'source': source, 'phase': phase},
+                           kind='counter', doc='Cumulative time spent in each phase of the main loop.')
+
+        for (label, tasksize, units, masked, running, done, stuck, available, left) in self.source.workflow_units():
+            sample.add('lobster_workflow_tasksize', tasksize, {'workflow': label}, doc='Units per task.')
+            for state, value in (('total', units), ('masked', masked), ('running', running), ('done', done),
+                                 ('stuck', stuck), ('available', available), ('left', left)):
+                sample.add('lobster_workflow_units', value, {'workflow': label, 'state': state},
+                           doc='Units per workflow and state.')
+
+        for category in categories + ['all']:
+            if category == 'all':
+                stats = self.queue.stats_hierarchy
+            else:
+                stats = self.queue.stats_category(category)
+            for attr in self.log_attributes:
+                value = getattr(stats, attr)
+                if isinstance(value, (int, long, float)):
+                    sample.add('lobster_wq_' + attr, value, {'category': category},
+                               doc='WorkQueue statistics field {0}.'.format(attr))
+
+        self.config.metrics.publish(sample)
+
     def setup(self, argparser):
         argparser.add_argument('--finalize', action='store_true', default=False,
                                help='do not process any additional data; wrap project up by merging everything')
@@ -117,9 +169,9 @@ class Process(Command, util.Timing):
         if not os.path.exists(self.config.workdir):
             os.makedirs(self.config.workdir)
 
-        if not util.checkpoint(self.config.workdir, "version"):
-            util.register_checkpoint(
-                self.config.workdir, "version", util.get_version())
+        checkpoints = util.checkpoints(self.config.workdir)
+        if not checkpoints.get("version"):
+            checkpoints.set("version", util.get_version())
         else:
             util.verify(self.config.workdir)
 
@@ -136,9 +188,17 @@ class Process(Command, util.Timing):
         def localkill(num, frame):
             Terminate().run(args)
 
+        def localprofile(num, frame):
+            Profile().start(args.config)
+
+        def localprofilestop(num, frame):
+            Profile().stop(args.config)
+
         signals = daemon.daemon.make_default_signal_map()
         signals[signal.SIGINT] = localkill
         signals[signal.SIGTERM] = localkill
+        signals[signal.SIGUSR1] = localprofile
+        signals[signal.SIGUSR2] = localprofilestop
 
         process = psutil.Process()
         preserved = [f.name for f in args.preserve]
@@ -200,7 +260,10 @@ class Process(Command, util.Timing):
         self.queue.specify_keepalive_timeout(300)
         # self.queue.tune("short-timeout", 600)
         self.queue.tune("transfer-outlier-factor", 4)
-        self.queue.specify_algorithm(wq.WORK_QUEUE_SCHEDULE_RAND)
+        if self.config.advanced.locality:
+            self.queue.specify_algorithm(wq.WORK_QUEUE_SCHEDULE_FILES)
+        else:
+            self.queue.specify_algorithm(wq.WORK_QUEUE_SCHEDULE_RAND)
         if self.config.advanced.full_monitoring:
             self.queue.enable_monitoring_full(None)
         else:
@@ -214,18 +277,27 @@ class Process(Command, util.Timing):
 
         wq_max_retries = self.config.advanced.wq_max_retries
 
-        if util.checkpoint(self.config.workdir, 'KILLED') == 'PENDING':
-            util.register_checkpoint(self.config.workdir, 'KILLED', 'RESTART')
+        checkpoints = util.checkpoints(self.config.workdir)
+        if checkpoints.get('KILLED') == 'PENDING':
+            checkpoints.set('KILLED', 'RESTART')
+        checkpoints.lower_flag('KILLED')
+
+        profiler = Profiler(self.config.workdir)
+        if checkpoints.get('PROFILE') == 'RUNNING':
+            checkpoints.set('PROFILE', 'PENDING')
 
-        # time in seconds to wait for WQ to return tasks, with minimum wait
-        # time in case no more tasks are waiting
-        interval = 120
-        interval_minimum = 30
+        interval = self.interval
+        interval_minimum = self.interval_minimum
 
         tasks_left = 0
         units_left = 0
         successful_tasks = 0
 
+        self.tasks_created = 0
+        self.tasks_returned = {'successful': 0, 'failed': 0}
+        if self.config.metrics:
+            self.config.metrics.start()
+
         categories = []
 
         self.setup_logging('all')
@@ -248,6 +320,8 @@ class Process(Command, util.Timing):
 
         proxy_email_sent = False
         while not self.source.done():
+            profiler.step()
+
             with self.measure('status'):
                 tasks_left = self.source.tasks_left()
                 units_left = self.source.work_left()
@@ -258,9 +332,12 @@ class Process(Command, util.Timing):
                 for c in categories + ['all']:
                     self.log(c, units_left)
 
-                if util.checkpoint(self.config.workdir, 'KILLED') == 'PENDING':
-                    util.register_checkpoint(
-                        self.config.workdir, 'KILLED', str(datetime.datetime.utcnow()))
+                if self.config.metrics:
+                    self.export(categories, units_left, tasks_left)
+
+                if checkpoints.flagged('KILLED'):
+                    checkpoints.set('KILLED', str(datetime.datetime.utcnow()))
+                    checkpoints.lower_flag('KILLED')
 
                     # let the task source shut down gracefully
                     logger.info("terminating task source")
@@ -277,20 +354,20 @@ class Process(Command, util.Timing):
                 stats = self.queue.stats_hierarchy
                 tasks = self.source.obtain(stats.total_cores, have)
 
-                expiry = None
-                if self.config.advanced.proxy:
-                    expiry = self.config.advanced.proxy.expires()
-                    proxy_time_left = self.config.advanced.proxy.time_left()
+                expiry = action.proxy_expiry()
+                proxy_time_left = action.proxy_time_left()
+                if proxy_time_left is not None:
                     if proxy_time_left >= 24 * 3600:
                         proxy_email_sent = False
                     if proxy_time_left < 24 * 3600 and not proxy_email_sent:
                         util.sendemail("Your proxy is about to expire.\n" + "Timeleft: " + str(datetime.timedelta(seconds=proxy_time_left)), self.config)
                         proxy_email_sent = True
 
-                for category, cmd, id, inputs, outputs, env, dir in tasks:
+                for category, cmd, id, inputs, outputs, env, dir, priority in tasks:
                     task = wq.Task(cmd)
                     task.specify_category(category)
                     task.specify_tag(id)
+                    task.specify_priority(priority)
                     task.specify_max_retries(wq_max_retries)
                     task.specify_monitor_output(os.path.join(dir, 'resource_monitor'))
 
@@ -311,6 +388,7 @@ class Process(Command, util.Timing):
                     if expiry:
                         task.specify_end_time(expiry * 10 ** 6)
                     self.queue.submit(task)
+                    self.tasks_created += 1
 
             with self.measure('status'):
                 stats = self.queue.stats_hierarchy
@@ -338,10 +416,13 @@ class Process(Command, util.Timing):
                 while task:
                     if task.return_status == 0:
                         successful_tasks += 1
-                    elif task.return_status in self.config.advanced.bad_exit_codes:
-                        logger.warning(
-                            "blacklisting host {0} due to bad exit code from task {1}".format(task.hostname, task.tag))
-                        self.queue.blacklist(task.hostname)
+                        self.tasks_returned['successful'] += 1
+                    else:
+                        self.tasks_returned['failed'] += 1
+                        if task.return_status in self.config.advanced.bad_exit_codes:
+                            logger.warning(
+                                "blacklisting host {0} due to bad exit code from task {1}".format(task.hostname, task.tag))
+                            self.queue.blacklist(task.hostname)
                     tasks.append(task)
 
                     remaining = int(starttime + interval - time.time())
@@ -360,6 +441,8 @@ class Process(Command, util.Timing):
                 try:
                     with self.measure('return'):
                         self.source.release(tasks)
+                        self.source.cancel(self.queue)
+                        self.source.blacklist(self.queue)
                 except Exception:
                     tb = traceback.format_exc()
                     logger.critical("cannot recover from the following exception:\n" + tb)
@@ -368,6 +451,10 @@ class Process(Command, util.Timing):
                         logger.critical(
                             "tried to return task {0} from {1}".format(task.tag, task.hostname))
                     raise
+        profiler.dump()
+        if self.config.metrics:
+            self.config.metrics.stop()
+
         if units_left == 0:
             logger.info("no more work left to do")
             util.sendemail("Your Lobster project is done!", self.config)
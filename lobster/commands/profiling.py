@@ -0,0 +1,133 @@
+import cProfile
+import datetime
+import glob
+import logging
+import os
+import pstats
+import sys
+import time
+
+from lobster import util
+from lobster.core.command import Command
+
+logger = logging.getLogger('lobster.profile')
+
+
+class Profiler(object):
+
+    """Profile the main loop of a running Lobster instance on demand.
+
+    Profiling is switched on and off via the `PROFILE` checkpoint in the
+    working directory, similar to the way termination is handled.  Once
+    started, `cProfile` is active for a number of loop iterations, after
+    which the collected statistics are written to the `profile`
+    subdirectory of the working directory.
+
+    Parameters
+    ----------
+        workdir : str
+            The working directory of the project.
+        interval : int
+            How often to check the checkpoint for changes, in seconds.
+    """
+
+    def __init__(self, workdir, interval=30):
+        self.__workdir = workdir
+        self.__interval = interval
+        self.__checked = 0
+        self.__profile = None
+        self.__iterations = 0
+        self.__limit = 0
+
+    @property
+    def active(self):
+        return self.__profile is not None
+
+    def step(self):
+        """Advance the profiler by one loop iteration.
+
+        Starts or stops the profiling according to the checkpoint, and
+        dumps the statistics when the requested number of iterations has
+        been profiled.
+        """
+        state = None
+        if time.time() - self.__checked > self.__interval:
+            state = util.checkpoints(self.__workdir).get('PROFILE')
+            self.__checked = time.time()
+
+        if state == 'PENDING' and not self.active:
+            self.__limit = int(util.checkpoints(self.__workdir).get('PROFILE ITERATIONS', 10))
+            self.__iterations = 0
+            logger.info("profiling the next {0} iterations".format(self.__limit))
+            util.checkpoints(self.__workdir).set('PROFILE', 'RUNNING')
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+        elif self.active:
+            self.__iterations += 1
+            if state == 'STOP' or self.__iterations >= self.__limit:
+                self.dump()
+
+    def dump(self):
+        """Stop profiling and save the statistics collected so far.
+        """
+        if not self.active:
+            return
+        self.__profile.disable()
+
+        outdir = os.path.join(self.__workdir, 'profile')
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+        outfile = os.path.join(outdir, datetime.datetime.now().strftime('lobster_%Y%m%d_%H%M%S.pstats'))
+        self.__profile.dump_stats(outfile)
+        self.__profile = None
+
+        logger.info("saved profile of {0} iterations to {1}".format(self.__iterations, outfile))
+        util.checkpoints(self.__workdir).set('PROFILE', 'DONE')
+
+
+class Profile(Command):
+
+    @property
+    def help(self):
+        return 'profile the main loop of a running lobster instance'
+
+    def setup(self, argparser):
+        argparser.add_argument('action', choices=['start', 'stop', 'report'],
+                               help='start or stop profiling, or print a report of the latest profile')
+        argparser.add_argument('--iterations', type=int, default=10,
+                               help='how many iterations of the main loop to profile')
+        argparser.add_argument('--sort', default='cumulative',
+                               help='the key to sort the report by')
+        argparser.add_argument('--limit', type=int, default=40,
+                               help='how many functions to include in the report')
+
+    def start(self, config, iterations=10):
+        logger.info("setting flag to profile {0} iterations at the next checkpoint".format(iterations))
+        checkpoints = util.checkpoints(config.workdir)
+        checkpoints.set('PROFILE ITERATIONS', iterations)
+        checkpoints.set('PROFILE', 'PENDING')
+
+    def stop(self, config):
+        checkpoints = util.checkpoints(config.workdir)
+        if checkpoints.get('PROFILE') in ('PENDING', 'RUNNING'):
+            logger.info("setting flag to stop profiling at the next checkpoint")
+            checkpoints.set('PROFILE', 'STOP')
+        else:
+            logger.info("not profiling")
+
+    def report(self, config, sort, limit):
+        profiles = sorted(glob.glob(os.path.join(config.workdir, 'profile', '*.pstats')))
+        if len(profiles) == 0:
+            logger.error("no profiles found in {0}".format(os.path.join(config.workdir, 'profile')))
+            return
+        logger.info("reporting on {0}".format(profiles[-1]))
+        stats = pstats.Stats(profiles[-1], stream=sys.stdout)
+        stats.sort_stats(sort).print_stats(limit)
+
+    def run(self, args):
+        if args.action == 'start':
+            self.start(args.config, args.iterations)
+        elif args.action == 'stop':
+            self.stop(args.config)
+        else:
+            self.report(args.config, args.sort, args.limit)
@@ -0,0 +1,73 @@
+import json
+import logging
+
+from lobster.core.command import Command
+from lobster.sim.simulator import Pool, Runtime, Simulation
+
+logger = logging.getLogger('lobster.sim')
+
+
+class Simulate(Command):
+
+    @property
+    def help(self):
+        return 'simulate the task scheduling of a configuration on a virtual worker pool'
+
+    def setup(self, argparser):
+        pool = argparser.add_argument_group('worker pool')
+        pool.add_argument('--workers', type=int, default=100,
+                          help='how many workers make up the pool')
+        pool.add_argument('--cores', type=int, default=4,
+                          help='how many cores each worker has')
+        pool.add_argument('--ramp', type=float, default=600.,
+                          help='time over which the workers join initially, in seconds')
+        pool.add_argument('--lifetime', type=float, default=None,
+                          help='mean lifetime of a worker before eviction, in seconds')
+        pool.add_argument('--rejoin', type=float, default=300.,
+                          help='time after which evicted workers are replaced, in seconds')
+        pool.add_argument('--speed-spread', type=float, default=0., dest='speed_spread',
+                          help='log-normal spread of the worker speeds')
+        pool.add_argument('--failure-rate', type=float, default=0., dest='failure_rate',
+                          help='the fraction of tasks that fail')
+        pool.add_argument('--black-holes', type=float, default=0., dest='black_holes',
+                          help='the fraction of workers that fail all their tasks')
+
+        runtime = argparser.add_argument_group('unit runtime')
+        runtime.add_argument('--unit-time', type=float, default=60., dest='unit_time',
+                             help='mean runtime of a unit, in seconds')
+        runtime.add_argument('--event-time', type=float, default=None, dest='event_time',
+                             help='mean runtime of an event, in seconds, for units with known events')
+        runtime.add_argument('--spread', type=float, default=0.,
+                             help='log-normal spread of the unit runtimes')
+        runtime.add_argument('--overhead', type=float, default=0.,
+                             help='constant runtime of each task, in seconds')
+        runtime.add_argument('--poison', type=float, default=0.,
+                             help='the fraction of units that always fail')
+
+        argparser.add_argument('--interval', type=float, default=60.,
+                               help='time between iterations of the main loop, in seconds')
+        argparser.add_argument('--until', type=float, default=None,
+                               help='maximum time to simulate, in seconds')
+        argparser.add_argument('--seed', type=int, default=None,
+                               help='seed for the random number generator')
+        argparser.add_argument('--output', default=None,
+                               help='save the results as JSON to this file')
+
+    def run(self, args):
+        pool = Pool(workers=args.workers, cores=args.cores, ramp=args.ramp, lifetime=args.lifetime,
+                    rejoin=args.rejoin, speed_spread=args.speed_spread, failure_rate=args.failure_rate,
+                    black_holes=args.black_holes)
+        runtime = Runtime(unit_time=args.unit_time, event_time=args.event_time,
+                          spread=args.spread, overhead=args.overhead, poison=args.poison)
+
+        sim = Simulation(args.config, pool, runtime, interval=args.interval, seed=args.seed)
+        try:
+            report = sim.run(until=args.until)
+        finally:
+            sim.cleanup()
+
+        logger.info("simulation summary:\n" + Simulation.format(report))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
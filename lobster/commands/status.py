@@ -1,7 +1,7 @@
 import logging
 import os
 from lobster import util
-from lobster.core import unit
+from lobster.core import failure, unit
 from lobster.core.command import Command
 
 
@@ -38,6 +38,29 @@ class Status(Command):
 
         logger.info("workflow summary:\n" + report)
 
+        failures = store.failure_summary()
+        if len(failures) > 0:
+            msg = "failed tasks by class:"
+            for kind, tasks, hours in failures:
+                msg += "\n{0:<15} {1:>8} tasks {2:>10.1f} core hours".format(
+                    failure.NAMES.get(kind, kind), tasks, hours or 0.)
+            logger.info(msg)
+
+            # units failing deterministically are given up after
+            # `threshold_for_deterministic_failure` instead of
+            # `threshold_for_failure` attempts: estimate the core hours
+            # the omitted attempts would have taken from the cost of the
+            # last attempt of the units given up
+            advanced = config.advanced
+            omitted = advanced.threshold_for_failure - advanced.threshold_for_deterministic_failure
+            saved = 0.
+            for wflow in config.workflows:
+                units, hours = store.deterministic_units(wflow.label)
+                saved += units * hours * omitted
+            if saved > 0:
+                logger.info("estimated core hours saved by giving up deterministic failures early: {0:.1f}".format(
+                    saved))
+
         wdir = config.workdir
         for wflow in config.workflows:
             tasks = store.failed_units(wflow.label)
@@ -82,12 +82,19 @@ class Config(Configurable):
             A directory to store monitoring pages in.
         foremen_logs : list
             A list of :class:`str` pointing to the `WorkQueue` foremen logs.
+        elk : ElkInterface
+            Enables ELK stack monitoring, see
+            :class:`~lobster.monitor.elk.ElkInterface`.
+        metrics : MetricsExporter
+            Exports live metrics in the Prometheus text format, see
+            :class:`~lobster.monitor.metrics.MetricsExporter`.
     """
 
     _mutable = {}
 
     def __init__(self, workdir, storage, workflows, label=None, advanced=None, plotdir=None, foremen_logs=None,
-                 base_directory=None, base_configuration=None, startup_directory=None, elk=None):
+                 base_directory=None, base_configuration=None, startup_directory=None, elk=None,
+                 metrics=None):
         """
         Top-level configuration object for Lobster
         """
@@ -105,6 +112,7 @@ class Config(Configurable):
         self.workflows = Items(workflows, key=lambda w: w.label)
         self.advanced = advanced if advanced else AdvancedOptions()
         self.elk = elk
+        self.metrics = metrics
 
         cats = list(set([w.category for w in workflows])) + [Category(name='merge', cores=1)]
         self.categories = Items(cats, key=lambda c: c.name)
@@ -152,9 +160,14 @@ class AdvancedOptions(Configurable):
 
     Attributes modifiable at runtime:
 
+    * `blacklist_timeout`
+    * `diagnostics`
     * `payload`
+    * `speculation`
+    * `threshold_for_deterministic_failure`
     * `threshold_for_failure`
     * `threshold_for_skipping`
+    * `threshold_for_transient_failure`
 
     Parameters
     ----------
@@ -169,15 +182,31 @@ class AdvancedOptions(Configurable):
             workers.  As soon as a task returns with an exit code from this
             list, the worker it ran on will be blacklisted and no more
             tasks send to it.
+        blacklist_timeout : int
+            How long to blacklist hosts for, in seconds, when their rate of
+            failures or input access failures, or their task runtimes, are
+            significantly worse than in the rest of the pool.  Failures of
+            tasks on blacklisted hosts are not counted against units, unless
+            caused by the units, e.g., by exceeding resources or known
+            payload errors.  Set to 0 to disable.
         dashboard : :class:`~lobster.cmssw.Dashboard`
             Use the CMS dashboard to report task status.  Set or `False` to
             disable.
+        diagnostics : bool
+            Have tasks collect diagnostics about the worker host, i.e., a
+            traceroute, the CPU information, and the machine load.  Adds to
+            the startup time of every task.
         dump_core : bool
             Produce core dumps.  Useful to debug `WorkQueue`.
         email : str
             The email address you want to receive emails from Lobster.
         full_monitoring : bool
             Produce full monitoring output.  Useful to debug `WorkQueue`.
+        locality : bool
+            Prefer to send tasks to the workers that recently processed
+            their input files or gridpacks, so that the input can be read
+            from the cache of the worker.  Switches the scheduling of Work
+            Queue from random to the `files` algorithm.
         log_level : int
             How much logging output to show.  Goes from 1 to 5, where 1 is
             the most verbose (including a lot of debug output), and 5 is
@@ -191,12 +220,37 @@ class AdvancedOptions(Configurable):
         proxy : :class:`~lobster.cmssw.Proxy`
             An authentication mechanism to access data.  Set to `False` to
             disable.
+        sandbox_cache : int
+            How much disk space, in MB, the unpacked sandboxes shared by the
+            tasks on a worker may take up.  The least recently used
+            sandboxes not in use are removed when exceeding this.  Set to 0
+            to unpack the sandbox separately for every task.
+        speculation : bool
+            Duplicate the oldest running tasks of a workflow when all its
+            remaining units are being processed and cores are idle.  The
+            copy finishing first is used, and the other one cancelled.
+        threshold_for_deterministic_failure : int
+            How often a single unit may fail to be processed with an error
+            that is known to not go away when retrying, e.g., a missing
+            product or a configuration error, before Lobster will not
+            attempt to process it any longer.
         threshold_for_failure : int
             How often a single unit may fail to be processed before Lobster
-            will not attempt to process it any longer.
+            will not attempt to process it any longer.  Units of tasks that
+            exceed their runtime, memory, or disk limits, or that fail
+            for other reasons than the infrastructure, are retried in tasks
+            of half the size, and only count as failed once they fail on
+            their own.  Failures of the infrastructure, like evictions or
+            stage-out errors, are not counted, but limited by
+            `threshold_for_transient_failure`.
         threshold_for_skipping : int
             How often a single file may fail to be accessed before Lobster
             will not attempt to process it any longer.
+        threshold_for_transient_failure : int
+            How often a single unit may fail to be processed due to
+            failures of the infrastructure, like evictions or stage-in and
+            stage-out errors, before Lobster will not attempt to process it
+            any longer.
         wq_max_retries : int
             How often `WorkQueue` will attempt to process a task before
             handing it back to Lobster.  `WorkQueue` will only reprocess
@@ -211,9 +265,14 @@ class AdvancedOptions(Configurable):
 
     _mutable = {
         'bad_exit_codes': (None, [], False),
+        'blacklist_timeout': (None, [], False),
+        'diagnostics': (None, [], False),
         'payload': (None, [], False),
+        'speculation': (None, [], False),
+        'threshold_for_deterministic_failure': (None, [], False),
         'threshold_for_failure': ('source.update_stuck', [], False),
         'threshold_for_skipping': ('source.update_stuck', [], False),
+        'threshold_for_transient_failure': (None, [], False),
         'xrootd_servers': ('source.copy_siteconf', [], False)
     }
 
@@ -221,16 +280,23 @@ class AdvancedOptions(Configurable):
                  abort_threshold=10,
                  abort_multiplier=4,
                  bad_exit_codes=None,
+                 blacklist_timeout=3600,
                  dashboard=None,
+                 diagnostics=False,
                  dump_core=False,
                  email=None,
                  full_monitoring=False,
+                 locality=False,
                  log_level=2,
                  osg_version=None,
                  payload=10,
                  proxy=None,
+                 sandbox_cache=10000,
+                 speculation=True,
+                 threshold_for_deterministic_failure=2,
                  threshold_for_failure=30,
                  threshold_for_skipping=30,
+                 threshold_for_transient_failure=100,
                  wq_max_retries=10,
                  wq_port=-1,
                  xrootd_servers=None):
@@ -247,19 +313,26 @@ class AdvancedOptions(Configurable):
         self.abort_threshold = abort_threshold
         self.abort_multiplier = abort_multiplier
         self.bad_exit_codes = bad_exit_codes if bad_exit_codes else [169]
+        self.blacklist_timeout = blacklist_timeout
         self.dashboard = dashboard
         if dashboard is None:
             self.dashboard = cmssw.Dashboard()
         elif not dashboard:
             self.dashboard = cmssw.Monitor()
+        self.diagnostics = diagnostics
         self.dump_core = dump_core
         self.email = email
         self.full_monitoring = full_monitoring
+        self.locality = locality
         self.log_level = log_level
         self.payload = payload
         self.proxy = proxy if proxy is not None else cmssw.Proxy()
+        self.sandbox_cache = sandbox_cache
+        self.speculation = speculation
+        self.threshold_for_deterministic_failure = threshold_for_deterministic_failure
         self.threshold_for_failure = threshold_for_failure
         self.threshold_for_skipping = threshold_for_skipping
+        self.threshold_for_transient_failure = threshold_for_transient_failure
         self.wq_max_retries = wq_max_retries
         self.wq_port = wq_port
         self.xrootd_servers = xrootd_servers if xrootd_servers else ['cmsxrootd.fnal.gov']
@@ -2,6 +2,9 @@ from collections import defaultdict
 
 import logging
 import math
+import time
+
+from lobster import util
 
 logger = logging.getLogger('lobster.algo')
 
@@ -12,7 +15,10 @@ class Algo(object):
 
     Attempts to be fair when creating tasks by making sure that tasks are
     created evenly for every category and every workflow in each category
-    based on the remaining work per workflow and cores used.
+    based on the remaining work per workflow and cores used, weighted by
+    the priorities of workflows and categories.  Workflows with a deadline
+    are guaranteed enough cores to finish in time, as far as the estimate
+    of their remaining runtime allows.
 
     Parameters
     ----------
@@ -22,8 +28,107 @@ class Algo(object):
 
     def __init__(self, config):
         self.__config = config
+        self.__late = set()
+        self.__urgent = set()
+        self.__top = 0
+
+    def __deadline(self, wflow):
+        deadline = wflow.deadline if wflow.deadline is not None else wflow.category.deadline
+        try:
+            return util.parse_deadline(deadline)
+        except ValueError as e:
+            logger.error("ignoring deadline of {0}: {1}".format(wflow.label, e))
+            return None
+
+    def shares(self, cores, workloads, remaining, now):
+        """Split cores between workflows.
+
+        Workflows with a deadline are reserved the cores they need to
+        process their remaining work in time, if that exceeds their fair
+        share.  Until the remaining work of a workflow can be estimated,
+        i.e., before the first tasks finish when no runtime is set for its
+        category, it is reserved as many cores as it can use.  The other workflows share the remaining cores in proportion
+        to their workload, weighted by their priority and the priority of
+        their category.
 
-    def run(self, total_cores, queued, remaining):
+        Parameters
+        ----------
+            cores : int
+                The number of cores to split.
+            workloads : dict
+                A dictionary with workflows as keys and the number of cores
+                the available tasks of the workflow would occupy as values.
+            remaining : dict
+                The remaining work of the workflows, as passed to
+                :meth:`run`.
+            now : float
+                The current time in seconds since the epoch.
+
+        Returns
+        -------
+            shares : dict
+                A dictionary with workflows as keys and the number of cores
+                allotted as values.
+        """
+        reserved = {}
+        for wflow, workload in workloads.items():
+            deadline = self.__deadline(wflow)
+            time_left = remaining[wflow][3]
+            if deadline is None:
+                continue
+            if deadline <= now or time_left is None:
+                # Without an estimate of the remaining work, err on the
+                # side of meeting the deadline
+                needed = workload
+            else:
+                needed = (wflow.category.cores or 1) * time_left / (deadline - now)
+            reserved[wflow] = min(needed, workload)
+
+        total_reserved = sum(reserved.values())
+        if total_reserved > cores:
+            for wflow in reserved:
+                if wflow.label not in self.__late:
+                    logger.warning("not enough cores to meet the deadline of {0}".format(wflow.label))
+                    self.__late.add(wflow.label)
+                reserved[wflow] *= cores / float(total_reserved)
+
+        weights = dict((w, max(0, w.priority * w.category.priority) * workload) for w, workload in workloads.items())
+
+        # Fix the share of workflows with deadlines that need more than
+        # their fair share, and distribute the remainder among the others
+        fixed = {}
+        while True:
+            free = cores - sum(fixed.values())
+            total_weight = sum(weight for w, weight in weights.items() if w not in fixed)
+            needy = [w for w, need in reserved.items()
+                     if w not in fixed and (total_weight == 0 or need > free * weights[w] / total_weight)]
+            if not needy:
+                break
+            for wflow in needy:
+                fixed[wflow] = reserved[wflow]
+
+        shares = dict(fixed)
+        for wflow, weight in weights.items():
+            if wflow not in fixed:
+                shares[wflow] = free * weight / total_weight if total_weight > 0 else 0.
+
+        self.__urgent = set(w.label for w in fixed)
+        self.__top = max(w.priority * w.category.priority for w in workloads)
+        return shares
+
+    def priority(self, wflow):
+        """The priority of new tasks of a workflow in the queue.
+
+        The product of the workflow and category priorities.  Workflows
+        that need more than their fair share of cores to meet their
+        deadline take precedence over all others.
+        """
+        priority = wflow.priority * wflow.category.priority
+        if wflow.label in self.__urgent:
+            priority += self.__top
+        return priority
+
+    def run(self, total_cores, queued, remaining, now=None):
         """Run the task creation algorithm.
 
         If not enough tasks can be created for a workflow, the available
@@ -32,13 +137,14 @@ class Algo(object):
 
         Steps
         -----
-        1. Calculate remaining workload, weighed by cores, per category
+        1. Calculate remaining workload, weighed by cores, per workflow
         2. Determine how many cores need to be filled
-        3. Go through workflows:
-           1. Determine the fraction of category workload versus the total
-              workload
-           2. Do the same for the workflow workload versus the category
-              workload
+        3. Split these cores between workflows, see :meth:`shares`
+        4. Go through workflows:
+           1. Determine the fraction of the cores allotted to the category
+              versus the total
+           2. Do the same for the cores allotted to the workflow versus
+              the category
            3. Use the first fraction to calculate how many tasks should be
               created for the category
            4. Adjust for mininum queued and maximum total task requirements
@@ -65,6 +171,11 @@ class Algo(object):
                 * if all units for the workflow are available
                 * how many units are left to process
                 * how many tasks can still be created with the default size
+                * the estimated runtime of the units left, in seconds, or
+                  `None`
+            now : float
+                The current time in seconds since the epoch, to compare
+                deadlines with.  Defaults to the current system time.
 
         Returns
         -------
@@ -72,16 +183,19 @@ class Algo(object):
                 A list containing workflow label, how many tasks to create,
                 and the task taper adjustment.
         """
+        if now is None:
+            now = time.time()
+
         # Remaining workload
-        workloads = defaultdict(int)
-        for wflow, (complete, units, tasks) in remaining.items():
+        workloads = {}
+        for wflow, (complete, units, tasks, time_left) in remaining.items():
             if not complete and tasks < 1.:
                 logger.debug("workflow {} has not enough units available to form new tasks".format(wflow.label))
                 continue
             elif units == 0:
                 continue
             task_cores = wflow.category.cores or 1
-            workloads[wflow.category.name] += task_cores * tasks
+            workloads[wflow] = task_cores * tasks
 
         # How many cores we need to occupy: have at least 10% of the
         # available cores provisioned with waiting work
@@ -91,14 +205,19 @@ class Algo(object):
         if total_workload == 0:
             return []
 
+        shares = self.shares(fill_cores, workloads, remaining, now)
+        category_shares = defaultdict(float)
+        for wflow, share in shares.items():
+            category_shares[wflow.category.name] += share
+
         # contains (workflow label, tasks, taper)
         data = []
-        for wflow, (complete, units, tasks) in remaining.items():
-            if not complete and tasks < 1. or units == 0:
+        for wflow, (complete, units, tasks, time_left) in remaining.items():
+            if wflow not in shares or category_shares[wflow.category.name] == 0:
                 continue
             task_cores = wflow.category.cores or 1
-            category_fraction = workloads[wflow.category.name] / float(total_workload)
-            workflow_fraction = task_cores * tasks / float(workloads[wflow.category.name])
+            category_fraction = category_shares[wflow.category.name] / float(fill_cores)
+            workflow_fraction = shares[wflow] / category_shares[wflow.category.name]
 
             needed_category_tasks = category_fraction * fill_cores / task_cores
 
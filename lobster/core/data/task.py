@@ -3,8 +3,11 @@
 from collections import defaultdict, Counter
 from contextlib import contextmanager
 from datetime import datetime
-import atexit
+from multiprocessing.pool import ThreadPool
+import errno
+import fcntl
 import gzip
+import hashlib
 import json
 import logging
 import os
@@ -16,38 +19,54 @@ import socket
 import subprocess
 import sys
 import tempfile
+import threading
 import time
 import traceback
 import xml.dom.minidom
+import zlib
 
 sys.path.append('python')
 
-from WMCore.DataStructs.LumiList import LumiList
-from WMCore.FwkJobReport.Report import Report
-from WMCore.Services.Dashboard.DashboardAPI import DashboardAPI
-from WMCore.Storage.SiteLocalConfig import loadSiteLocalConfig
+# ROOT and WMCore take long to import, and are only imported on the code
+# paths that need them, to keep the startup of tasks fast.
 
-import ROOT
 
-ROOT.gROOT.SetBatch(True)
-ROOT.PyConfig.IgnoreCommandLineOptions = True
-ROOT.gErrorIgnoreLevel = ROOT.kError
+def import_root():
+    import ROOT
 
-from ROOT import TFile
+    ROOT.PyConfig.IgnoreCommandLineOptions = True
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gErrorIgnoreLevel = ROOT.kError
+
+    return ROOT
 
 
 class Dash(object):
 
     def __init__(self):
-        # self.__api = DashboardAPI(logr=logging.getLogger('mona'))
-        self.__api = DashboardAPI()
+        self.__api = None
+
+    @property
+    def enabled(self):
+        return self.__api is not None
 
     def configure(self, config):
+        self.__api = None
+        if config['monitoring']['monitorid'] is None:
+            return
+
+        from WMCore.Services.Dashboard.DashboardAPI import DashboardAPI
+
+        # self.__api = DashboardAPI(logr=logging.getLogger('mona'))
+        self.__api = DashboardAPI()
         self.__jobid = str(config['monitoring']['monitorid'])
         self.__taskid = str(config['monitoring']['taskid'])
         self.__syncid = str(config['monitoring']['syncid'])
 
     def __call__(self, params):
+        if not self.enabled:
+            return
+
         # We need the context to actually configure dashboard reporting
         with self.__api as dashboard:
             params['MessageType'] = 'jobRuntime'
@@ -63,13 +82,17 @@ class Mangler(logging.Formatter):
 
     def __init__(self):
         super(Mangler, self).__init__(fmt='%(message)s')
-        self.context = None
+        self.__local = threading.local()
+
+    @property
+    def context(self):
+        return getattr(self.__local, 'context', None)
 
     @contextmanager
     def output(self, context):
-        old, self.context = self.context, context
+        old, self.__local.context = self.context, context
         yield
-        self.context = old
+        self.__local.context = old
 
     def format(self, record):
         if record.levelno >= logging.INFO:
@@ -82,6 +105,10 @@ class Mangler(logging.Formatter):
         return fmt.format(chevron=chevron, message=record.msg, date=time.strftime("%c"), context=self.context)
 
 
+# Keeps the output of commands run in parallel from interleaving
+output_lock = threading.Lock()
+
+
 fragment = """
 import FWCore.ParameterSet.Config as cms
 process.Timing = cms.Service("Timing",
@@ -199,7 +226,7 @@ def run_subprocess(*args, **kwargs):
     _, _ = p.communicate()
 
     p.stdout = ""
-    with open(outfn, 'r') as fd:
+    with open(outfn, 'r') as fd, output_lock:
         with mangler.output('cmd'):
             for line in fd:
                 logger.debug(line.strip())
@@ -217,21 +244,56 @@ def run_subprocess(*args, **kwargs):
     return p
 
 
+def adler32(chunks):
+    """Calculate the size and the adler32 checksum, as a hexadecimal
+    string, of the data passed in chunks.
+    """
+    checksum = 1
+    size = 0
+    for chunk in chunks:
+        checksum = zlib.adler32(chunk, checksum)
+        size += len(chunk)
+    return '{0:08x}'.format(checksum & 0xffffffff), size
+
+
+def read_chunks(fd, blocksize=1024 * 1024):
+    return iter(lambda: fd.read(blocksize), b'')
+
+
+def copy_file(source, target):
+    """Copy a file, while calculating its checksum.
+
+    Returns the adler32 checksum and the size of the data written.
+    """
+    def tee(chunks, fd):
+        for chunk in chunks:
+            fd.write(chunk)
+            yield chunk
+
+    with open(source, 'rb') as src:
+        with open(target, 'wb') as tgt:
+            checksum, size = adler32(tee(read_chunks(src), tgt))
+    shutil.copystat(source, target)
+    return checksum, size
+
+
 def calculate_alder32(data):
     """Try to calculate checksums for output files.
+
+    Only calculates checksums missing after the stage-out, which records
+    the checksums of the files it copies.
     """
 
-    for fn in data['files']['output_info'].keys():
+    for fn, info in data['files']['output_info'].items():
+        if 'adler32' in info:
+            continue
         checksum = '0'
         try:
-            p = subprocess.Popen(['edmFileUtil', '-a', fn], stdout=subprocess.PIPE)
-            stdout = p.communicate()[0]
-
-            if p.returncode == 0:
-                checksum = stdout.split()[-2]
-        except Exception:
-            pass
-        data['files']['output_info'][fn]['adler32'] = checksum
+            with open(fn, 'rb') as fd:
+                checksum, _ = adler32(read_chunks(fd))
+        except Exception as e:
+            logger.warning("checksum calculation for {} failed with: {}".format(fn, e))
+        info['adler32'] = checksum
 
 
 def check_execution(exitcode, update=None, timing=None):
@@ -312,16 +374,12 @@ def check_output(config, localname, remotename):
 
     for output in config['output']:
         if output.startswith('file://'):
-            path = output.replace('file://', '')
-            args = [
-                "stat",
-                os.path.join(path, remotename)
-            ]
-            p = run_subprocess(args, retry={53: 5}, capture=True)
-            try:
-                return compare(p.stdout, localname)
-            except RuntimeError as e:
-                logger.error(e)
+            path = os.path.join(output.replace('file://', ''), remotename)
+            if os.path.isfile(path):
+                try:
+                    return compare('Size: {0}'.format(os.path.getsize(path)), localname)
+                except RuntimeError as e:
+                    logger.error(e)
         if output.startswith('root://'):
             server, path = re.match("root://([a-zA-Z0-9:.\-]+)/(.*)", output).groups()
             timeout = '300'  # if the server is bogus, xrdfs hangs instead of returning an error
@@ -379,7 +437,7 @@ def check_output(config, localname, remotename):
                 args = prg + [
                     os.path.join(output, remotename),
                 ]
-                pruned_env = dict(env)
+                pruned_env = dict(os.environ)
                 for k in ['LD_LIBRARY_PATH', 'PATH']:
                     pruned_env[k] = ':'.join([x for x in os.environ[k].split(':') if 'CMSSW' not in x])
                 p = run_subprocess(args, env=pruned_env, capture=True)
@@ -428,12 +486,336 @@ def check_parrot_cache(data):
                     data['cache']['type'] = 0
 
 
+class InputCache(object):
+
+    """Cache of input files shared by the tasks on a worker.
+
+    Files are stored under their adler32 checksum and size, and found via
+    an index of links named after a hash of their source URL, i.e., the
+    input they were copied from and their LFN, since the cache is shared
+    by all projects of a user.  Cached copies that do not have the size
+    recorded for them are discarded when fetched.  Files enter the
+    cache by being renamed into place, so that no task sees a partial
+    file, and tasks receive hard links, so that removing files from the
+    cache does not affect tasks using them.  When the cache grows beyond
+    its quota, the least recently used files are removed.  Files larger
+    than the quota are not cached.
+
+    Parameters
+    ----------
+        path : str
+            The directory to keep the cache in.
+        quota : int
+            The maximum size of the cache, in MB.
+    """
+
+    def __init__(self, path, quota):
+        self.path = path
+        self.quota = quota * 1024 * 1024
+
+        for subdir in ('files', 'index'):
+            try:
+                os.makedirs(os.path.join(path, subdir))
+            except OSError:
+                if not os.path.isdir(os.path.join(path, subdir)):
+                    raise
+
+    def __index(self, input, lfn):
+        url = input.rstrip('/') + '/' + lfn.lstrip('/')
+        return os.path.join(self.path, 'index', hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    @contextmanager
+    def __lock(self):
+        with open(os.path.join(self.path, 'lock'), 'a') as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def fetch(self, input, lfn, target):
+        """Put the cached copy of the file `lfn` from `input` at `target`.
+        Returns `False` if the file is not cached.
+        """
+        try:
+            name = os.readlink(self.__index(input, lfn))
+            blob = os.path.join(self.path, 'files', name)
+            os.utime(blob, None)
+            try:
+                os.link(blob, target)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.copyfile(blob, target)
+        except (IOError, OSError):
+            return False
+
+        if os.path.getsize(target) != int(name.rsplit('-', 1)[-1]):
+            logger.warning("discarding cached copy of input file {0} with wrong size".format(lfn))
+            os.unlink(target)
+            with self.__lock():
+                for fn in (self.__index(input, lfn), blob):
+                    try:
+                        os.unlink(fn)
+                    except OSError:
+                        pass
+            return False
+        return True
+
+    def store(self, input, lfn, source):
+        """Add a copy of `source` to the cache, as the file `lfn` from
+        `input`.
+        """
+        if os.path.getsize(source) > self.quota:
+            logger.info("not caching input file {0}, which exceeds the cache quota".format(lfn))
+            return
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.path, 'files'), prefix='.')
+        os.close(fd)
+        try:
+            checksum, size = copy_file(source, tmp)
+            name = '{0}-{1}'.format(checksum, size)
+            link = tmp.replace(os.path.join(self.path, 'files'), os.path.join(self.path, 'index'), 1)
+            with self.__lock():
+                os.rename(tmp, os.path.join(self.path, 'files', name))
+                os.utime(os.path.join(self.path, 'files', name), None)
+                os.symlink(name, link)
+                os.rename(link, self.__index(input, lfn))
+                self.__evict(name)
+        except (IOError, OSError) as e:
+            logger.warning("failed to cache input file {0}: {1}".format(lfn, e))
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def __evict(self, keep):
+        files = []
+        for name in os.listdir(os.path.join(self.path, 'files')):
+            if name.startswith('.') or name == keep:
+                continue
+            stat = os.stat(os.path.join(self.path, 'files', name))
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files) + os.path.getsize(os.path.join(self.path, 'files', keep))
+
+        evicted = set()
+        for _, size, name in sorted(files):
+            if total <= self.quota:
+                break
+            os.unlink(os.path.join(self.path, 'files', name))
+            evicted.add(name)
+            total -= size
+
+        if evicted:
+            logger.info("evicted {0} files from the input cache".format(len(evicted)))
+            for name in os.listdir(os.path.join(self.path, 'index')):
+                try:
+                    if os.readlink(os.path.join(self.path, 'index', name)) in evicted:
+                        os.unlink(os.path.join(self.path, 'index', name))
+                except OSError:
+                    pass
+
+
+def stage_in(file, config, env, fast_track, default_xrootd_server, cache=None):
+    """Stage in a single input file.
+
+    Tries the input cache of the worker, if any, and then the access
+    methods in the order specified until one is successful.
+
+    Returns
+    -------
+        filename : str
+            The name under which the file can be opened, or `None` if no
+            access method succeeded.
+        method : str
+            The access method that succeeded, or `None` if the file was
+            transferred by Work Queue, found in the cache, is accessed via
+            AAA, or could not be accessed.
+        transfers : dict
+            The successes and failures of the access methods tried.
+    """
+    transfers = defaultdict(Counter)
+
+    # If the file has been transferred by WQ, there's no need to
+    # monkey around with the input list
+    if os.path.exists(os.path.basename(file)):
+        logger.info("WQ transfer of input file {} detected".format(file))
+        transfers['wq']['stage-in success'] += 1
+        return 'file:' + os.path.basename(file), None, transfers
+
+    for input in (config['input'] if cache else []):
+        if cache.fetch(input, file, os.path.basename(file)):
+            logger.info("cached copy of input file {} from {} found".format(file, input))
+            transfers['cache']['stage-in success'] += 1
+            return 'file:' + os.path.basename(file), None, transfers
+
+    # When the config specifies no "input," this implies to use
+    # AAA to access data in, e.g., DBS
+    if len(config['input']) == 0:
+        if config['executable'] == 'cmsRun':
+            filename = file
+        else:
+            filename = default_xrootd_server + file
+        logger.info("AAA access to input file {} detected".format(file))
+        transfers['root']['stage-in success'] += 1
+        return filename, None, transfers
+
+    # Since we didn't find the file already here and we're not
+    # using AAA, we need to go through the list of inputs and find
+    # one that will allow us to access the file
+    for input in config['input']:
+        if input.startswith('file://'):
+            path = os.path.join(input.replace('file://', '', 1), file)
+            logger.info("Trying local access method")
+            if os.path.exists(path) and os.access(path, os.R_OK):
+                filename = 'file:' + path
+
+                logger.info("Local access to input file {} detected".format(path))
+                transfers['file']['stage-in success'] += 1
+                return filename, input, transfers
+            else:
+                logger.info("Local access to input file unavailable")
+                transfers['file']['stage-in failure'] += 1
+        elif input.startswith('root://'):
+            logger.info("Trying xrootd access method")
+            server, path = re.match("root://([a-zA-Z0-9:.\-]+)/(.*)", input).groups()
+            timeout = '300'  # if the server is bogus, xrdfs hangs instead of returning an error
+            args = [
+                "env",
+                "XRD_LOGLEVEL=Debug",
+                "timeout",
+                timeout,
+                "xrdfs",
+                server,
+                "stat",
+                os.path.join(path, file)
+            ]
+
+            if fast_track or run_subprocess(args, retry={53: 5}).returncode == 0:
+                if config['disable streaming']:
+                    logger.info("streaming has been disabled, attempting stage-in")
+                    args = [
+                        "env",
+                        "XRD_LOGLEVEL=Debug",
+                        "xrdcp",
+                        os.path.join(input, file.lstrip('/')),
+                        os.path.basename(file)
+                    ]
+
+                    p = run_subprocess(args)
+                    if p.returncode == 0:
+                        filename = 'file:' + os.path.basename(file)
+                        transfers['xrdcp']['stage-in success'] += 1
+                        return filename, input, transfers
+                    else:
+                        transfers['xrdcp']['stage-in failure'] += 1
+                else:
+                    logger.info("will stream using xrootd instead of copying")
+                    filename = os.path.join(input, file)
+                    transfers['root']['stage-in success'] += 1
+                    return filename, input, transfers
+            else:
+                logger.info("xrootd access to input file unavailable")
+        elif input.startswith('srm://') or input.startswith('gsiftp://'):
+            logger.info("Trying srm access method")
+            prg = []
+            if len(os.environ["LOBSTER_LCG_CP"]) > 0 and not input.startswith('gsiftp://'):
+                prg = [os.environ["LOBSTER_LCG_CP"], "-b", "-v", "-D", "srmv2", "--sendreceive-timeout", "600"]
+            elif len(os.environ["LOBSTER_GFAL_COPY"]) > 0:
+                # FIXME gfal is very picky about its environment
+                prg = [os.environ["LOBSTER_GFAL_COPY"]]
+
+            args = prg + [
+                os.path.join(input, file),
+                os.path.basename(file)
+            ]
+
+            pruned_env = dict(env)
+            for k in ['LD_LIBRARY_PATH', 'PATH']:
+                pruned_env[k] = ':'.join([x for x in os.environ[k].split(':') if 'CMSSW' not in x])
+
+            p = run_subprocess(args, env=pruned_env)
+            if p.returncode == 0:
+                logger.info('Successfully copied input with SRM')
+                filename = 'file:' + os.path.basename(file)
+                transfers['srm']['stage-in success'] += 1
+                return filename, input, transfers
+            else:
+                logger.error('Unable to copy input with SRM')
+                transfers['srm']['stage-in failure'] += 1
+        elif input.startswith("chirp://"):
+            logger.info("Trying chirp access method")
+            server, path = re.match("chirp://([a-zA-Z0-9:.\-]+)/(.*)", input).groups()
+            remotename = os.path.join(path, file)
+
+            args = [
+                os.path.join(os.environ.get("PARROT_PATH", "bin"), "chirp_get"),
+                "-a",
+                "globus",
+                "-d",
+                "all",
+                "--timeout",
+                "900",
+                server,
+                remotename,
+                os.path.basename(remotename)
+            ]
+            p = run_subprocess(args, env=env)
+            if p.returncode == 0:
+                logger.info('Successfully copied input with Chirp')
+                filename = 'file:' + os.path.basename(file)
+                transfers['chirp']['stage-in success'] += 1
+                return filename, input, transfers
+            else:
+                logger.error('Unable to copy input with Chirp')
+                transfers['chirp']['stage-in failure'] += 1
+        elif input.startswith("hdfs://"):
+            logger.info("Trying hdfs client access method")
+            server, path = re.match("hdfs://([a-zA-Z0-9:.\-]+)/(.*)", input).groups()
+            server = "hdfs://" + server
+            remotename = os.path.join('/', path, file)
+
+            timeout = '300'  # Just to be safe, have a timeout
+            args = [
+                "timeout",
+                timeout,
+                "hdfs",
+                "dfs",
+                "-fs",
+                server,
+                "-get",
+                remotename,
+                os.path.basename(file)]
+            p = run_subprocess(args, env=env)
+            if p.returncode == 0:
+                logger.info('Successfully copied input with hdfs client')
+                filename = 'file:' + os.path.basename(file)
+                transfers['hdfs']['stage-in success'] += 1
+                return filename, input, transfers
+            else:
+                logger.error('Unable to copy input with hdfs client')
+                transfers['hdfs']['stage-in failure'] += 1
+        else:
+            logger.warning('skipping unhandled stage-in method: {0}'.format(input))
+
+    logger.critical('no stage-in method succeeded for: {0}'.format(file))
+    return None, None, transfers
+
+
 @check_execution(exitcode=179, timing='stage_in_end')
 def copy_inputs(data, config, env):
     """Copies input files if desired.
 
     Tries to access each input file via the specified access methods.
     Access methods are traversed in the order specified until one is successful.
+    Up to `parallel stage-in` files are staged in at the same time.  With
+    an `input cache` quota, copies of input files are kept on the worker
+    for other tasks to use.
+
+    With a `prefetch inputs` budget and streaming disabled, only the copies
+    started before the first file is available, and within the budget, are
+    waited for.  The remaining files are streamed via xrootd, if possible,
+    so that their transfer overlaps with the processing.  The payload
+    resolves its input files when it starts, so files copied afterwards
+    can not be picked up.
     """
     config['file map'] = {}
 
@@ -443,204 +825,211 @@ def copy_inputs(data, config, env):
     files = list(config['mask']['files'])
     config['mask']['files'] = []
 
-    fast_track = False
     successes = defaultdict(int)
+    state = {'fast track': False, 'prefetched': 0, 'started': False}
+    budget = config.get('prefetch inputs', 0) * 1024 * 1024
 
     default_xrootd_server = find_xrootd_server('/cvmfs/cms.cern.ch/SITECONF/local/PhEDEx/storage.xml')
 
-    for file in files:
-        # If the file has been transferred by WQ, there's no need to
-        # monkey around with the input list
-        if os.path.exists(os.path.basename(file)):
-            filename = 'file:' + os.path.basename(file)
+    cache = None
+    cachedir = os.environ.get('WORKER_TMPDIR', os.environ.get('TMPDIR'))
+    if config.get('input cache', 0) > 0 and cachedir:
+        try:
+            cache = InputCache(os.path.join(cachedir, 'lobster_inputs_{0}'.format(os.getuid())), config['input cache'])
+        except OSError as e:
+            logger.warning("input cache unavailable: {0}".format(e))
+
+    def streaming(config):
+        # Returns the configuration to stream a file with, keeping only the
+        # access methods that do not copy it, or `None` to copy it.
+        if not (budget > 0 and config['disable streaming'] and (state['started'] or state['prefetched'] >= budget)):
+            return None
+        inputs = [i for i in config['input'] if i.startswith('root://') or i.startswith('file://')]
+        if not any(i.startswith('root://') for i in inputs):
+            return None
+        return dict(config, **{'input': inputs, 'disable streaming': False})
+
+    def attempt(args):
+        index, file = args
+        start = time.time()
+        stream_config = streaming(config) if index > 0 else None
+        if stream_config:
+            logger.info("not waiting for a copy of input file {0}, streaming it".format(file))
+        filename, method, transfers = stage_in(file, stream_config or config, env, state['fast track'],
+                                               default_xrootd_server, cache)
+        # Only copies of files are cached, not files accessed remotely or
+        # on a local file system
+        if cache and method and filename == 'file:' + os.path.basename(file):
+            cache.store(method, file, os.path.basename(file))
+        return index, file, filename, method, transfers, time.time() - start
+
+    pool = ThreadPool(max(1, min(config.get('parallel stage-in', 1), len(files))))
+    results = []
+    try:
+        for index, file, filename, method, transfers, duration in pool.imap_unordered(attempt, enumerate(files)):
+            for protocol, counts in transfers.items():
+                data['transfers'][protocol].update(counts)
+            data['files']['stage_in'][file] = {'input': method, 'time': round(duration, 3)}
+            results.append((index, file, filename))
+            if index == 0:
+                state['started'] = True
+            if budget > 0 and filename == 'file:' + os.path.basename(file):
+                state['prefetched'] += os.path.getsize(os.path.basename(file))
+
+            if method is None:
+                continue
+            successes[method] += 1
+            if config.get('accelerate stage-in', 0) > 0 and not state['fast track']:
+                if successes[method] > config['accelerate stage-in']:
+                    logger.info("Bypassing further access checks and using '{0}' for input".format(method))
+                    config['input'] = [method]
+                    state['fast track'] = True
+    finally:
+        pool.close()
+        pool.join()
+
+    for index, file, filename in sorted(results):
+        if filename is not None:
             config['mask']['files'].append(filename)
             config['file map'][filename] = file
 
-            logger.info("WQ transfer of input file {} detected".format(file))
-            data['transfers']['wq']['stage-in success'] += 1
-            continue
+    if not config['mask']['files']:
+        raise RuntimeError("no stage-in method succeeded")
 
-        # When the config specifies no "input," this implies to use
-        # AAA to access data in, e.g., DBS
-        if len(config['input']) == 0:
-            if config['executable'] == 'cmsRun':
-                filename = file
-            else:
-                filename = default_xrootd_server + file
-            config['mask']['files'].append(filename)
-            config['file map'][filename] = file
-            logger.info("AAA access to input file {} detected".format(file))
-            data['transfers']['root']['stage-in success'] += 1
-            continue
+    logger.info("modified input files")
+    with mangler.output('input'):
+        for fn in config['mask']['files']:
+            logger.debug(fn)
 
-        # Since we didn't find the file already here and we're not
-        # using AAA, we need to go through the list of inputs and find
-        # one that will allow us to access the file
-        for input in config['input']:
-            if input.startswith('file://'):
-                path = os.path.join(input.replace('file://', '', 1), file)
-                logger.info("Trying local access method")
-                if os.path.exists(path) and os.access(path, os.R_OK):
-                    filename = 'file:' + path
-                    config['mask']['files'].append(filename)
-                    config['file map'][filename] = file
-
-                    logger.info("Local access to input file {} detected".format(path))
-                    data['transfers']['file']['stage-in success'] += 1
-                    break
-                else:
-                    logger.info("Local access to input file unavailable")
-                    data['transfers']['file']['stage-in failure'] += 1
-            elif input.startswith('root://'):
-                logger.info("Trying xrootd access method")
-                server, path = re.match("root://([a-zA-Z0-9:.\-]+)/(.*)", input).groups()
-                timeout = '300'  # if the server is bogus, xrdfs hangs instead of returning an error
-                args = [
-                    "env",
-                    "XRD_LOGLEVEL=Debug",
-                    "timeout",
-                    timeout,
-                    "xrdfs",
-                    server,
-                    "stat",
-                    os.path.join(path, file)
-                ]
 
-                if fast_track or run_subprocess(args, retry={53: 5}).returncode == 0:
-                    if config['disable streaming']:
-                        logger.info("streaming has been disabled, attempting stage-in")
-                        args = [
-                            "env",
-                            "XRD_LOGLEVEL=Debug",
-                            "xrdcp",
-                            os.path.join(input, file.lstrip('/')),
-                            os.path.basename(file)
-                        ]
-
-                        p = run_subprocess(args)
-                        if p.returncode == 0:
-                            filename = 'file:' + os.path.basename(file)
-                            config['mask']['files'].append(filename)
-                            config['file map'][filename] = file
-                            data['transfers']['xrdcp']['stage-in success'] += 1
-                            break
-                        else:
-                            data['transfers']['xrdcp']['stage-in failure'] += 1
+def stage_out(localname, remotename, config, env):
+    """Stage out a single output file.
+
+    Tries the stage-out methods in the order specified until one is
+    successful, and checks the transfer for each.
+
+    Returns
+    -------
+        method : str
+            The output URL the file was transferred to, or `None` if no
+            stage-out method succeeded.
+        se : str
+            The storage element the file was transferred to, if known.
+        checksum : str
+            The adler32 checksum of the file, if calculated while copying.
+        transfers : dict
+            The successes and failures of the stage-out methods tried.
+    """
+    server_re = re.compile("[a-zA-Z]+://([a-zA-Z0-9:.\-]+)/")
+    default_se = config['default se']
+    transfers = defaultdict(Counter)
+
+    for output in config['output']:
+        if output.startswith('file://'):
+            rn = os.path.join(output.replace('file://', ''), remotename)
+            if os.path.isdir(os.path.dirname(rn)):
+                logger.info("local access detected")
+                logger.info("attempting stage-out with `copy_file('{0}', '{1}')`".format(localname, rn))
+                try:
+                    checksum, size = copy_file(localname, rn)
+                    logger.info('Checking output file transfer.')
+                    if os.path.getsize(rn) == size == os.path.getsize(localname):
+                        logger.info('File transfer successful!')
+                        transfers['file']['stageout success'] += 1
+                        return output, default_se, checksum, transfers
                     else:
-                        logger.info("will stream using xrootd instead of copying")
-                        filename = os.path.join(input, file)
-                        config['mask']['files'].append(filename)
-                        config['file map'][filename] = file
-                        data['transfers']['root']['stage-in success'] += 1
-                        break
-                else:
-                    logger.info("xrootd access to input file unavailable")
-            elif input.startswith('srm://') or input.startswith('gsiftp://'):
-                logger.info("Trying srm access method")
-                prg = []
-                if len(os.environ["LOBSTER_LCG_CP"]) > 0 and not input.startswith('gsiftp://'):
-                    prg = [os.environ["LOBSTER_LCG_CP"], "-b", "-v", "-D", "srmv2", "--sendreceive-timeout", "600"]
-                elif len(os.environ["LOBSTER_GFAL_COPY"]) > 0:
-                    # FIXME gfal is very picky about its environment
-                    prg = [os.environ["LOBSTER_GFAL_COPY"]]
+                        raise IOError("size mismatch after transfer of {0}".format(localname))
+                except Exception as e:
+                    logger.critical(e)
+                    transfers['file']['stageout failure'] += 1
+        elif output.startswith('srm://') or output.startswith('gsiftp://'):
+            protocol = output[:output.find(':')]
+            prg = []
+            if len(os.environ["LOBSTER_LCG_CP"]) > 0 and output.startswith('srm://'):
+                prg = [os.environ["LOBSTER_LCG_CP"], "-b", "-v", "-D", "srmv2", "--sendreceive-timeout", "600"]
+            elif len(os.environ["LOBSTER_GFAL_COPY"]) > 0:
+                # FIXME gfal is very picky about its environment
+                prg = [os.environ["LOBSTER_GFAL_COPY"], "-f"]
+            else:
+                transfers[protocol]['stageout failure'] += 1
+                continue
 
-                args = prg + [
-                    os.path.join(input, file),
-                    os.path.basename(file)
-                ]
+            args = prg + [
+                "file://" + os.path.join(os.getcwd(), localname),
+                os.path.join(output, remotename)
+            ]
 
-                pruned_env = dict(env)
-                for k in ['LD_LIBRARY_PATH', 'PATH']:
-                    pruned_env[k] = ':'.join([x for x in os.environ[k].split(':') if 'CMSSW' not in x])
+            pruned_env = dict(env)
+            for k in ['LD_LIBRARY_PATH', 'PATH']:
+                pruned_env[k] = ':'.join([x for x in os.environ[k].split(':') if 'CMSSW' not in x])
+
+            ldpath = pruned_env.get('LD_LIBRARY_PATH', '')
+            if ldpath != '':
+                ldpath += ':'
+            ldpath += os.path.join(os.path.dirname(os.path.dirname(prg[0])), 'lib64')
+            pruned_env['LD_LIBRARY_PATH'] = ldpath
+
+            p = run_subprocess(args, env=pruned_env)
+            logger.info('Checking output file transfer.')
+            if p.returncode == 0 and check_output(config, localname, remotename):
+                logger.info('File transfer successful!')
+                transfers[protocol]['stageout success'] += 1
+                match = server_re.match(args[-1])
+                return output, match.group(1) if match else None, None, transfers
+            else:
+                transfers[protocol]['failure'] += 1
+        elif output.startswith("chirp://"):
+            server, path = re.match("chirp://([a-zA-Z0-9:.\-]+)/(.*)", output).groups()
 
-                p = run_subprocess(args, env=pruned_env)
-                if p.returncode == 0:
-                    logger.info('Successfully copied input with SRM')
-                    filename = 'file:' + os.path.basename(file)
-                    config['mask']['files'].append(filename)
-                    config['file map'][filename] = file
-                    data['transfers']['srm']['stage-in success'] += 1
-                    break
-                else:
-                    logger.error('Unable to copy input with SRM')
-                    data['transfers']['srm']['stage-in failure'] += 1
-            elif input.startswith("chirp://"):
-                logger.info("Trying chirp access method")
-                server, path = re.match("chirp://([a-zA-Z0-9:.\-]+)/(.*)", input).groups()
-                remotename = os.path.join(path, file)
-
-                args = [
-                    os.path.join(os.environ.get("PARROT_PATH", "bin"), "chirp_get"),
+            args = [os.path.join(os.environ.get("PARROT_PATH", "bin"), "chirp_put"),
                     "-a",
                     "globus",
                     "-d",
                     "all",
                     "--timeout",
                     "900",
+                    localname,
                     server,
-                    remotename,
-                    os.path.basename(remotename)
-                ]
-                p = run_subprocess(args, env=env)
-                if p.returncode == 0:
-                    logger.info('Successfully copied input with Chirp')
-                    filename = 'file:' + os.path.basename(file)
-                    config['mask']['files'].append(filename)
-                    config['file map'][filename] = file
-                    data['transfers']['chirp']['stage-in success'] += 1
-                    break
-                else:
-                    logger.error('Unable to copy input with Chirp')
-                    data['transfers']['chirp']['stage-in failure'] += 1
-            elif input.startswith("hdfs://"):
-                logger.info("Trying hdfs client access method")
-                server, path = re.match("hdfs://([a-zA-Z0-9:.\-]+)/(.*)", input).groups()
-                server = "hdfs://" + server
-                remotename = os.path.join('/', path, file)
-
-                timeout = '300'  # Just to be safe, have a timeout
-                args = [
-                    "timeout",
-                    timeout,
-                    "hdfs",
-                    "dfs",
-                    "-fs",
-                    server,
-                    "-get",
-                    remotename,
-                    os.path.basename(file)]
-                p = run_subprocess(args, env=env)
-                if p.returncode == 0:
-                    logger.info('Successfully copied input with hdfs client')
-                    filename = 'file:' + os.path.basename(file)
-                    config['mask']['files'].append(filename)
-                    config['file map'][filename] = file
-                    data['transfers']['hdfs']['stage-in success'] += 1
-                    break
-                else:
-                    logger.error('Unable to copy input with hdfs client')
-                    data['transfers']['hdfs']['stage-in failure'] += 1
+                    os.path.join(path, remotename)]
+            p = run_subprocess(args, env=env)
+            logger.info('Checking output file transfer.')
+            if p.returncode == 0 and check_output(config, localname, remotename):
+                logger.info('File transfer successful!')
+                transfers['chirp']['stageout success'] += 1
+                match = server_re.match(args[-1])
+                return output, match.group(1) if match else None, None, transfers
             else:
-                logger.warning('skipping unhandled stage-in method: {0}'.format(input))
-        else:
-            logger.critical('no stage out method succeeded for: {0}'.format(file))
-            successes[input] -= 1
-        successes[input] += 1
-
-        if config.get('accelerate stage-in', 0) > 0 and not fast_track:
-            method, count = max(successes.items(), key=lambda (x, y): y)
-            if count > config['accelerate stage-in']:
-                logger.info("Bypassing further access checks and using '{0}' for input".format(method))
-                config['input'] = [method]
-                fast_track = True
+                transfers['chirp']['stageout failure'] += 1
+        elif output.startswith("hdfs://"):
+            server, path = re.match("hdfs://([a-zA-Z0-9:.\-]+)/(.*)", output).groups()
+            server = "hdfs://" + server
 
-    if not config['mask']['files']:
-        raise RuntimeError("no stage-in method succeeded")
+            timeout = '300'  # Just to be safe, have a timeout
+            args = [
+                "timeout",
+                timeout,
+                "hdfs",
+                "dfs",
+                "-fs",
+                server,
+                "-put",
+                localname,
+                os.path.join('/', path, remotename)]
+
+            p = run_subprocess(args, env=env)
+            logger.info('Checking output file transfer.')
+            if p.returncode == 0 and check_output(config, localname, remotename):
+                logger.info('File transfer successful!')
+                transfers['hdfs']['stageout success'] += 1
+                match = server_re.match(args[-1])
+                return output, match.group(1) if match else None, None, transfers
+            else:
+                transfers['hdfs']['stageout failure'] += 1
+        else:
+            logger.warning('skipping unhandled stage-out method: {0}'.format(output))
 
-    logger.info("modified input files")
-    with mangler.output('input'):
-        for fn in config['mask']['files']:
-            logger.debug(fn)
+    logger.critical('no stage-out method succeeded for: {0}'.format(localname))
+    return None, None, None, transfers
 
 
 @check_execution(exitcode=210, update={'stageout_exit_code': 210}, timing='stage_out_end')
@@ -651,153 +1040,89 @@ def copy_outputs(data, config, env):
     transferring them.  Otherwise, attempt stage-out methods in the order
     specified in the config['storage']['output'] section of the user's
     Lobster configuration. For successful tasks, file sizes are added up
-    and inserted into the task data.
+    and inserted into the task data, as are the checksums of the files.
+    Files copied locally have their checksum calculated while being
+    copied, and are verified by their size.
+
+    Up to `parallel stage-out` files are staged out at the same time,
+    while the sizes of the output files are determined.  As soon as a
+    file cannot be staged out, files not yet started are skipped.  For
+    each file, the time its transfer took and the time after the start of
+    the stage-out it was completed are recorded.
     """
     outsize = 0
     outsize_bare = 0
 
-    server_re = re.compile("[a-zA-Z]+://([a-zA-Z0-9:.\-]+)/")
     target_se = []
     default_se = config['default se']
 
-    transferred = []
-    for localname, remotename in config['output files']:
-        # prevent stageout of data for failed tasks
-        if os.path.exists(localname) and data['exe_exit_code'] != 0:
-            os.remove(localname)
-            break
-        elif data['exe_exit_code'] != 0:
-            break
-
-        outsize += os.path.getsize(localname)
-
-        try:
-            outsize_bare += get_bare_size(localname)
-        except IOError:
-            logger.warning('detected non-EDM output; using filesystem-reported file size for merge calculation')
-            try:
-                outsize_bare += os.path.getsize(localname)
-            except OSError as e:
-                logger.error('missing output file {}: {}'.format(localname, e))
-            except Exception as e:
-                logger.error("file size detection for {} failed with: {}".format(localname, e))
-
-        for output in config['output']:
-            if output.startswith('file://'):
-                rn = os.path.join(output.replace('file://', ''), remotename)
-                if os.path.isdir(os.path.dirname(rn)):
-                    logger.info("local access detected")
-                    logger.info("attempting stage-out with `shutil.copy2('{0}', '{1}')`".format(localname, rn))
-                    try:
-                        shutil.copy2(localname, rn)
-                        logger.info('Checking output file transfer.')
-                        if check_output(config, localname, remotename):
-                            logger.info('File transfer successful!')
-                            transferred.append(localname)
-                            target_se.append(default_se)
-                            data['transfers']['file']['stageout success'] += 1
-                            break
-                    except Exception as e:
-                        logger.critical(e)
-                        data['transfers']['file']['stageout failure'] += 1
-            elif output.startswith('srm://') or output.startswith('gsiftp://'):
-                protocol = output[:output.find(':')]
-                prg = []
-                if len(os.environ["LOBSTER_LCG_CP"]) > 0 and output.startswith('srm://'):
-                    prg = [os.environ["LOBSTER_LCG_CP"], "-b", "-v", "-D", "srmv2", "--sendreceive-timeout", "600"]
-                elif len(os.environ["LOBSTER_GFAL_COPY"]) > 0:
-                    # FIXME gfal is very picky about its environment
-                    prg = [os.environ["LOBSTER_GFAL_COPY"], "-f"]
-                else:
-                    data['transfers'][protocol]['stageout failure'] += 1
-                    continue
+    if not config['output files']:
+        calculate_alder32(data)
+        return
 
-                args = prg + [
-                    "file://" + os.path.join(os.getcwd(), localname),
-                    os.path.join(output, remotename)
-                ]
+    if data['exe_exit_code'] != 0:
+        # prevent stageout of data for failed tasks
+        for localname, remotename in config['output files']:
+            if os.path.exists(localname):
+                os.remove(localname)
+        raise RuntimeError("no stage-out method succeeded")
 
-                pruned_env = dict(env)
-                for k in ['LD_LIBRARY_PATH', 'PATH']:
-                    pruned_env[k] = ':'.join([x for x in os.environ[k].split(':') if 'CMSSW' not in x])
+    failed = threading.Event()
+    begin = time.time()
+
+    def attempt(localname, remotename):
+        if failed.is_set():
+            logger.info("skipping stage-out of {0}".format(localname))
+            return None, None, None, defaultdict(Counter), 0, None
+        start = time.time()
+        method, se, checksum, transfers = stage_out(localname, remotename, config, env)
+        if method is None:
+            failed.set()
+        end = time.time()
+        return method, se, checksum, transfers, end - start, end - begin
+
+    pool = ThreadPool(max(1, min(config.get('parallel stage-out', 1), len(config['output files']))))
+    try:
+        results = [(localname, pool.apply_async(attempt, (localname, remotename)))
+                   for localname, remotename in config['output files']]
 
-                ldpath = pruned_env.get('LD_LIBRARY_PATH', '')
-                if ldpath != '':
-                    ldpath += ':'
-                ldpath += os.path.join(os.path.dirname(os.path.dirname(prg[0])), 'lib64')
-                pruned_env['LD_LIBRARY_PATH'] = ldpath
-
-                p = run_subprocess(args, env=pruned_env)
-                logger.info('Checking output file transfer.')
-                if p.returncode == 0 and check_output(config, localname, remotename):
-                    logger.info('File transfer successful!')
-                    transferred.append(localname)
-                    match = server_re.match(args[-1])
-                    if match:
-                        target_se.append(match.group(1))
-                    data['transfers'][protocol]['stageout success'] += 1
-                    break
-                else:
-                    data['transfers'][protocol]['failure'] += 1
-            elif output.startswith("chirp://"):
-                server, path = re.match("chirp://([a-zA-Z0-9:.\-]+)/(.*)", output).groups()
-
-                args = [os.path.join(os.environ.get("PARROT_PATH", "bin"), "chirp_put"),
-                        "-a",
-                        "globus",
-                        "-d",
-                        "all",
-                        "--timeout",
-                        "900",
-                        localname,
-                        server,
-                        os.path.join(path, remotename)]
-                p = run_subprocess(args, env=env)
-                logger.info('Checking output file transfer.')
-                if p.returncode == 0 and check_output(config, localname, remotename):
-                    logger.info('File transfer successful!')
-                    transferred.append(localname)
-                    match = server_re.match(args[-1])
-                    if match:
-                        target_se.append(match.group(1))
-                    data['transfers']['chirp']['stageout success'] += 1
-                    break
-                else:
-                    data['transfers']['chirp']['stageout failure'] += 1
-            elif output.startswith("hdfs://"):
-                server, path = re.match("hdfs://([a-zA-Z0-9:.\-]+)/(.*)", output).groups()
-                server = "hdfs://" + server
-
-                timeout = '300'  # Just to be safe, have a timeout
-                args = [
-                    "timeout",
-                    timeout,
-                    "hdfs",
-                    "dfs",
-                    "-fs",
-                    server,
-                    "-put",
-                    localname,
-                    os.path.join('/', path, remotename)]
-
-                p = run_subprocess(args, env=env)
-                logger.info('Checking output file transfer.')
-                if p.returncode == 0 and check_output(config, localname, remotename):
-                    logger.info('File transfer successful!')
-                    transferred.append(localname)
-                    match = server_re.match(args[-1])
-                    if match:
-                        target_se.append(match.group(1))
-                    data['transfers']['hdfs']['stageout success'] += 1
-                    break
-                else:
-                    data['transfers']['hdfs']['stageout failure'] += 1
-            else:
-                logger.warning('skipping unhandled stage-out method: {0}'.format(output))
+        # Determine the file sizes while the transfers are running
+        for localname, remotename in config['output files']:
+            outsize += os.path.getsize(localname)
 
-    if set([ln for ln, _ in config['output files']]) - set(transferred):
+            try:
+                outsize_bare += get_bare_size(localname)
+            except IOError:
+                logger.warning('detected non-EDM output; using filesystem-reported file size for merge calculation')
+                try:
+                    outsize_bare += os.path.getsize(localname)
+                except OSError as e:
+                    logger.error('missing output file {}: {}'.format(localname, e))
+                except Exception as e:
+                    logger.error("file size detection for {} failed with: {}".format(localname, e))
+
+        for localname, result in results:
+            method, se, checksum, transfers, duration, done = result.get()
+            if checksum and localname in data['files']['output_info']:
+                data['files']['output_info'][localname]['adler32'] = checksum
+            for protocol, counts in transfers.items():
+                data['transfers'][protocol].update(counts)
+            data['files']['stage_out'][localname] = {
+                'output': method,
+                'time': round(duration, 3),
+                'done': round(done, 3) if done is not None else None
+            }
+            if se:
+                target_se.append(se)
+    finally:
+        pool.close()
+        pool.join()
+
+    if failed.is_set():
         raise RuntimeError("no stage-out method succeeded")
 
+    calculate_alder32(data)
+
     data['output_size'] = outsize
     data['output_bare_size'] = outsize_bare
     data['output_storage_element'] = default_se
@@ -812,6 +1137,8 @@ def edit_process_source(pset, config):
     Adjust input files and lumi mask, as well as adding a process summary
     for performance analysis.
     """
+    from WMCore.DataStructs.LumiList import LumiList
+
     files = config['mask']['files']
     lumis = LumiList(compactList=config['mask']['lumis']).getVLuminosityBlockRange()
     want_summary = config['want summary']
@@ -871,6 +1198,8 @@ def parse_fwk_report(data, config, report_filename):
     written = 0
     eventsPerRun = 0
 
+    from WMCore.FwkJobReport.Report import Report
+
     report = Report("cmsrun")
     report.parse(report_filename)
 
@@ -932,6 +1261,16 @@ def extract_wrapper_times(data):
             data['task_timing'][key] = int(f.readline())
 
 
+def check_sandbox_cache(data):
+    """Record if the wrapper found the sandbox already unpacked on the
+    worker (1), or unpacked it (0).  Stays 2 if the sandbox is not shared
+    with other tasks.
+    """
+    if os.path.isfile('sandbox_cache'):
+        with open('sandbox_cache') as f:
+            data['cache']['sandbox'] = int(f.readline())
+
+
 def extract_cmssw_times(log_filename, default=None):
     """Get time information from a CMSSW stdout.
 
@@ -966,7 +1305,7 @@ def get_bare_size(filename):
 
     Extracts Events->TTree::GetZipBytes()
     """
-    rootfile = TFile(filename, "READ")
+    rootfile = import_root().TFile(filename, "READ")
     if rootfile.IsZombie():
         raise IOError("Can't open ROOT file '{0}'".format(filename))
 
@@ -1018,7 +1357,6 @@ def run_command(data, config, env):
     if 'cmsRun' in config['executable']:
         if p.returncode == 0:
             parse_fwk_report(data, config, 'report.xml')
-            calculate_alder32(data)
         else:
             parse_fwk_report(data, config, 'report.xml', exitcode=p.returncode)
     else:
@@ -1073,6 +1411,11 @@ def run_epilogue(data, config, env):
 
 
 def send_initial_dashboard_update(data, config):
+    if not monitor.enabled:
+        return
+
+    from WMCore.Storage.SiteLocalConfig import loadSiteLocalConfig
+
     # Dashboard does not like Unicode, just ASCII encoding
     syncid = str(config['monitoring']['syncid'])
 
@@ -1106,6 +1449,9 @@ def send_initial_dashboard_update(data, config):
 
 
 def send_final_dashboard_update(data, config):
+    if not monitor.enabled:
+        return
+
     cputime = data['cpu_time']
     events_per_run = data['events_per_run']
     exe_exit_code = data['exe_exit_code']
@@ -1159,50 +1505,106 @@ def write_zipfiles(data):
             zipf.close()
 
 
-if __name__ == '__main__':
-    monitor = Dash()
-    mangler = Mangler()
-
-    console = logging.StreamHandler()
-    console.setFormatter(mangler)
-
-    logger = logging.getLogger('prawn')
-    logger.addHandler(console)
-    logger.propagate = False
-    logger.setLevel(logging.DEBUG)
-
+def run_task(configfile):
+    """Run the task described by the parameters in `configfile` in the
+    current directory.
+    """
     with open('report.json.in', 'r') as fd:
         data = json.load(fd)
         data['transfers'] = defaultdict(Counter)
 
-    configfile = sys.argv[1]
     with open(configfile) as f:
         config = json.load(f)
 
     monitor.configure(config)
 
-    atexit.register(send_final_dashboard_update, data, config)
-    atexit.register(write_report, data)
-    atexit.register(write_zipfiles, data)
+    try:
+        logger.info('data is {0}'.format(str(data)))
+        env = os.environ
+        env['X509_USER_PROXY'] = 'proxy'
+
+        extract_wrapper_times(data)
+        check_sandbox_cache(data)
+        copy_inputs(data, config, env)
+
+        logger.info("updated parameters are")
+        with mangler.output("json"):
+            for l in json.dumps(config, sort_keys=True, indent=2).splitlines():
+                logger.debug(l)
+
+        send_initial_dashboard_update(data, config)
 
-    logger.info('data is {0}'.format(str(data)))
-    env = os.environ
-    env['X509_USER_PROXY'] = 'proxy'
+        run_prologue(data, config, env)
+        run_command(data, config, env)
+        run_epilogue(data, config, env)
 
-    extract_wrapper_times(data)
-    copy_inputs(data, config, env)
+        copy_outputs(data, config, env)
+        check_outputs(data, config)
+        check_parrot_cache(data)
+    finally:
+        write_zipfiles(data)
+        write_report(data)
+        try:
+            send_final_dashboard_update(data, config)
+        except Exception:
+            logger.error("failed to send final dashboard update:\n" + traceback.format_exc())
 
-    logger.info("updated parameters are")
-    with mangler.output("json"):
-        for l in json.dumps(config, sort_keys=True, indent=2).splitlines():
-            logger.debug(l)
 
-    send_initial_dashboard_update(data, config)
+def run_pilot(configfiles):
+    """Run several tasks one after another, each in the directory of its
+    parameter file, with the environment set up by the wrapper only once.
+
+    The files in the current directory, i.e., the inputs shared by the
+    tasks and the release set up by the wrapper, are linked into the task
+    directories.  The wrapper times are only attributed to the first task,
+    and every task has its own log written to `task.log`.
+    """
+    basedir = os.getcwd()
+    taskdirs = [os.path.dirname(os.path.abspath(fn)) for fn in configfiles]
 
-    run_prologue(data, config, env)
-    run_command(data, config, env)
-    run_epilogue(data, config, env)
+    for n, (configfile, taskdir) in enumerate(zip(configfiles, taskdirs)):
+        for name in os.listdir(basedir):
+            path = os.path.join(basedir, name)
+            if path in taskdirs or os.path.lexists(os.path.join(taskdir, name)):
+                continue
+            if n > 0 and name in ('t_wrapper_start', 't_wrapper_ready'):
+                with open(os.path.join(taskdir, name), 'w') as f:
+                    f.write('{0}\n'.format(int(time.time())))
+                continue
+            os.symlink(path, os.path.join(taskdir, name))
 
-    copy_outputs(data, config, env)
-    check_outputs(data, config)
-    check_parrot_cache(data)
+        handler = logging.FileHandler(os.path.join(taskdir, 'task.log'))
+        handler.setFormatter(mangler)
+        logger.addHandler(handler)
+        os.chdir(taskdir)
+        try:
+            logger.info("running task {0} of {1} in {2}".format(n + 1, len(configfiles), taskdir))
+            run_task(os.path.basename(configfile))
+        except SystemExit as e:
+            logger.error("task in {0} failed with exit code {1}".format(taskdir, e.code))
+        except Exception:
+            # keep running the remaining tasks, which would otherwise
+            # return without a report
+            logger.error("task in {0} failed:\n{1}".format(taskdir, traceback.format_exc()))
+        finally:
+            os.chdir(basedir)
+            logger.removeHandler(handler)
+            handler.close()
+
+
+if __name__ == '__main__':
+    monitor = Dash()
+    mangler = Mangler()
+
+    console = logging.StreamHandler()
+    console.setFormatter(mangler)
+
+    logger = logging.getLogger('prawn')
+    logger.addHandler(console)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+
+    if len(sys.argv) > 2:
+        run_pilot(sys.argv[1:])
+    else:
+        run_task(sys.argv[1])
@@ -29,9 +29,12 @@ date +%s > t_wrapper_start
 
 log "startup" "wrapper started" "echo -e 'hostname: $(hostname)\nkernel: $(uname -a)'"
 
-log "trace" "tracing google" traceroute -w 1 www.google.com
 log "env" "environment at startup" env
-log "cpu" "cpu info" cat /proc/cpuinfo
+
+if [ -n "$LOBSTER_DIAGNOSTICS" ]; then
+	log "trace" "tracing google" traceroute -w 1 www.google.com
+	log "cpu" "cpu info" cat /proc/cpuinfo
+fi
 
 # determine locally present stage-out method
 LOBSTER_LCG_CP=$(command -v lcg-cp)
@@ -144,20 +147,84 @@ log "env" "environment after sourcing startup scripts" env
 log "proxy" "proxy information" env X509_USER_PROXY=proxy voms-proxy-info
 log "dir" "working directory at startup" ls -l
 
-log "creating new release $LOBSTER_CMSSW_VERSION for scram arch $arch"
-
 export SCRAM_ARCH=$arch
-scramv1 project -f CMSSW $LOBSTER_CMSSW_VERSION || exit_on_error $? 173 "Failed to create new release"
+basedir=$PWD
+sandbox=sandbox-${LOBSTER_CMSSW_VERSION}-${arch}.tar.bz2
+
+# The release area unpacked from the sandbox is shared by all tasks on a
+# worker, in a directory named after the key of the sandbox.  Tasks hold a
+# shared lock on the area they use, and areas not in use are evicted,
+# least recently used first, when over the disk budget (in MB).
+sandbox_key=
+for key in $LOBSTER_SANDBOX_KEYS; do
+	case $key in
+		sandbox-${LOBSTER_CMSSW_VERSION}-${arch}-*) sandbox_key=$key;;
+	esac
+done
+sandbox_cache=${WORKER_TMPDIR:-$TMPDIR}
+
+if [ -n "$sandbox_key" -a -n "$sandbox_cache" -a "${LOBSTER_SANDBOX_CACHE:-0}" -gt 0 ] && command -v flock > /dev/null; then
+	cachedir=$sandbox_cache/lobster_sandboxes_$(whoami)
+	entry=$cachedir/$sandbox_key
+	mkdir -p $cachedir
+
+	exec 9> $cachedir/lock
+	flock -x 9
+
+	if [ -f $entry.used ]; then
+		log "using cached release $LOBSTER_CMSSW_VERSION in $entry"
+		echo 1 > sandbox_cache
+	else
+		rm -rf $entry
+		mkdir -p $entry
 
-log "unpacking sandbox-${LOBSTER_CMSSW_VERSION}-${arch}.tar.bz2"
-tar xjf sandbox-${LOBSTER_CMSSW_VERSION}-${arch}.tar.bz2 || exit_on_error $? 170 "Failed to unpack sandbox!"
+		log "creating new release $LOBSTER_CMSSW_VERSION for scram arch $arch in $entry"
+		(cd $entry && scramv1 project -f CMSSW $LOBSTER_CMSSW_VERSION) || \
+			{ res=$?; rm -rf $entry; exit_on_error $res 173 "Failed to create new release"; }
+
+		log "unpacking $sandbox"
+		(cd $entry && tar xjf "$basedir/$sandbox") || \
+			{ res=$?; rm -rf $entry; exit_on_error $res 170 "Failed to unpack sandbox!"; }
+
+		du -sm $entry|cut -f1 > $entry.size
+		echo 0 > sandbox_cache
+	fi
+
+	touch $entry.used
+	exec 8< $entry.used
+	flock -s 8
+
+	total=0
+	for used in $(ls -t $cachedir/*.used); do
+		size=$(cat ${used%.used}.size 2>/dev/null || echo 0)
+		total=$((total + size))
+		if [ $total -gt $LOBSTER_SANDBOX_CACHE -a $used != $entry.used ]; then
+			if flock -n -x $used -c "rm -rf ${used%.used} ${used%.used}.size $used"; then
+				log "evicted cached release ${used%.used}"
+				total=$((total - size))
+			fi
+		fi
+	done
+
+	flock -u 9
+	exec 9>&-
+
+	ln -s $entry/$LOBSTER_CMSSW_VERSION $LOBSTER_CMSSW_VERSION
+else
+	log "creating new release $LOBSTER_CMSSW_VERSION for scram arch $arch"
+	scramv1 project -f CMSSW $LOBSTER_CMSSW_VERSION || exit_on_error $? 173 "Failed to create new release"
+
+	log "unpacking $sandbox"
+	tar xjf $sandbox || exit_on_error $? 170 "Failed to unpack sandbox!"
+fi
 
-basedir=$PWD
 cd $LOBSTER_CMSSW_VERSION
 eval $(scramv1 runtime -sh) || exit_on_error $? 174 "The command 'cmsenv' failed!"
 cd "$basedir"
 
-log "top" "machine load" top -Mb\|head -n 50
+if [ -n "$LOBSTER_DIAGNOSTICS" ]; then
+	log "top" "machine load" top -Mb\|head -n 50
+fi
 log "env" "environment before execution" env
 log "wrapper ready"
 date +%s > t_wrapper_ready
@@ -69,6 +69,7 @@ class DatasetInfo(object):
         self.files = defaultdict(FileInfo)
         self.stop_on_file_boundary = False
         self.tasksize = 1
+        self.events_per_task = None
         self.total_events = 0
         self.total_units = 0
         self.unmasked_units = 0
@@ -0,0 +1,108 @@
+"""Classification of task failures.
+
+Failures are sorted into classes that are retried differently: transient
+failures of the infrastructure are retried without counting against the
+units, tasks exhausting their resources are split, and deterministic
+failures of the payload are isolated and given up on quickly.
+"""
+import re
+
+# Failure classes
+UNCLASSIFIED = 0
+TRANSIENT = 1
+RESOURCES = 2
+DETERMINISTIC = 3
+
+# Classes of failures caused by the units processed, not the host
+PAYLOAD = (RESOURCES, DETERMINISTIC)
+
+NAMES = {
+    UNCLASSIFIED: 'unclassified',
+    TRANSIENT: 'transient',
+    RESOURCES: 'resources',
+    DETERMINISTIC: 'deterministic'
+}
+
+# Exit codes of the wrapper, `xrdcp`, `cmsRun`, and `WorkQueue`, the
+# latter as mapped by the `TaskHandler`
+EXIT_CODES = {
+    53: TRANSIENT,          # xrootd failure
+    137: TRANSIENT,         # killed, e.g., by the batch system
+    169: TRANSIENT,         # unable to run parrot
+    170: TRANSIENT,         # sandbox unpacking failure
+    175: TRANSIENT,         # failed to source the environment
+    179: TRANSIENT,         # stage-in failure
+    200: TRANSIENT,         # generic parrot failure
+    210: TRANSIENT,         # stage-out failure during transfer
+    211: TRANSIENT,         # stage-out failure cross-checking transfer
+    7000: DETERMINISTIC,    # command line processing
+    7001: DETERMINISTIC,    # configuration file not found
+    7002: DETERMINISTIC,    # configuration file parsing
+    8006: DETERMINISTIC,    # ProductNotFound
+    8009: DETERMINISTIC,    # Configuration
+    8017: DETERMINISTIC,    # InvalidReference
+    8018: DETERMINISTIC,    # NullPointerError
+    8020: TRANSIENT,        # FileOpenError
+    8021: TRANSIENT,        # FileReadError
+    8028: TRANSIENT,        # FallbackFileOpenError
+    8030: RESOURCES,        # ExceededResourceVSize
+    8031: RESOURCES,        # ExceededResourceRSS
+    8032: RESOURCES,        # ExceededResourceTime
+    10001: TRANSIENT,       # generic WorkQueue failure
+    10010: TRANSIENT,       # timed out
+    10020: TRANSIENT,       # exceeded the maximum number of retries
+    10030: RESOURCES,       # exceeded the maximum runtime
+    10040: RESOURCES,       # exceeded the maximum memory
+    10050: RESOURCES        # exceeded the maximum disk
+}
+
+# Categories of `cmsRun` exceptions
+CATEGORIES = {
+    'Configuration': DETERMINISTIC,
+    'EventCorruption': DETERMINISTIC,
+    'InvalidReference': DETERMINISTIC,
+    'LogicError': DETERMINISTIC,
+    'NotFound': DETERMINISTIC,
+    'NullPointerError': DETERMINISTIC,
+    'ProductNotFound': DETERMINISTIC,
+    'UnimplementedFeature': DETERMINISTIC,
+    'ExceededResourceRSS': RESOURCES,
+    'ExceededResourceTime': RESOURCES,
+    'ExceededResourceVSize': RESOURCES,
+    'FallbackFileOpenError': TRANSIENT,
+    'FileOpenError': TRANSIENT,
+    'FileReadError': TRANSIENT
+}
+
+EXCEPTION = re.compile(r"Begin Fatal Exception[\s\S]*?'(\w+)'[\s\S]*?End Fatal Exception")
+
+
+def classify(exit_code, log=None):
+    """Classify the failure of a task.
+
+    Parameters
+    ----------
+        exit_code : int
+            The exit code of the task.
+        log : str
+            The output of the task, to look for the category of a fatal
+            `cmsRun` exception in.
+
+    Returns
+    -------
+        failure : int
+            The class of the failure.  Exit codes not known to be
+            transient are assumed to be caused by the units processed,
+            but are only considered deterministic if the code or the
+            exception category says so.
+    """
+    if exit_code in EXIT_CODES:
+        return EXIT_CODES[exit_code]
+    if log:
+        match = EXCEPTION.search(log)
+        if match and match.group(1) in CATEGORIES:
+            return CATEGORIES[match.group(1)]
+    if exit_code > 10000:
+        # bitmasked WorkQueue results
+        return TRANSIENT
+    return UNCLASSIFIED
@@ -0,0 +1,178 @@
+from collections import defaultdict, deque
+import math
+
+# Exit codes of failures to access the input
+STAGE_IN = (179, 8020, 8021, 8028)
+
+
+def binomial_tail(k, n, p):
+    """Return the probability to observe at least `k` out of `n` events
+    with probability `p` each.
+    """
+    return sum(math.exp(math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1)) *
+               p ** i * (1 - p) ** (n - i) for i in range(k, n + 1))
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2 == 1:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.
+
+
+class HostHealth(object):
+
+    """Track the health of the hosts tasks run on.
+
+    Keeps a sliding window of the latest task outcomes on each host, and
+    compares every host with the rest of the pool: a host is considered
+    unhealthy if its rate of failures or of input access failures is
+    significantly higher than on the median host, or if tasks typically
+    take much longer on it than the average of their kind.  The median is
+    used so that a few broken hosts do not hide each other.  Regardless of
+    the rest of the pool, a host failing significantly more than half of
+    its tasks is considered unhealthy.
+
+    Parameters
+    ----------
+        window : int
+            How many of the latest tasks on each host to consider.
+        minimum : int
+            How many tasks a host needs to have processed before being
+            judged.
+        threshold : float
+            The significance, as a z-score, above which the failure rate
+            of a host is considered too high.  The corresponding one-sided
+            probability is compared with the exact binomial probability of
+            the failures observed.
+        slowdown : float
+            How many times longer than the average the median task on a
+            host may take.
+    """
+
+    def __init__(self, window=50, minimum=5, threshold=4., slowdown=2.):
+        self.window = window
+        self.minimum = minimum
+        self.threshold = threshold
+        self.slowdown = slowdown
+
+        # per host: (failed, stage-in failed, relative runtime or None)
+        self.__outcomes = defaultdict(deque)
+        # per kind of task: number of tasks, units, and the mean runtime per
+        # unit
+        self.__runtimes = defaultdict(lambda: [0, 0, 0.])
+        # per host: when the blacklisting expires
+        self.__blacklisted = {}
+
+    def record(self, host, kind, failed, exit_code, runtime, units):
+        """Record the outcome of a task.
+
+        Parameters
+        ----------
+            host : str
+                The host the task ran on.
+            kind : tuple
+                The kind of the task, e.g., the workflow label and the type
+                of the task, to compare the runtime with.
+            failed : bool
+                If the task failed for reasons that may be related to the
+                host, i.e., not caused by the units it processed.
+            exit_code : int
+                The exit code of the task.
+            runtime : float
+                The runtime of the task in seconds.
+            units : int
+                The number of units processed by the task.
+        """
+        relative = None
+        if not failed and units > 0:
+            per_unit = runtime / float(units)
+            stats = self.__runtimes[kind]
+            count, weight, mean = stats
+            if count >= self.minimum and mean > 0:
+                relative = per_unit / mean
+            weight += units
+            mean += (per_unit - mean) * units / weight
+            stats[:] = count + 1, weight, mean
+
+        outcomes = self.__outcomes[host]
+        if len(outcomes) == self.window:
+            outcomes.popleft()
+        outcomes.append((failed, failed and exit_code in STAGE_IN, relative))
+
+    def diagnose(self, hosts):
+        """Check hosts for being unhealthy.
+
+        Parameters
+        ----------
+            hosts : list
+                The hosts to check.
+
+        Returns
+        -------
+            unhealthy : dict
+                The unhealthy hosts, with the reason as value.
+        """
+        rates = [[], []]
+        for outcomes in self.__outcomes.values():
+            if len(outcomes) >= self.minimum:
+                for index in range(2):
+                    rates[index].append(sum(1 for o in outcomes if o[index]) / float(len(outcomes)))
+        if len(rates[0]) < 3:
+            baselines = [.5, .5]
+        else:
+            baselines = [min(.5, max(median(r), 1. / self.window)) for r in rates]
+        significance = .5 * math.erfc(self.threshold / math.sqrt(2))
+
+        unhealthy = {}
+        for host in hosts:
+            outcomes = self.__outcomes.get(host, [])
+            if len(outcomes) < self.minimum:
+                continue
+
+            n = len(outcomes)
+            for index, what in ((1, "input failure rate"), (0, "failure rate")):
+                k = sum(1 for o in outcomes if o[index])
+                if k > n * baselines[index] and binomial_tail(k, n, baselines[index]) < significance:
+                    unhealthy[host] = "{0} of {1}/{2} tasks, compared to {3:.1%} in the pool".format(
+                        what, k, n, baselines[index])
+                    break
+            else:
+                relative = [o[2] for o in outcomes if o[2] is not None]
+                if len(relative) >= self.minimum and median(relative) > self.slowdown:
+                    unhealthy[host] = "{0} tasks taking {1:.1f} times as long as on average".format(
+                        len(relative), median(relative))
+        return unhealthy
+
+    def blacklist(self, host, until):
+        """Mark a host as blacklisted.  When the blacklisting expires, the
+        host is judged afresh.
+
+        Parameters
+        ----------
+            host : str
+                The host to blacklist.
+            until : float
+                When the blacklisting expires, in seconds since the epoch.
+        """
+        self.__blacklisted[host] = until
+
+    def blacklisted(self, host, now):
+        """Check if a host is blacklisted.
+
+        Parameters
+        ----------
+            host : str
+                The host to check.
+            now : float
+                The current time, in seconds since the epoch.
+        """
+        until = self.__blacklisted.get(host)
+        if until is None:
+            return False
+        if until > now:
+            return True
+        del self.__blacklisted[host]
+        self.__outcomes.pop(host, None)
+        return False
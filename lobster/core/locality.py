@@ -0,0 +1,105 @@
+from collections import OrderedDict, deque
+from hashlib import sha1
+import os
+
+
+class Locality(object):
+
+    """Track which hosts recently processed which input files.
+
+    Work Queue can not be told to prefer a worker for a task, but its
+    `files` scheduling algorithm sends tasks to the worker holding the
+    largest amount of their cached inputs.  Every input file, or gridpack,
+    is therefore represented by a small token, which is added to the tasks
+    processing it as a cached input.  Tasks over the same input are thus
+    preferentially sent to the workers that processed it before, and find
+    the input in the cache of the worker.
+
+    Parameters
+    ----------
+        workdir : str
+            The directory to create the tokens in.
+        size : int
+            How many input files to track.
+        window : int
+            How many of the latest hosts to remember per input file.
+    """
+
+    def __init__(self, workdir, size=10000, window=3):
+        self.workdir = workdir
+        self.size = size
+        self.window = window
+
+        self.__hosts = OrderedDict()
+        self.__hits = 0
+        self.__total = 0
+
+        if not os.path.isdir(self.workdir):
+            os.makedirs(self.workdir)
+
+    def token(self, filename):
+        """Return the input specification of the token of a file.
+
+        Parameters
+        ----------
+            filename : str
+                The input file or gridpack.
+
+        Returns
+        -------
+            token : tuple
+                The local and remote name of the token, and whether to
+                cache it, as used by the task inputs.
+        """
+        name = 'locality-' + sha1(filename).hexdigest()[:16]
+        local = os.path.join(self.workdir, name)
+        if not os.path.isfile(local):
+            with open(local, 'w') as f:
+                f.write(filename + '\n')
+        return (local, name, True)
+
+    def hosts(self, filename):
+        """Return the hosts that recently processed a file, latest first.
+        """
+        return list(reversed(self.__hosts.get(filename, [])))
+
+    def record(self, filenames, host):
+        """Record that a task processed files on a host.
+
+        Parameters
+        ----------
+            filenames : list
+                The input files or gridpacks of the task.
+            host : str
+                The host the task ran on.
+
+        Returns
+        -------
+            local : bool
+                If any of the files was processed on the same host before.
+        """
+        local = False
+        for fn in filenames:
+            hosts = self.__hosts.pop(fn, None)
+            if hosts is None:
+                hosts = deque(maxlen=self.window)
+            elif host in hosts:
+                local = True
+                hosts.remove(host)
+            hosts.append(host)
+            self.__hosts[fn] = hosts
+
+        while len(self.__hosts) > self.size:
+            self.__hosts.popitem(last=False)
+
+        if len(filenames) > 0:
+            self.__total += 1
+            self.__hits += int(local)
+        return local
+
+    @property
+    def hit_rate(self):
+        """The fraction of tasks that ran on a host which processed one of
+        their inputs before.
+        """
+        return self.__hits * 1. / max(self.__total, 1)
@@ -0,0 +1,214 @@
+"""Scheduling policies applied to the tasks of a project.
+
+The choice of speculative copies, the bundling of tasks, the resolution of
+returned speculative copies, and the health checks of hosts are shared by
+:class:`~lobster.core.source.TaskProvider` and the simulator in
+:mod:`lobster.sim.simulator`, so that simulations follow the policies of
+real projects.
+"""
+from collections import OrderedDict
+import logging
+
+from lobster.core import failure, unit
+
+logger = logging.getLogger('lobster.policy')
+
+
+def speculate(config, store, total, tasks):
+    """Create speculative copies of the oldest running tasks of workflows
+    near completion, to occupy idle cores.
+
+    Parameters
+    ----------
+        config : Config
+            The configuration of the project.
+        store : UnitStore
+            The unit store to create the copies in.
+        total : int
+            Number of cores available.
+        tasks : dict
+            Dictionary with category names as keys and the number of
+            tasks in the queue as values.
+
+    Returns
+    -------
+        taskinfos : list
+            The speculative copies, in the format returned by
+            :meth:`~lobster.core.unit.UnitStore.pop_units`.
+    """
+    if any(t['queued'] > 0 for t in tasks.values()):
+        return []
+    idle = total - sum(t['running'] * (getattr(config.categories, c).cores or 1) for c, t in tasks.items())
+
+    taskinfos = []
+    for wflow in config.workflows:
+        cores = wflow.category.cores or 1
+        if idle < cores:
+            break
+        # bundles can not be cancelled in part
+        if wflow.bundle_size > 1:
+            continue
+        infos = store.pop_speculative(wflow.label, idle // cores)
+        idle -= len(infos) * cores
+        taskinfos += infos
+    if len(taskinfos) > 0:
+        logger.info("created {0} speculative task(s) for idle cores".format(len(taskinfos)))
+    return taskinfos
+
+
+def bundle(config, store, taskinfos):
+    """Group tasks into the Work Queue tasks they are run in.
+
+    Processing tasks of workflows with a `bundle_size` larger than one are
+    grouped by workflow, in the order they were created.  All other tasks
+    are run on their own, and come first.  The resources of the category
+    apply to the whole bundle: if the category has a runtime, the
+    predicted runtimes of the tasks of a bundle add up to at most this
+    runtime, and tasks without a prediction are assumed to take all of it.
+
+    Parameters
+    ----------
+        config : Config
+            The configuration of the project.
+        store : UnitStore
+            The unit store the tasks were created in.
+        taskinfos : list
+            The tasks, in the format returned by
+            :meth:`~lobster.core.unit.UnitStore.pop_units`.
+
+    Returns
+    -------
+        groups : list
+            A list of lists of tasks, one per Work Queue task.
+    """
+    groups = []
+    bundles = OrderedDict()
+    for info in taskinfos:
+        (_, label, _, _, _, merge) = info
+        if not merge and getattr(config.workflows, label).bundle_size > 1:
+            bundles.setdefault(label, []).append(info)
+        else:
+            groups.append([info])
+
+    for label, infos in bundles.items():
+        wflow = getattr(config.workflows, label)
+        runtime = wflow.category.runtime
+        predicted = store.predicted_runtimes(info[0] for info in infos) if runtime else {}
+        group = []
+        total = 0
+        for info in infos:
+            cost = (predicted.get(info[0]) or runtime) if runtime else 0
+            if group and (len(group) >= wflow.bundle_size or (runtime and total + cost > runtime)):
+                groups.append(group)
+                group = []
+                total = 0
+            group.append(info)
+            total += cost
+        groups.append(group)
+    return groups
+
+
+def resolve(store, label, id, failed, task_update, file_update, unit_update):
+    """Resolve the speculative copies of a returned processing task.
+
+    Parameters
+    ----------
+        store : UnitStore
+            The unit store the task was created in.
+        label : str
+            The label of the workflow of the task.
+        id : int
+            The id of the task.
+        failed : bool
+            If the task failed.
+        task_update : TaskUpdate
+            The update of the task.  Marked as aborted if the other copy
+            finished first.
+        file_update : list
+            The updates of the files of the task.
+        unit_update : list
+            The updates of the units of the task.
+
+    Returns
+    -------
+        failed : bool
+            If the task is to be treated as failed.
+        file_update : list
+            The updates of the files to apply.
+        unit_update : list
+            The updates of the units to apply.
+        cancel : str
+            The id of the other copy to cancel, or `None`.
+    """
+    outcome, other = store.resolve_speculation(label, id, failed)
+    if outcome == 'won':
+        return failed, file_update, unit_update, str(other)
+    elif outcome == 'lost':
+        # the outputs of the other copy are used
+        task_update.status = unit.ABORTED
+        return True, [], [], None
+    elif outcome == 'handover':
+        return failed, [], [], None
+    return failed, file_update, unit_update, None
+
+
+def record(health, kind, failed, task_update):
+    """Record the outcome of a returned task with the health of its host.
+
+    Aborted tasks, and failures caused by the units processed, say
+    nothing about the host.
+
+    Parameters
+    ----------
+        health : HostHealth
+            The health of the hosts.
+        kind : tuple
+            The workflow label and unit source of the task.
+        failed : bool
+            If the task failed.
+        task_update : TaskUpdate
+            The update of the task.
+    """
+    if task_update.status == unit.ABORTED:
+        return
+    health.record(task_update.host, kind, failed and task_update.failure not in failure.PAYLOAD,
+                  task_update.exit_code, task_update.time_on_worker, task_update.units_processed)
+
+
+def check_hosts(health, update, now, timeout):
+    """Blacklist hosts that are significantly less healthy than the rest
+    of the pool, and do not count failures on blacklisted hosts against
+    units, unless they are caused by the units.
+
+    Parameters
+    ----------
+        health : HostHealth
+            The health of the hosts.
+        update : dict
+            The updates of returned tasks, as passed to
+            :meth:`~lobster.core.unit.UnitStore.update_units`.
+        now : float
+            The current time.
+        timeout : int
+            How long to blacklist hosts for, in seconds.  Hosts are not
+            blacklisted if 0.
+
+    Returns
+    -------
+        unhealthy : dict
+            The hosts blacklisted, with the reason as values.
+    """
+    task_updates = [task_update for updates in update.values() for (task_update, _, _) in updates]
+
+    unhealthy = {}
+    if timeout > 0:
+        hosts = set(task_update.host for task_update in task_updates)
+        unhealthy = health.diagnose([host for host in hosts if not health.blacklisted(host, now)])
+        for host in unhealthy:
+            health.blacklist(host, now + timeout)
+
+    for task_update in task_updates:
+        if task_update.status == unit.FAILED and task_update.failure not in failure.PAYLOAD and \
+                health.blacklisted(task_update.host, now):
+            task_update.failure = failure.TRANSIENT
+    return unhealthy
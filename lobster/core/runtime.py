@@ -0,0 +1,250 @@
+import math
+
+
+def solve(a, b):
+    """Solve the linear system `a x = b` by Gaussian elimination with
+    partial pivoting.  Returns `None` for singular systems.
+    """
+    n = len(b)
+    m = [list(row) + [v] for row, v in zip(a, b)]
+    for i in range(n):
+        pivot = max(range(i, n), key=lambda r: abs(m[r][i]))
+        if abs(m[pivot][i]) < 1e-12:
+            return None
+        m[i], m[pivot] = m[pivot], m[i]
+        for r in range(i + 1, n):
+            f = m[r][i] / m[i][i]
+            for c in range(i, n + 1):
+                m[r][c] -= f * m[i][c]
+    x = [0.] * n
+    for i in reversed(range(n)):
+        x[i] = (m[i][n] - sum(m[i][c] * x[c] for c in range(i + 1, n))) / m[i][i]
+    return x
+
+
+class RuntimeModel(object):
+
+    """Online model of the task runtime of a workflow.
+
+    Fits the runtime of a task as a linear function of the units, events,
+    and bytes it processes, plus a constant per-task overhead.  The fit is
+    a least squares regression over all observed tasks, where older tasks
+    are weighted down exponentially, so that the model follows trends in
+    the runtime over the course of a project.
+
+    Parameters
+    ----------
+        decay : float
+            Weight retained by previous observations for every new
+            observation.  Corresponds to a window of roughly `1 / (1 -
+            decay)` tasks.
+        minimum : int
+            How many tasks to observe before making predictions.
+        ridge : float
+            Regularization strength, relative to the weight of the
+            observations, to keep the fit stable for workflows where some
+            of the features are constant, e.g., zero bytes.
+    """
+
+    features = ('overhead', 'units', 'events', 'megabytes')
+
+    def __init__(self, decay=.99, minimum=10, ridge=1e-3):
+        self.decay = decay
+        self.minimum = minimum
+        self.ridge = ridge
+
+        n = len(self.features)
+        self.__xx = [[0.] * n for _ in range(n)]
+        self.__xy = [0.] * n
+        self.__weight = 0.
+        self.__observations = 0
+        self.__coefficients = None
+
+        # decaying mean of the absolute relative prediction error
+        self.error = None
+
+    def __vector(self, units, events, bytes):
+        return [1., float(units), float(events), bytes / 1e6]
+
+    @property
+    def ready(self):
+        return self.__observations >= self.minimum and self.__coefficients is not None
+
+    @property
+    def coefficients(self):
+        """The fitted runtime contributions, in seconds, of the task
+        overhead, a unit, an event, and a megabyte of input.
+        """
+        if self.__coefficients is None:
+            return None
+        return dict(zip(self.features, self.__coefficients))
+
+    def update(self, units, events, bytes, runtime):
+        """Add a task to the model.
+
+        Parameters
+        ----------
+            units : int
+                The number of units processed by the task.
+            events : int
+                The number of events read by the task.
+            bytes : int
+                The amount of input data processed by the task.
+            runtime : float
+                The runtime of the task, in seconds.
+        """
+        if units <= 0 or runtime <= 0:
+            return
+
+        if self.ready:
+            predicted = self.predict(units, events, bytes)
+            error = abs(predicted - runtime) / float(runtime)
+            self.error = error if self.error is None else self.decay * self.error + (1 - self.decay) * error
+
+        x = self.__vector(units, events, bytes)
+        n = len(x)
+        for i in range(n):
+            self.__xy[i] = self.decay * self.__xy[i] + x[i] * runtime
+            for j in range(n):
+                self.__xx[i][j] = self.decay * self.__xx[i][j] + x[i] * x[j]
+        self.__weight = self.decay * self.__weight + 1
+        self.__observations += 1
+
+        # Regularize towards zero for all but the units, scaled to the
+        # magnitude of each feature: when the features can't be told
+        # apart, e.g., for tasks of constant size, the runtime is assumed
+        # to scale with the units.
+        xx = [list(row) for row in self.__xx]
+        for i in range(n):
+            if self.features[i] != 'units':
+                xx[i][i] += self.ridge * max(xx[i][i], self.__weight)
+        coefficients = solve(xx, self.__xy)
+        if coefficients is not None:
+            self.__coefficients = coefficients
+
+    def predict(self, units, events, bytes):
+        """Predict the runtime of a task, in seconds.
+        """
+        x = self.__vector(units, events, bytes)
+        return max(0., sum(c * v for c, v in zip(self.__coefficients, x)))
+
+    @property
+    def overhead(self):
+        """The predicted runtime of a task without any units.
+        """
+        return max(0., self.__coefficients[0])
+
+    def unit_cost(self, events, bytes):
+        """Predict the runtime of a single unit, in seconds.
+
+        Parameters
+        ----------
+            events : float
+                The number of events in the unit.
+            bytes : float
+                The size of the unit.
+        """
+        c = self.__coefficients
+        return c[1] + c[2] * events + c[3] * bytes / 1e6
+
+
+class SurvivalModel(object):
+
+    """Online model of the survival of tasks on opportunistic workers.
+
+    Estimates the hazard of losing a running task to the eviction of its
+    worker from the number of attempts lost and the total runtime of all
+    attempts, including the ones that ran to completion, so that long
+    tasks, which are evicted more often, are not underrepresented.  Work
+    Queue only reports the total runtime of the lost attempts, which
+    allows an unbiased estimate of the average hazard, but not of its
+    dependence on the runtime: the survival of a task is modeled as an
+    exponential decay.  Older tasks are weighted down exponentially.
+
+    Parameters
+    ----------
+        decay : float
+            Weight retained by previous observations for every new
+            observation.
+        minimum : int
+            How many evictions to observe before making predictions.
+    """
+
+    def __init__(self, decay=.999, minimum=5):
+        self.decay = decay
+        self.minimum = minimum
+
+        self.__events = 0.
+        self.__exposure = 0.
+        self.__evictions = 0
+
+    @property
+    def ready(self):
+        return self.__evictions >= self.minimum
+
+    @property
+    def hazard(self):
+        """The rate of evictions per second of runtime.
+        """
+        return self.__events / self.__exposure if self.__exposure > 0 else 0.
+
+    def update(self, runtime, evictions=0, lost=0.):
+        """Add a task to the model.
+
+        Parameters
+        ----------
+            runtime : float
+                The runtime of the last attempt of the task, in seconds.
+            evictions : int
+                The number of attempts of the task lost to evictions.
+            lost : float
+                The total runtime of the attempts lost to evictions, in
+                seconds.
+        """
+        self.__events = self.decay * self.__events + evictions
+        self.__exposure = self.decay * self.__exposure + runtime + lost
+        self.__evictions += evictions
+
+    def __integrate(self, runtime):
+        """Returns the probability of an attempt to survive `runtime`, and
+        the expected time it runs, until either completed or evicted.
+        """
+        hazard = self.hazard
+        if hazard <= 0:
+            return 1., runtime
+        survival = math.exp(-hazard * runtime)
+        return survival, (1 - survival) / hazard
+
+    def survival(self, runtime):
+        """The probability of an attempt not to be evicted within
+        `runtime` seconds.
+        """
+        return self.__integrate(runtime)[0]
+
+    def goodput(self, work, overhead=0.):
+        """Predict the fraction of the runtime spent on useful work.
+
+        Evicted attempts are retried until one completes, and their
+        runtime lost.
+
+        Parameters
+        ----------
+            work : float
+                The runtime of a task spent processing units, in seconds.
+            overhead : float
+                The runtime of a task not spent processing units, in
+                seconds.
+        """
+        survival, expected = self.__integrate(work + overhead)
+        if expected <= 0:
+            return 0.
+        return work * survival / expected
+
+    def loss(self, runtime):
+        """Predict the fraction of the runtime lost to evictions for tasks
+        running `runtime` seconds.
+        """
+        survival, expected = self.__integrate(runtime)
+        if expected <= 0:
+            return 0.
+        return 1 - runtime * survival / expected
@@ -1,6 +1,24 @@
+import hashlib
+import os
+
 from lobster.util import Configurable
 
 
+def key(path):
+    """Returns a key for the contents of a packed sandbox.
+
+    Tasks on the same worker share the sandbox unpacked under this key.
+    The hash in the name of a sandbox is derived from the path of the
+    release it was packed from, so the size and modification time of the
+    sandbox are hashed in, too, to tell sandboxes of the same release
+    apart.
+    """
+    stat = os.stat(path)
+    name = os.path.basename(path).rsplit('.tar.bz2', 1)[0]
+    digest = hashlib.sha1('{0}:{1}'.format(stat.st_size, stat.st_mtime)).hexdigest()[:7]
+    return '{0}-{1}'.format(name, digest)
+
+
 class Sandbox(Configurable):
 
     """
@@ -8,6 +8,7 @@ import shutil
 import socket
 import subprocess
 import sys
+import time
 import work_queue as wq
 
 from collections import defaultdict, Counter
@@ -15,9 +16,12 @@ from hashlib import sha1
 
 from lobster import fs, util
 from lobster.cmssw import dash
-from lobster.core import unit
+from lobster.core import policy, unit
 from lobster.core import Algo
+from lobster.core.health import HostHealth
+from lobster.core.locality import Locality
 from lobster.core import MergeTaskHandler
+from lobster.core.task import BundledTask
 
 from WMCore.Storage.SiteLocalConfig import loadSiteLocalConfig, SiteConfigError
 
@@ -97,7 +101,7 @@ class TaskProvider(util.Timing):
         self.basedirs = [config.base_directory, config.startup_directory]
         self.workdir = config.workdir
         self._storage = config.storage
-        self.statusfile = os.path.join(self.workdir, 'status.json')
+        self.checkpoints = util.checkpoints(self.workdir)
         self.siteconf = os.path.join(self.workdir, 'siteconf')
 
         self.parrot_path = os.path.dirname(util.which('parrot_run'))
@@ -144,23 +148,30 @@ class TaskProvider(util.Timing):
         util.sendemail("Your Lobster project has started!", self.config)
 
         self.__taskhandlers = {}
+        self.__bundles = {}
+        self.__cancel = []
+        self.__health = HostHealth()
+        self.__blacklist = []
+        self.__locality = None
+        if self.config.advanced.locality:
+            self.__locality = Locality(os.path.join(self.workdir, 'locality'))
         self.__store = unit.UnitStore(self.config)
 
         self.__setup_inputs()
         self.copy_siteconf()
 
-        create = not util.checkpoint(self.workdir, 'id')
+        create = not self.checkpoints.get('id')
         if create:
             self.taskid = 'lobster_{0}_{1}'.format(
                 self.config.label,
                 sha1(str(datetime.datetime.utcnow())).hexdigest()[-16:])
-            util.register_checkpoint(self.workdir, 'id', self.taskid)
+            self.checkpoints.set('id', self.taskid)
             shutil.copy(self.config.base_configuration, os.path.join(self.workdir, 'config.py'))
         else:
-            self.taskid = util.checkpoint(self.workdir, 'id')
-            util.register_checkpoint(self.workdir, 'RESTARTED', str(datetime.datetime.utcnow()))
+            self.taskid = self.checkpoints.get('id')
+            self.checkpoints.set('RESTARTED', str(datetime.datetime.utcnow()))
 
-        if not util.checkpoint(self.workdir, 'executable'):
+        if not self.checkpoints.get('executable'):
             # We can actually have more than one exe name (one per task label)
             # Set 'cmsRun' if any of the tasks are of that type,
             # or use cmd command if all tasks execute the same cmd,
@@ -175,10 +186,10 @@ class TaskProvider(util.Timing):
             else:
                 exename = 'noncmsRun'
 
-            util.register_checkpoint(self.workdir, 'executable', exename)
+            self.checkpoints.set('executable', exename)
 
         for wflow in self.config.workflows:
-            if create and not util.checkpoint(self.workdir, wflow.label):
+            if create and not self.checkpoints.get(wflow.label):
                 wflow.setup(self.workdir, self.basedirs)
                 logger.info("querying backend for {0}".format(wflow.label))
                 with fs.alternative():
@@ -186,7 +197,7 @@ class TaskProvider(util.Timing):
 
                 logger.info("registering {0} in database".format(wflow.label))
                 self.__store.register_dataset(wflow, dataset_info, wflow.category.runtime)
-                util.register_checkpoint(self.workdir, wflow.label, 'REGISTERED')
+                self.checkpoints.set(wflow.label, 'REGISTERED')
             elif os.path.exists(os.path.join(wflow.workdir, 'running')):
                 for id in self.get_taskids(wflow.label):
                     util.move(wflow.workdir, id, 'failed')
@@ -198,11 +209,11 @@ class TaskProvider(util.Timing):
                     total_units = wflow.dataset.total_units * len(wflow.unique_arguments)
                     self.__store.register_dependency(wflow.label, wflow.parent.label, total_units)
 
-        if not util.checkpoint(self.workdir, 'sandbox cmssw version'):
-            util.register_checkpoint(self.workdir, 'sandbox', 'CREATED')
+        if not self.checkpoints.get('sandbox cmssw version'):
+            self.checkpoints.set('sandbox', 'CREATED')
             versions = set([w.version for w in self.config.workflows])
             if len(versions) == 1:
-                util.register_checkpoint(self.workdir, 'sandbox cmssw version', list(versions)[0])
+                self.checkpoints.set('sandbox cmssw version', list(versions)[0])
 
         if self.config.elk:
             if create:
@@ -314,8 +325,9 @@ class TaskProvider(util.Timing):
         Will create tasks for all workflows, if possible.  Merge tasks are
         always created, given enough successful tasks.  The remaining tasks
         are split proportionally between the categories based on remaining
-        resources multiplied by cores used per task.  Within categories,
-        tasks are created based on the same logic.
+        resources multiplied by cores used per task and the priority of the
+        workflows, reserving cores for workflows with deadlines.  Within
+        categories, tasks are created based on the same logic.
 
         Parameters
         ----------
@@ -335,10 +347,13 @@ class TaskProvider(util.Timing):
             logger.debug("created {} tasks for workflow {}".format(len(infos), label))
             taskinfos += infos
 
+        if len(taskinfos) == 0 and self.config.advanced.speculation:
+            taskinfos = policy.speculate(self.config, self.__store, total, tasks)
+
         if not taskinfos or len(taskinfos) == 0:
             return []
 
-        tasks = []
+        created = {}
         ids = []
         registration = dict(
             zip(
@@ -388,6 +403,10 @@ class TaskProvider(util.Timing):
                 'LOBSTER_FRONTIER_PROXY': self.__frontier_proxy,
                 'LOBSTER_OSG_VERSION': self.config.advanced.osg_version
             }
+            if self.config.advanced.diagnostics:
+                env['LOBSTER_DIAGNOSTICS'] = '1'
+            if self.config.advanced.sandbox_cache > 0:
+                env['LOBSTER_SANDBOX_CACHE'] = str(self.config.advanced.sandbox_cache)
 
             if merge:
                 missing = []
@@ -431,20 +450,149 @@ class TaskProvider(util.Timing):
             # input/output files
             handler.adjust(config, inputs, outputs, self._storage)
 
+            # steer tasks to the workers that processed their inputs before
+            if self.__locality and not merge:
+                for fn in handler.input_files:
+                    inputs.append(self.__locality.token(fn))
+
             with open(os.path.join(jdir, 'parameters.json'), 'w') as f:
                 json.dump(config, f, indent=2)
                 f.write('\n')
 
-            tasks.append(('merge' if merge else wflow.category.name, cmd, id, inputs, outputs, env, jdir))
+            created[id] = ('merge' if merge else wflow.category.name, cmd, id, inputs, outputs, env, jdir,
+                           self.__algo.priority(wflow))
 
             self.__taskhandlers[id] = handler
 
+        tasks = [self.bundle([created[info[0]] for info in group]) for group in policy.bundle(self.config, self.__store, taskinfos)]
+
         logger.info("creating task(s) {0}".format(", ".join(map(str, ids))))
 
         self.config.advanced.dashboard.free()
 
         return tasks
 
+    def bundle(self, tasks):
+        """Pack tasks of the same workflow into one Work Queue task.
+
+        The tasks are run one after another by the same task wrapper, each
+        in a directory named after its id.  Inputs common to all tasks are
+        shared, all other inputs and outputs are moved into the task
+        directories.
+
+        Parameters
+        ----------
+            tasks : list
+                The tasks to bundle, grouped by :func:`~lobster.core.policy.bundle`.
+
+        Returns
+        -------
+            task : tuple
+                The bundle, in the same format as the tasks.
+        """
+        if len(tasks) == 1:
+            return tasks[0]
+
+        category, _, _, inputs, _, env, dir, priority = tasks[0]
+        ids = [id for (_, _, id, _, _, _, _, _) in tasks]
+        shared = set(inputs)
+        for task in tasks[1:]:
+            shared &= set(task[3])
+
+        inputs = [i for i in inputs if i in shared]
+        outputs = []
+        for (_, _, id, task_inputs, task_outputs, _, taskdir, _) in tasks:
+            inputs += [(local, os.path.join(id, remote), cache)
+                       for (local, remote, cache) in task_inputs if (local, remote, cache) not in shared]
+            outputs += [(local, os.path.join(id, remote)) for (local, remote) in task_outputs]
+            outputs.append((os.path.join(taskdir, 'task.log'), os.path.join(id, 'task.log')))
+
+        tag = '+'.join(ids)
+        self.__bundles[tag] = ids
+        cmd = 'sh wrapper.sh python task.py ' + ' '.join(os.path.join(id, 'parameters.json') for id in ids)
+
+        return (category, cmd, tag, inputs, outputs, env, dir, priority)
+
+    def unbundle(self, tasks):
+        """Replace returned bundles by the tasks they contain.
+
+        Parameters
+        ----------
+            tasks : list
+                The tasks returned by Work Queue.
+        """
+        result = []
+        for task in tasks:
+            ids = self.__bundles.pop(task.tag, None)
+            if ids is None:
+                result.append(task)
+                continue
+            for id in ids:
+                log = os.path.join(self.__taskhandlers[id].taskdir, 'task.log')
+                result.append(BundledTask(task, id, len(ids), log))
+        return result
+
+    def cancel(self, queue):
+        """Cancel tasks that lost against their speculative copies.
+
+        Parameters
+        ----------
+            queue : WorkQueue
+                The queue to remove the tasks from.
+        """
+        cleanup = []
+        for id in self.__cancel:
+            queue.cancel_by_tasktag(id)
+            # may have returned together with the other copy
+            handler = self.__taskhandlers.pop(id, None)
+            if handler is None:
+                continue
+            wflow = getattr(self.config.workflows, handler.dataset)
+            util.move(wflow.workdir, handler.id, 'failed')
+            cleanup.extend([lf for rf, lf in handler.outputs])
+
+        if len(self.__cancel) > 0:
+            logger.info("cancelled task(s) {0}, superseded by speculative copies".format(", ".join(self.__cancel)))
+            self.config.advanced.dashboard.update_task_status((id, dash.CANCELLED) for id in self.__cancel)
+        self.__cancel = []
+
+        if len(cleanup) > 0:
+            try:
+                fs.remove(*cleanup)
+            except (IOError, OSError):
+                pass
+            except ValueError as e:
+                logger.error("error removing outputs of cancelled tasks:\n{0}".format(e))
+
+    def check_hosts(self, update):
+        """Blacklist hosts that are significantly less healthy than the
+        rest of the pool, and do not count failures on blacklisted hosts
+        against units, unless they are caused by the units.
+
+        Parameters
+        ----------
+            update : dict
+                The updates of returned tasks, as passed to
+                :meth:`~lobster.core.unit.UnitStore.update_units`.
+        """
+        timeout = self.config.advanced.blacklist_timeout
+        unhealthy = policy.check_hosts(self.__health, update, time.time(), timeout)
+        for host, reason in unhealthy.items():
+            logger.warning("blacklisting host {0} for {1} s due to its {2}".format(host, timeout, reason))
+            self.__blacklist.append(host)
+
+    def blacklist(self, queue):
+        """Blacklist unhealthy hosts in the queue.
+
+        Parameters
+        ----------
+            queue : WorkQueue
+                The queue to blacklist the hosts in.
+        """
+        for host in self.__blacklist:
+            queue.blacklist_with_timeout(host, self.config.advanced.blacklist_timeout)
+        self.__blacklist = []
+
     def release(self, tasks):
         fail_cleanup = []
         merge_cleanup = []
@@ -455,6 +603,8 @@ class TaskProvider(util.Timing):
         summary = ReleaseSummary()
         transfers = defaultdict(lambda: defaultdict(Counter))
 
+        tasks = self.unbundle(tasks)
+
         with self.measure('dash'):
             self.config.advanced.dashboard.update_task_status(
                 (task.tag, dash.DONE) for task in tasks
@@ -467,6 +617,17 @@ class TaskProvider(util.Timing):
 
                 wflow = getattr(self.config.workflows, handler.dataset)
 
+                if not isinstance(handler, MergeTaskHandler):
+                    failed, file_update, unit_update, other = policy.resolve(
+                        self.__store, handler.dataset, handler.id, failed, task_update, file_update, unit_update)
+                    if other:
+                        self.__cancel.append(other)
+
+                policy.record(self.__health, (handler.dataset, handler.unit_source), failed, task_update)
+
+                if self.__locality and not isinstance(handler, MergeTaskHandler):
+                    self.__locality.record(handler.input_files, task_update.host)
+
             with self.measure('elk'):
                 if self.config.elk:
                     self.config.elk.index_task(task)
@@ -503,9 +664,14 @@ class TaskProvider(util.Timing):
                 (task.tag, dash.RETRIEVED) for task in tasks
             )
 
+        self.check_hosts(update)
+
         if len(update) > 0:
             with self.measure('sqlite'):
                 logger.info(summary)
+                if self.__locality:
+                    logger.info("{0:.1%} of tasks ran on a host that processed their input before".format(
+                        self.__locality.hit_rate))
                 self.__store.update_units(update)
 
         with self.measure('cleanup'):
@@ -575,6 +741,12 @@ class TaskProvider(util.Timing):
                 update.append((category.runtime, wflow.label))
         self.__store.update_workflow_runtime(update)
 
+    def workflow_units(self):
+        return self.__store.workflow_units()
+
+    def eviction_estimates(self):
+        return self.__store.eviction_estimates()
+
     def tasks_left(self):
         return self.__store.estimate_tasks_left()
 
@@ -7,15 +7,61 @@ import work_queue as wq
 
 from lobster import util
 from lobster.core.dataset import FileInfo
+import failure
 import unit
 
 from WMCore.DataStructs.LumiList import LumiList
 
-__all__ = ['TaskHandler', 'MergeTaskHandler', 'ProductionTaskHandler']
+__all__ = ['BundledTask', 'TaskHandler', 'MergeTaskHandler', 'ProductionTaskHandler']
 
 logger = logging.getLogger('lobster.cmssw.taskhandler')
 
 
+class BundledTask(object):
+
+    """
+    A task run in a bundle, as seen by its task handler.
+
+    Forwards the attributes of the Work Queue task the bundle ran as.  The
+    execution times and transferred bytes are divided evenly between the
+    tasks of the bundle, and the output is replaced by the log of the
+    task, if present.
+
+    Parameters
+    ----------
+        task : work_queue.Task
+            The Work Queue task that ran the bundle.
+        tag : str
+            The id of the task.
+        size : int
+            The number of tasks in the bundle.
+        log : str
+            The path of the log file of the task.
+    """
+
+    shared = ('total_bytes_received', 'total_bytes_sent', 'cmd_execution_time', 'total_cmd_execution_time',
+              'total_cmd_exhausted_execute_time', 'total_time_until_worker_failure')
+
+    def __init__(self, task, tag, size, log):
+        self.__task = task
+        self.__size = size
+        self.tag = tag
+        self.output = task.output
+        if os.path.isfile(log):
+            with open(log) as f:
+                self.output = f.read()
+            os.unlink(log)
+
+    def __getattr__(self, attr):
+        value = getattr(self.__task, attr)
+        if attr in self.shared:
+            return value / self.__size
+        return value
+
+    def __dir__(self):
+        return sorted(set(dir(self.__task)) | set(['tag', 'output']))
+
+
 class TaskHandler(object):
 
     """
@@ -182,6 +228,11 @@ class TaskHandler(object):
             task_update.network_bandwidth = task.resources_measured.bandwidth
             task_update.network_bytes_received = task.resources_measured.bytes_received
             task_update.network_bytes_sent = task.resources_measured.bytes_sent
+        task_update.time_total_until_worker_failure = task.total_time_until_worker_failure / 1000000
+        if task_update.time_total_until_worker_failure > 0:
+            # every submission but the last one either exhausted its
+            # resources or was lost with its worker
+            task_update.evictions = max(1, task.total_submissions - 1 - task.exhausted_attempts)
 
     def process(self, task, summary, transfers):
         exit_code = task.return_status
@@ -255,6 +306,8 @@ class TaskHandler(object):
             summary.exe(exit_code, task.tag)
 
         task_update.exit_code = exit_code
+        if failed:
+            task_update.failure = failure.classify(exit_code, task.output)
 
         # Update CMS stats
         file_update, unit_update = self.get_unit_info(failed, task_update, files_info, files_skipped, events_written)
@@ -8,6 +8,8 @@ import sqlite3
 import uuid
 
 from lobster import util
+from lobster.core import failure
+from lobster.core.runtime import RuntimeModel, SurvivalModel
 
 logger = logging.getLogger('lobster.unit')
 
@@ -46,6 +48,7 @@ TaskUpdate = util.record('TaskUpdate',
                          'exit_code',
                          'events_read',
                          'events_written',
+                         'failure',
                          'host',
                          'units_processed',
                          'memory_resident',
@@ -70,6 +73,7 @@ TaskUpdate = util.record('TaskUpdate',
                          'time_total_exhausted_execution',
                          'time_total_until_worker_failure',
                          'exhausted_attempts',
+                         'evictions',
                          'time_cpu',
                          'workdir_footprint',
                          'workdir_num_files',
@@ -85,6 +89,8 @@ class UnitStore:
         self.db = sqlite3.connect(self.db_path, timeout=90)
 
         self.config = config
+        self.__models = {}
+        self.__survival = {}
 
         self.db.execute("""create table if not exists workflows(
             cfg text,
@@ -100,8 +106,12 @@ class UnitStore:
             units_available int default 0,
             units_stuck int default 0,
             units_running int default 0,
+            taskevents int default null,
             taskruntime int default null,
             tasksize int,
+            evictionscale real default 1,
+            evictionloss real default 0,
+            unittime real default null,
             label text,
             units_masked int default 0,
             merged int default 0,
@@ -129,6 +139,7 @@ class UnitStore:
             events_written int default 0 not null,
             exit_code int default 0 not null,
             failed int default 0 not null,
+            failure int default 0 not null,
             host text default '',
             task int default -1 not null,
             units int default 0 not null,
@@ -141,6 +152,8 @@ class UnitStore:
             allocated_memory int default 0 not null,
             allocated_disk int default 0 not null,
             published_file_block text,
+            original int default null,
+            runtime_predicted int default 0 not null,
             status int default 0 not null,
             time_submit int default 0 not null,
             time_transfer_in_start int default 0 not null,
@@ -160,15 +173,38 @@ class UnitStore:
             time_total_exhausted_execution int default 0 not null,
             time_total_until_worker_failure int default 0 not null,
             exhausted_attempts int default 0 not null,
+            evictions int default 0 not null,
             time_cpu int default 0 not null,
             type int default 0 not null,
             workdir_footprint int default 0 not null,
             workdir_num_files int default 0 not null,
             foreign key(workflow) references workflows(id))""")
 
+        # Add columns missing in working directories of older versions
+        for table, column, definition in [
+                ('workflows', 'taskevents', 'int default null'),
+                ('workflows', 'unittime', 'real default null'),
+                ('tasks', 'runtime_predicted', 'int default 0 not null'),
+                ('tasks', 'original', 'int default null'),
+                ('workflows', 'evictionscale', 'real default 1'),
+                ('workflows', 'evictionloss', 'real default 0'),
+                ('tasks', 'failure', 'int default 0 not null'),
+                ('tasks', 'evictions', 'int default 0 not null')]:
+            if column not in [c[1] for c in self.db.execute("pragma table_info({0})".format(table))]:
+                self.db.execute("alter table {0} add column {1} {2}".format(table, column, definition))
+        for (label,) in self.db.execute("select label from workflows").fetchall():
+            columns = [c[1] for c in self.db.execute("pragma table_info(units_{0})".format(label))]
+            for column, definition in [
+                    ('tasksize', 'integer default null'),
+                    ('lineage', 'integer default null'),
+                    ('transient', 'integer default 0')]:
+                if column not in columns:
+                    self.db.execute("alter table units_{0} add column {1} {2}".format(label, column, definition))
+
         self.db.execute("create index if not exists index_w_label on workflows(label)")
         self.db.execute("create index if not exists index_t_workflow on tasks(workflow, status)")
         self.db.execute("create index if not exists index_t_workflowplus on tasks(workflow, status, type)")
+        self.db.execute("create index if not exists index_t_original on tasks(original)")
 
         self.db.commit()
 
@@ -196,6 +232,7 @@ class UnitStore:
                        uuid,
                        file_based,
                        tasksize,
+                       taskevents,
                        taskruntime,
                        units,
                        units_masked,
@@ -203,7 +240,7 @@ class UnitStore:
                        events,
                        stop_on_file_boundary
                        )
-                       values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
+                       values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
             wflow.label,
             label,
             wflow.label,
@@ -214,6 +251,7 @@ class UnitStore:
             self.uuid,
             dataset_info.file_based,
             dataset_info.tasksize,
+            getattr(dataset_info, 'events_per_task', None),
             taskruntime,
             dataset_info.total_units * len(unique_args),
             dataset_info.masked_units,
@@ -240,6 +278,9 @@ class UnitStore:
             file integer,
             status integer default 0,
             failed integer default 0,
+            transient integer default 0,
+            tasksize integer default null,
+            lineage integer default null,
             arg text,
             foreign key(task) references tasks(id),
             foreign key(file) references files_{0}(id))""".format(label))
@@ -308,11 +349,18 @@ class UnitStore:
             tasks_left : float
                 How many tasks need to be created to process all units
                 currently available.
+            time_left : float
+                The estimated runtime of all units left in seconds, or
+                `None` if no estimate is available yet.
         """
-        complete, units_left, tasks_left = self.db.execute(
-            "select (units_left = units_available), units_left, units_available * 1. / tasksize from workflows where label=?",
-            (label,)).fetchone()
-        return complete, units_left, tasks_left
+        complete, units_left, tasks_left, time_left = self.db.execute("""
+            select
+                (units_left = units_available),
+                units_left,
+                units_available * 1. / max(tasksize * evictionscale, 1),
+                units_left * ifnull(unittime, taskruntime * 1. / tasksize)
+            from workflows where label=?""", (label,)).fetchone()
+        return complete, units_left, tasks_left, time_left
 
     @retry(stop_max_attempt_number=10)
     def pop_units(self, workflow, num, taper=1.):
@@ -328,10 +376,18 @@ class UnitStore:
                 Factor to apply to the tasksize.
         """
         with self.db:
-            workflow_id, tasksize, stop_on_file_boundary = self.db.execute(
-                "select id, tasksize, stop_on_file_boundary from workflows where label=?",
+            workflow_id, tasksize, taskevents, taskruntime, stop_on_file_boundary, evictionscale = self.db.execute(
+                """select id, tasksize, taskevents, taskruntime, stop_on_file_boundary, evictionscale
+                from workflows where label=?""",
                 (workflow,)).fetchone()
 
+            # shorter tasks where workers are lost before long ones finish
+            taper *= evictionscale
+
+            model = self.runtime_model(workflow) if taskruntime is not None else None
+            if model and not model.ready:
+                model = None
+
             logger.debug(("creating {0} task(s) for workflow {1}:" +
                           "\n\ttaper:    {4}" +
                           "\n\ttasksize: {5}" +
@@ -346,27 +402,56 @@ class UnitStore:
             )
             )
 
-            fileinfo = list(self.db.execute("""select id, filename
+            fileinfo = list(self.db.execute("""select
+                            id,
+                            filename,
+                            ifnull(events, 0) * 1. / max(units, 1),
+                            ifnull(bytes, 0) * 1. / max(units, 1)
                         from files_{0}
                         where
                             (units_done + units_running < units) and
                             (skipped < ?)
                         order by skipped asc""".format(workflow), (self.config.advanced.threshold_for_skipping,)))
-            files = [x for (x, y) in fileinfo]
-            fileinfo = dict(fileinfo)
+            files = [x[0] for x in fileinfo]
+
+            # Units are packed into tasks until a budget is reached: either
+            # the predicted runtime, or the number of events, with the cost
+            # of a unit estimated per file.  The task size is limited to
+            # guard against underestimated units.
+            costs = defaultdict(float)
+            budget = None
+            if model:
+                for id, filename, events, bytes in fileinfo:
+                    costs[id] = max(0., model.unit_cost(events, bytes))
+                budget = taskruntime * taper - model.overhead
+                logger.debug("creating tasks with predicted runtime {0:.0f}s".format(taskruntime * taper))
+            elif taskevents:
+                average = self.db.execute(
+                    "select ifnull(sum(events), 0) * 1. / max(ifnull(sum(units), 0), 1) from files_{0}".format(workflow)
+                ).fetchone()[0]
+                for id, filename, events, bytes in fileinfo:
+                    costs[id] = events if events > 0 else average
+                budget = taskevents * taper
+                logger.debug("creating tasks with {0:.0f} events".format(budget))
+            fileinfo = dict((x[0], x[1]) for x in fileinfo)
 
             tasksize = int(math.ceil(tasksize * taper))
+            maxsize = 10 * tasksize
 
-            logger.debug("creating tasks with adjusted size {}".format(tasksize))
+            if budget is None:
+                logger.debug("creating tasks with adjusted size {}".format(tasksize))
 
+            # Units of a file are registered in blocks per unique argument:
+            # keep this order, so that the tasks over the same file are
+            # created, and run, close together.
             rows = []
             for i in range(0, len(files), 40):
                 chunk = files[i:i + 40]
                 rows.extend(self.db.execute("""
-                    select id, file, run, lumi, arg, failed
+                    select id, file, run, lumi, arg, failed, tasksize, lineage
                     from units_{0}
                     where file in ({1}) and status not in (1, 2, 6, 7, 8)
-                    order by file
+                    order by file, id
                     """.format(workflow, ', '.join('?' for _ in chunk)), chunk))
 
             logger.debug("creating tasks from {} files, {} units".format(len(files), len(rows)))
@@ -378,10 +463,19 @@ class UnitStore:
             # task container and current task size
             tasks = []
             current_size = 0
+            current_cost = 0.
+
+            # units of tasks that exhausted their resources or failed, by
+            # the size of the tasks they may be put in and the failed task
+            # they originate from, with the argument of that task.  Every
+            # group started counts against the number of tasks to create.
+            splits = {}
 
-            def insert_task(files, units, arg):
+            def insert_task(files, units, arg, cost):
+                predicted = int(model.overhead + cost) if model else 0
                 cur = self.db.cursor()
-                cur.execute("insert into tasks(workflow, status, type) values (?, 1, 0)", (workflow_id,))
+                cur.execute("insert into tasks(workflow, status, type, runtime_predicted) values (?, 1, 0, ?)",
+                            (workflow_id, predicted))
                 task_id = cur.lastrowid
 
                 tasks.append((
@@ -392,7 +486,7 @@ class UnitStore:
                     arg,
                     False))
 
-            for id, file, run, lumi, arg, failed in rows:
+            for id, file, run, lumi, arg, failed, limit, lineage in rows:
                 if failed > self.config.advanced.threshold_for_failure:
                     logger.debug("skipping run {}, "
                                  "lumi {} "
@@ -404,40 +498,68 @@ class UnitStore:
                 if failed == self.config.advanced.threshold_for_failure:
                     logger.debug("creating isolation task for run {}, lumi {} with failure count {}".format(
                         run, lumi, failed))
-                    insert_task([file], [(id, file, run, lumi)], arg)
+                    insert_task([file], [(id, file, run, lumi)], arg, costs[file])
+                    continue
+
+                if limit:
+                    if budget is None:
+                        limit = min(limit, tasksize)
+                    key = (limit, lineage, arg)
+                    if key not in splits and num - len(splits) - (1 if current_size > 0 else 0) <= 0:
+                        continue
+                    split_files, split_units, split_cost, split_arg = splits.get(key, (set(), [], 0., arg))
+                    split_files.add(file)
+                    split_units.append((id, file, run, lumi))
+                    split_cost += costs[file]
+                    if len(split_units) >= limit or (budget is not None and split_cost >= budget):
+                        insert_task(split_files, split_units, split_arg, split_cost)
+                        splits.pop(key, None)
+                        num -= 1
+                    else:
+                        splits[key] = (split_files, split_units, split_cost, split_arg)
                     continue
 
                 if stop_on_file_boundary and (len(files) == 1) and (file not in files):
-                    insert_task(files, units, arg)
+                    insert_task(files, units, arg, current_cost)
 
                     files = set()
                     units = []
 
                     current_size = 0
+                    current_cost = 0.
                     num -= 1
 
                 # We are done creating tasks here, *if* we are about to
                 # add the current unit to a new task, but have already
-                # created enough tasks.
-                if current_size == 0 and num <= 0:
+                # created, or started, enough tasks.
+                if current_size == 0 and num - len(splits) <= 0:
                     break
 
                 units.append((id, file, run, lumi))
                 files.add(file)
 
                 current_size += 1
+                current_cost += costs[file]
+
+                if budget is None:
+                    full = current_size == tasksize
+                else:
+                    full = current_cost >= budget or current_size >= maxsize
 
-                if current_size == tasksize:
-                    insert_task(files, units, arg)
+                if full:
+                    insert_task(files, units, arg, current_cost)
 
                     files = set()
                     units = []
 
                     current_size = 0
+                    current_cost = 0.
                     num -= 1
 
             if current_size > 0:
-                insert_task(files, units, arg)
+                insert_task(files, units, arg, current_cost)
+            for split_files, split_units, split_cost, split_arg in splits.values():
+                insert_task(split_files, split_units, split_arg, split_cost)
 
             workflow_update = []
             file_update = defaultdict(int)
@@ -465,6 +587,114 @@ class UnitStore:
 
             return tasks if len(unit_update) > 0 else []
 
+    def pop_speculative(self, workflow, num):
+        """Create speculative copies of running tasks.
+
+        Only when all remaining units of the workflow are assigned to
+        tasks, the oldest tasks without a copy are duplicated.  The copies
+        get new task ids, while the units stay with the original task
+        until one of them finishes, see :meth:`resolve_speculation`.
+
+        Parameters
+        ----------
+            workflow : str
+                The label of the workflow.
+            num : int
+                The maximum number of copies to create.
+        """
+        with self.db:
+            workflow_id, units_left, units_running = self.db.execute("""
+                select id, units - (units_masked + units_running + units_done + units_stuck), units_running
+                from workflows where label=?""", (workflow,)).fetchone()
+            if units_left > 0 or units_running == 0 or num <= 0:
+                return []
+
+            originals = self.db.execute("""
+                select id, runtime_predicted from tasks
+                where workflow=? and status=1 and type=0 and original is null
+                and id not in (select original from tasks where original is not null)
+                order by id limit ?""", (workflow_id, num)).fetchall()
+
+            tasks = []
+            for original, predicted in originals:
+                units = self.db.execute("""
+                    select units_{0}.id, file, run, lumi, arg, filename
+                    from units_{0}, files_{0}
+                    where task=? and units_{0}.file=files_{0}.id""".format(workflow), (original,)).fetchall()
+                if len(units) == 0:
+                    continue
+
+                cur = self.db.cursor()
+                cur.execute("""insert into tasks(workflow, status, type, units, original, runtime_predicted)
+                               values (?, 1, 0, ?, ?, ?)""", (workflow_id, len(units), original, predicted))
+                logger.debug("created task {0} as a speculative copy of task {1}".format(cur.lastrowid, original))
+
+                tasks.append((
+                    str(cur.lastrowid),
+                    workflow,
+                    list(set((file, filename) for (_, file, _, _, _, filename) in units)),
+                    [(id, file, run, lumi) for (id, file, run, lumi, _, _) in units],
+                    units[0][4],
+                    False))
+            return tasks
+
+    def resolve_speculation(self, workflow, task, failed):
+        """Settle the outcome of a task that may have a speculative copy.
+
+        The first copy to succeed takes over the units and the other copy
+        is aborted.  When a copy fails while the other one is still
+        running, the units are handed over to the running copy, and the
+        failure does not count against them.
+
+        Parameters
+        ----------
+            workflow : str
+                The label of the workflow.
+            task : int
+                The id of the returned task.
+            failed : bool
+                If the task failed.
+
+        Returns
+        -------
+            outcome : str
+                `None` if the task is not part of a speculative pair or
+                the other copy already failed, `'won'` if the task takes
+                over the units and the other copy needs to be cancelled,
+                `'lost'` if the other copy finished successfully first,
+                and `'handover'` if the task failed and its units are
+                passed to the other copy.
+            other : int
+                The id of the other copy.
+        """
+        task = int(task)
+        with self.db:
+            status, original = self.db.execute(
+                "select status, original from tasks where id=?", (task,)).fetchone()
+            if original is not None:
+                row = self.db.execute("select id, status from tasks where id=?", (original,)).fetchone()
+            else:
+                row = self.db.execute("select id, status from tasks where original=?", (task,)).fetchone()
+            if row is None:
+                return None, None
+            other, other_status = row
+
+            if status == ABORTED or other_status == SUCCESSFUL:
+                return 'lost', other
+            elif other_status != ASSIGNED:
+                return None, other
+
+            # Update the status right away, for the other copy to be
+            # resolved correctly if returned at the same time
+            if failed:
+                self.db.execute("update units_{0} set task=? where task=?".format(workflow), (other, task))
+                self.db.execute("update tasks set status=? where id=?", (FAILED, task))
+                return 'handover', other
+            self.db.execute("update units_{0} set task=? where task=?".format(workflow), (task, other))
+            self.db.execute("update tasks set status=? where id=?", (SUCCESSFUL, task))
+            self.db.execute("update tasks set status=? where id=?", (ABORTED, other))
+            return 'won', other
+
     def reset_units(self):
         with self.db as db:
             ids = [id for (id,) in db.execute(
@@ -485,12 +715,18 @@ class UnitStore:
     @retry(stop_max_attempt_number=10)
     def update_units(self, taskinfos):
         task_updates = []
+        runtimes = []
+        attempts = []
+        models = dict(self.__models)
 
         with self.db:
             for ((dset, unit_source), updates) in taskinfos.items():
                 file_updates = []
                 unit_updates = []
                 unit_fail_updates = []
+                unit_deterministic_updates = []
+                unit_transient_updates = []
+                unit_split_updates = []
                 unit_generic_updates = []
 
                 for (task_update, file_update, unit_update) in updates:
@@ -504,8 +740,34 @@ class UnitStore:
                     else:
                         unit_status = FAILED if task_update.status == FAILED else SUCCESSFUL
 
-                    if task_update.status == FAILED:
+                    if task_update.status == FAILED and not task_update.failure:
+                        task_update.failure = failure.classify(task_update.exit_code)
+
+                    # transient failures are retried as they are, tasks
+                    # exhausting their resources are halved, and other
+                    # failing ones bisected to isolate the culprit units
+                    size = 0
+                    if task_update.status == FAILED and unit_source != 'tasks' and \
+                            task_update.failure != failure.TRANSIENT:
+                        size = self.db.execute("select units from tasks where id=?", (task_update.id,)).fetchone()[0]
+
+                    if size > 1:
+                        logger.info("task {0} failed with exit code {1}, retrying its units in tasks of {2}".format(
+                            task_update.id, task_update.exit_code, (size + 1) // 2))
+                        unit_split_updates.append(((size + 1) // 2, task_update.id, task_update.id))
+                    elif task_update.status == FAILED and unit_source == 'tasks':
+                        unit_fail_updates.append((task_update.id,))
+                    elif task_update.status == FAILED and task_update.failure == failure.DETERMINISTIC:
+                        unit_deterministic_updates.append((task_update.id,))
+                    elif task_update.status == FAILED and task_update.failure != failure.TRANSIENT:
                         unit_fail_updates.append((task_update.id,))
+                    elif task_update.status == FAILED:
+                        unit_transient_updates.append((task_update.id,))
+                    elif task_update.status == SUCCESSFUL and unit_source != 'tasks':
+                        runtimes.append((dset, task_update))
+
+                    if task_update.status in (SUCCESSFUL, FAILED) and unit_source != 'tasks':
+                        attempts.append((self.__category(dset), task_update))
 
                     unit_updates += unit_update
                     unit_generic_updates.append((unit_status, task_update.id))
@@ -529,6 +791,37 @@ class UnitStore:
                         where task=?""".format(unit_source),
                                         unit_fail_updates)
 
+                # deterministic failures use up the remainder of the
+                # smaller budget, `threshold_for_deterministic_failure`
+                if len(unit_deterministic_updates) > 0:
+                    self.db.executemany("""update {0} set
+                        failed=max(failed + 1, ?)
+                        where task=?""".format(unit_source),
+                                        [(self.config.advanced.threshold_for_failure -
+                                          self.config.advanced.threshold_for_deterministic_failure + 1, id)
+                                         for (id,) in unit_deterministic_updates])
+
+                # transient failures are counted separately, and use up the
+                # failure budget once `threshold_for_transient_failure` is
+                # exceeded
+                if len(unit_transient_updates) > 0:
+                    self.db.executemany("""update {0} set
+                        transient=transient + 1,
+                        failed=(case when transient >= ? then max(failed, ?) else failed end)
+                        where task=?""".format(unit_source),
+                                        [(self.config.advanced.threshold_for_transient_failure,
+                                          self.config.advanced.threshold_for_failure + 1, id)
+                                         for (id,) in unit_transient_updates])
+
+                # halve the tasks of units that exhausted their resources
+                # or failed, and only count failures of single units
+                if len(unit_split_updates) > 0:
+                    self.db.executemany("""update {0} set
+                        tasksize=?,
+                        lineage=?
+                        where task=?""".format(unit_source),
+                                        unit_split_updates)
+
                 # update files in the workflow
                 if len(file_updates) > 0:
                     self.db.executemany("""update files_{0} set
@@ -543,9 +836,28 @@ class UnitStore:
                 TaskUpdate.sql_fragment(stop=-1))
             self.db.executemany(query, task_updates)
 
+            # Survival models are needed up to date to adjust task sizes,
+            # and initialized from the database when first used.
+            for category, task_update in attempts:
+                if category in self.__survival:
+                    self.__survival[category].update(
+                        task_update.time_on_worker,
+                        task_update.evictions,
+                        task_update.time_total_until_worker_failure)
+
             for label, _ in taskinfos.keys():
                 self.update_workflow_stats(label)
 
+        # Models are initialized from the database when first used, and
+        # only need to be updated if they existed before this update.
+        for label, task_update in runtimes:
+            if label in models:
+                models[label].update(
+                    task_update.units_processed,
+                    task_update.events_read,
+                    self.__task_bytes(label, task_update.id),
+                    task_update.time_epilogue_end - task_update.time_stage_in_end)
+
     def update_workflow_stats_stuck(self, roots=None):
         """Update workflow statistics after increasing thresholds.
 
@@ -570,14 +882,168 @@ class UnitStore:
             self.db.executemany(
                 "update workflows set taskruntime=? where label=?", updates)
 
+    def __task_bytes(self, label, task):
+        """Estimate the input size of a task from the units it processed.
+        """
+        return self.db.execute("""
+            select ifnull(sum(files_{0}.bytes * 1. / nullif(files_{0}.units, 0)), 0)
+            from units_{0}, files_{0}
+            where units_{0}.task=? and units_{0}.file=files_{0}.id""".format(label), (task,)).fetchone()[0]
+
+    def runtime_model(self, label):
+        """Get the runtime model of a workflow.
+
+        The model is initialized from the most recent successful tasks of
+        the workflow when first requested, and updated with every task
+        returned afterwards.
+
+        Parameters
+        ----------
+            label : str
+                The label of the workflow.
+
+        Returns
+        -------
+            model : RuntimeModel
+                The runtime model of the workflow.
+        """
+        if label not in self.__models:
+            model = RuntimeModel()
+            rows = self.db.execute("""
+                select
+                    units_processed,
+                    events_read,
+                    ifnull((
+                        select sum(files_{0}.bytes * 1. / nullif(files_{0}.units, 0))
+                        from units_{0}, files_{0}
+                        where units_{0}.task=tasks.id and units_{0}.file=files_{0}.id
+                    ), 0),
+                    time_epilogue_end - time_stage_in_end
+                from tasks
+                where workflow=(select id from workflows where label=?) and status in (2, 6, 7, 8) and type=0
+                order by id desc
+                limit 500""".format(label), (label,)).fetchall()
+            for units, events, bytes, runtime in reversed(rows):
+                model.update(units, events, bytes, runtime)
+            self.__models[label] = model
+        return self.__models[label]
+
+    def __category(self, label):
+        """Returns the category of a workflow, or its label for workflows
+        missing from the configuration.
+        """
+        try:
+            return getattr(self.config.workflows, label).category.name
+        except AttributeError:
+            return label
+
+    def survival_model(self, category):
+        """Get the survival model of the tasks of a category.
+
+        The model is initialized from the most recent tasks of the
+        workflows in the category, and updated with every task returned.
+
+        Parameters
+        ----------
+            category : str
+                The name of the category.
+
+        Returns
+        -------
+            model : SurvivalModel
+                The survival model of the category.
+        """
+        if category not in self.__survival:
+            model = SurvivalModel()
+            labels = [l for (l,) in self.db.execute("select label from workflows") if self.__category(l) == category]
+            rows = self.db.execute("""
+                select time_on_worker, evictions, time_total_until_worker_failure
+                from tasks
+                where workflow in (select id from workflows where label in ({0})) and status in (2, 3, 6, 7, 8) and type=0
+                order by id desc
+                limit 1000""".format(', '.join('?' for _ in labels)), labels).fetchall()
+            for runtime, evictions, lost in reversed(rows):
+                model.update(runtime, evictions, lost)
+            self.__survival[category] = model
+        return self.__survival[category]
+
+    def update_eviction_scale(self, label, size, unitcost, overhead):
+        """Scale the task size of a workflow to maximize the goodput, the
+        fraction of the runtime spent processing units, when workers are
+        evicted.  Smaller tasks lose less runtime to evictions, but more
+        to the overhead of each task.  The task size is never increased.
+
+        Parameters
+        ----------
+            label : str
+                The label of the workflow.
+            size : int
+                The task size of the workflow.
+            unitcost : float
+                The runtime of a unit, in seconds.
+            overhead : float
+                The runtime of a task without units, in seconds, excluding
+                the time the task spends on the worker outside of
+                processing.
+        """
+        model = self.survival_model(self.__category(label))
+        if not model.ready or not unitcost or not size:
+            return
+
+        id, scale, setup = self.db.execute("""
+            select id, evictionscale, ifnull((
+                select avg(max(time_on_worker - (time_epilogue_end - time_stage_in_end), 0))
+                from tasks
+                where workflow=workflows.id and status in (2, 6, 7, 8) and type=0
+            ), 0)
+            from workflows where label=?""", (label,)).fetchone()
+        overhead += setup
+
+        # prefer larger tasks where the gain in goodput is negligible
+        goodput = [model.goodput(n * unitcost, overhead) for n in range(1, size + 1)]
+        best = max(n for n, g in enumerate(goodput, 1) if g >= .99 * max(goodput))
+        if abs(best - scale * size) > .05 * scale * size:
+            logger.info("adjusting task size for {0} from {1} to {2} to limit the runtime lost to evictions".format(
+                label, int(math.ceil(scale * size)), best))
+            scale = best / float(size)
+        loss = model.loss(math.ceil(scale * size) * unitcost + overhead)
+        logger.debug("expected loss of runtime to evictions for {0}: {1:.1%}".format(label, loss))
+
+        self.db.execute("update workflows set evictionscale=?, evictionloss=? where id=?", (scale, loss, id))
+
+    def eviction_estimates(self):
+        """Returns the task size scale and expected fraction of the
+        runtime lost to evictions of all workflows.
+        """
+        return self.db.execute("select label, evictionscale, evictionloss from workflows").fetchall()
+
     def update_workflow_stats(self, label):
         id, size, targettime = self.db.execute(
             "select id, tasksize, taskruntime from workflows where label=?", (label,)).fetchone()
 
-        if targettime is not None:
-            # Adjust tasksize based on time spend in prologue, processing, and
-            # epilogue.  Only do so when difference is > 10%
-            tasks, unittime = self.db.execute("""
+        # Estimate the runtime of an average unit, based on the runtime
+        # model, or the time spend in prologue, processing, and epilogue
+        # until enough tasks are available to build a runtime model.
+        # Adjust tasksize based on this estimate when a target runtime is
+        # set, and only do so when the difference is > 5%
+        model = self.runtime_model(label) if targettime is not None else None
+        unittime = None
+        unitcost = None
+        overhead = 0.
+        bettersize = None
+        if model and model.ready:
+            units, events, bytes = self.db.execute("""
+                select max(ifnull(sum(units), 0), 1), ifnull(sum(events), 0), ifnull(sum(bytes), 0)
+                from files_{0}""".format(label)).fetchone()
+            unitcost = max(model.unit_cost(events * 1. / units, bytes * 1. / units), 1)
+            bettersize = max(1, int(math.ceil((targettime - model.overhead) / unitcost)))
+            unittime = unitcost + model.overhead / float(size)
+            overhead = model.overhead
+            logger.debug("runtime model for {}: {} (error: {})".format(
+                label, ", ".join("{}={:.3g}".format(k, v) for k, v in sorted(model.coefficients.items())),
+                model.error))
+        else:
+            tasks, average = self.db.execute("""
                 select
                     count(*),
                     max(
@@ -585,16 +1051,25 @@ class UnitStore:
                         1
                     )
                 from tasks where workflow=? and status in (2, 6, 7, 8) and type=0""", (id,)).fetchone()
+            if tasks > 0:
+                unittime = unitcost = average
+            if tasks > 10 and targettime is not None:
+                bettersize = max(1, int(math.ceil(targettime / average)))
+
+        if unittime is not None:
+            self.db.execute("update workflows set unittime=? where id=?", (unittime, id))
+
+        if bettersize:
+            logger.debug("newly calculated task size for {}: {} (old: {})".format(
+                label, bettersize, size))
+            if abs(float(bettersize - size) / size) > .05:
+                logger.info("adjusting task size for {0} from {1} to {2}".format(
+                    label, size, bettersize))
+                self.db.execute(
+                    "update workflows set tasksize=? where id=?", (bettersize, id))
+                size = bettersize
 
-            if tasks > 10:
-                bettersize = max(1, int(math.ceil(targettime / unittime)))
-                logger.debug("newly calculated task size for {}: {} (old: {})".format(
-                    label, bettersize, size))
-                if abs(float(bettersize - size) / size) > .05:
-                    logger.info("adjusting task size for {0} from {1} to {2}".format(
-                        label, size, bettersize))
-                    self.db.execute(
-                        "update workflows set tasksize=? where id=?", (bettersize, id))
+        self.update_eviction_scale(label, size, unitcost, overhead)
 
         parent_stuck = self.db.execute("""
             select
@@ -663,7 +1138,7 @@ class UnitStore:
 
     def estimate_tasks_left(self):
         rows = [ts for (ts,) in self.db.execute("""
-            select (units_available - units_running) * 1. / tasksize
+            select (units_available - units_running) * 1. / max(tasksize * evictionscale, 1)
             from workflows
             where units_left > 0""")]
         if len(rows) == 0:
@@ -683,6 +1158,22 @@ class UnitStore:
         cur = self.db.execute("select sum(units_running) from workflows")
         return cur.fetchone()[0]
 
+    def workflow_units(self):
+        """Returns the unit accounting of all workflows.
+        """
+        return self.db.execute("""
+            select
+                label,
+                tasksize,
+                units,
+                units_masked,
+                units_running,
+                units_done,
+                units_stuck,
+                units_available,
+                units_left
+            from workflows""").fetchall()
+
     def workflow_info(self, label):
         cur = self.db.execute("""
             select
@@ -964,6 +1455,58 @@ class UnitStore:
             label), (self.config.advanced.threshold_for_failure,))
         return [xs[0] for xs in tasks]
 
+    def failure_summary(self):
+        """Summarize failed tasks by the class of their failure.
+
+        Returns
+        -------
+            summary : list
+                A list of tuples containing the failure class, the number
+                of failed tasks, and the core hours they used.
+        """
+        return self.db.execute("""
+            select
+                failure,
+                count(*),
+                sum(time_on_worker * max(allocated_cores, cores, 1)) / 3600.
+            from tasks
+            where status=3
+            group by failure""").fetchall()
+
+    def predicted_runtimes(self, ids):
+        """Return the predicted runtimes of tasks, in seconds, with the
+        task ids as keys.  Tasks without a prediction have a runtime of 0.
+        """
+        runtimes = {}
+        ids = list(ids)
+        for i in range(0, len(ids), 40):
+            chunk = ids[i:i + 40]
+            runtimes.update((str(id), runtime) for (id, runtime) in self.db.execute(
+                "select id, runtime_predicted from tasks where id in ({0})".format(', '.join('?' for _ in chunk)),
+                [int(id) for id in chunk]))
+        return runtimes
+
+    def deterministic_units(self, label):
+        """Summarize the units given up after deterministic failures.
+
+        Returns
+        -------
+            units : int
+                The number of units given up on, whose last task failed
+                deterministically.
+            hours : float
+                The mean core hours of the last attempt of these units,
+                divided by the units processed in that attempt.
+        """
+        units, hours = self.db.execute("""
+            select
+                count(*),
+                avg(tasks.time_on_worker * max(tasks.allocated_cores, tasks.cores, 1) * 1. / max(tasks.units, 1))
+            from units_{0} join tasks on tasks.id = units_{0}.task
+            where units_{0}.failed > ? and tasks.failure=?""".format(label),
+                                       (self.config.advanced.threshold_for_failure, failure.DETERMINISTIC)).fetchone()
+        return units, (hours or 0.) / 3600.
+
     def running_tasks(self):
         cur = self.db.execute("select id from tasks where status=1")
         for (v,) in cur:
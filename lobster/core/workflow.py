@@ -8,6 +8,7 @@ import shutil
 import sys
 
 from lobster import fs, util
+from lobster.core.sandbox import key as sandbox_key
 from lobster.core.dataset import EmptyDataset, MultiGridpackDataset, ParentMultiGridpackDataset, MultiProductionDataset, ProductionDataset
 from lobster.core.task import MergeTaskHandler, MultiGridpackTaskHandler, MultiProductionTaskHandler, ProductionTaskHandler, TaskHandler
 from lobster.util import Configurable
@@ -32,6 +33,8 @@ class Category(Configurable):
     * `tasks_min`
     * `tasks_max`
     * `runtime`
+    * `priority`
+    * `deadline`
 
     Parameters
     ----------
@@ -60,18 +63,32 @@ class Category(Configurable):
         runtime : int
             The runtime of the task in seconds.  Lobster will add a grace
             period to this time, and try to adjust the task size such that
-            this runtime is achieved.
+            this runtime is achieved.  After the first tasks have finished,
+            units are packed into tasks according to a runtime model of each
+            workflow, based on the units, events, and bytes processed.
         tasks_max : int
             How many tasks should be in the queue (running or waiting) at
             the same time.
         tasks_min : int
             The minimum of how many tasks should be in the queue (waiting)
             at the same time.
+        priority : float
+            The weight of the category when sharing the available cores
+            with other categories, relative to their remaining work.  A
+            category with priority 2 receives twice the share of a category
+            with priority 1 and the same amount of work left.
+        deadline : str
+            When the workflows of this category should be done, in local
+            time as `YYYY-MM-DD HH:MM`.  Lobster reserves enough cores for
+            the workflows to finish in time, based on an estimate of the
+            work left.  Can be overridden per workflow.
     """
     _mutable = {
         'tasks_max': (None, [], False),
         'tasks_min': (None, [], False),
-        'runtime': ('source.update_runtime', [], True)
+        'runtime': ('source.update_runtime', [], True),
+        'priority': (None, [], False),
+        'deadline': (None, [], False)
     }
 
     def __init__(self,
@@ -82,7 +99,9 @@ class Category(Configurable):
                  disk=None,
                  runtime=None,
                  tasks_max=None,
-                 tasks_min=None
+                 tasks_min=None,
+                 priority=1,
+                 deadline=None
                  ):
         self.name = name
         self.cores = cores
@@ -91,6 +110,9 @@ class Category(Configurable):
         self.disk = disk
         self.tasks_max = tasks_max
         self.tasks_min = tasks_min
+        self.priority = priority
+        self.deadline = deadline
+        util.parse_deadline(deadline)
 
         modes = {
             'fixed': wq.WORK_QUEUE_ALLOCATION_MODE_FIXED,
@@ -125,6 +147,11 @@ class Workflow(Configurable):
     """
     A specification for processing a dataset.
 
+    Attributes modifiable at runtime:
+
+    * `priority`
+    * `deadline`
+
     Parameters
     ----------
         label : str
@@ -198,8 +225,26 @@ class Workflow(Configurable):
 
             See the specification for the `command` parameter about passing
             input and output file values.
+        priority : float
+            The weight of the workflow when sharing the cores of its
+            category with other workflows, relative to their remaining
+            work.  Multiplies the priority of the category.
+        deadline : str
+            When the workflow should be done, in local time as `YYYY-MM-DD
+            HH:MM`.  Takes precedence over the deadline of the category.
+        bundle_size : int
+            How many tasks to run one after another in a single Work Queue
+            task, sharing the setup of the task wrapper.  Reduces the
+            overhead of very short tasks.  The resources of the category
+            apply to the whole bundle, so that bundles are limited to tasks
+            whose predicted runtimes add up to the runtime of the
+            category, if set.  No speculative copies are made of bundled
+            tasks.
         """
-    _mutable = {}
+    _mutable = {
+        'priority': (None, [], False),
+        'deadline': (None, [], False)
+    }
 
     def __init__(self,
                  label,
@@ -216,7 +261,10 @@ class Workflow(Configurable):
                  output_format="{base}_{id}.{ext}",
                  local=False,
                  globaltag=None,
-                 merge_command='cmsRun'):
+                 merge_command='cmsRun',
+                 priority=1,
+                 deadline=None,
+                 bundle_size=1):
         self.label = label
         if not re.match(r'^[A-Za-z][A-Za-z0-9_]*$', label):
             raise ValueError("Workflow label contains illegal characters: {}".format(label))
@@ -253,6 +301,11 @@ class Workflow(Configurable):
         self.merge_args = shlex.split(merge_command)
         self.merge_command = self.merge_args.pop(0)
 
+        self.priority = priority
+        self.deadline = deadline
+        util.parse_deadline(deadline)
+        self.bundle_size = bundle_size
+
         from lobster.cmssw.sandbox import Sandbox
         self.sandbox = sandbox or Sandbox()
 
@@ -449,10 +502,13 @@ class Workflow(Configurable):
 
         env['LOBSTER_CMSSW_VERSION'] = self.version
 
+        keys = []
         for box in self.sandboxes:
             # Remove the hash from the sandbox name
             cleaned = os.path.basename(box).rsplit('-', 1)[0] + '.tar.bz2'
             inputs.append((box, cleaned, True))
+            keys.append(sandbox_key(box))
+        env['LOBSTER_SANDBOX_KEYS'] = ' '.join(keys)
         if merge:
             inputs.append((os.path.join(os.path.dirname(__file__), 'data', 'merge_reports.py'), 'merge_reports.py', True))
             inputs.append((os.path.join(os.path.dirname(__file__), 'data', 'task.py'), 'task.py', True))
@@ -0,0 +1,183 @@
+import BaseHTTPServer
+import collections
+import logging
+import os
+import threading
+import time
+
+from lobster.util import Configurable, PartiallyMutable
+
+logger = logging.getLogger('lobster.monitor.metrics')
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Sample(object):
+
+    """A collection of metrics in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self.__metrics = collections.OrderedDict()
+
+    def add(self, name, value, labels=None, kind='gauge', doc=None):
+        if name not in self.__metrics:
+            self.__metrics[name] = (kind, doc, [])
+        self.__metrics[name][2].append((labels or {}, value))
+
+    def __str__(self):
+        lines = []
+        for name, (kind, doc, values) in self.__metrics.items():
+            if doc:
+                lines.append('# HELP {0} {1}'.format(name, doc))
+            lines.append('# TYPE {0} {1}'.format(name, kind))
+            for labels, value in values:
+                if labels:
+                    desc = ','.join('{0}="{1}"'.format(k, escape(v)) for k, v in sorted(labels.items()))
+                    lines.append('{0}{{{1}}} {2}'.format(name, desc, value))
+                else:
+                    lines.append('{0} {1}'.format(name, value))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter(Configurable):
+
+    """
+    Exports live metrics of the running Lobster instance in the
+    Prometheus text format.
+
+    The metrics are either served via HTTP from a thread separate from the
+    main loop, or written to a file to be picked up by the textfile
+    collector of the Prometheus node exporter, or both.
+
+    Parameters
+    ----------
+        port : int
+            The port to serve metrics on, at the path `/metrics`.  Set to
+            `None` to disable the HTTP server, or to `0` to pick any
+            available port.
+        host : str
+            The address to bind the HTTP server to.  Defaults to
+            `localhost`.
+        textfile : str
+            A file to write the metrics to after every iteration of the
+            main loop.  The file is replaced atomically.
+    """
+    _mutable = {}
+
+    def __init__(self, port=None, host='localhost', textfile=None):
+        self.port = port
+        self.host = host
+        self.textfile = os.path.expanduser(os.path.expandvars(textfile)) if textfile else None
+
+        self.__setup()
+
+    def __setup(self):
+        self.__lock = threading.Lock()
+        self.__update = threading.Event()
+        self.__halt = threading.Event()
+        self.__threads = []
+        self.__server = None
+        self.__content = ''
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for key in ('lock', 'update', 'halt', 'threads', 'server', 'content'):
+            del state['_MetricsExporter__' + key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        with PartiallyMutable.unlock():
+            self.__setup()
+
+    @property
+    def content(self):
+        with self.__lock:
+            return self.__content
+
+    @property
+    def address(self):
+        """The address the HTTP server is bound to, if running.
+        """
+        if self.__server:
+            return self.__server.server_address
+
+    def start(self):
+        """Start the HTTP server and textfile writer threads, as configured.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                content = exporter.content
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, fmt, *args):
+                logger.debug(fmt % args)
+
+        with PartiallyMutable.unlock():
+            if self.port is not None:
+                self.__server = BaseHTTPServer.HTTPServer((self.host, self.port), Handler)
+                logger.info("serving metrics at http://{0}:{1}/metrics".format(*self.__server.server_address))
+                self.__threads.append(threading.Thread(target=self.__server.serve_forever, name='metrics-http'))
+            if self.textfile:
+                logger.info("writing metrics to {0}".format(self.textfile))
+                self.__threads.append(threading.Thread(target=self.__write, name='metrics-textfile'))
+            self.__update.clear()
+            self.__halt.clear()
+
+        for thread in self.__threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        with PartiallyMutable.unlock():
+            if self.__server:
+                self.__server.shutdown()
+                self.__server.server_close()
+                self.__server = None
+            self.__halt.set()
+            self.__update.set()
+            for thread in self.__threads:
+                thread.join()
+            self.__threads = []
+
+    def __write(self):
+        while not self.__halt.is_set():
+            self.__update.wait()
+            self.__update.clear()
+            if self.__halt.is_set():
+                break
+            tmpfile = self.textfile + '.tmp'
+            try:
+                with open(tmpfile, 'w') as f:
+                    f.write(self.content)
+                os.rename(tmpfile, self.textfile)
+            except (IOError, OSError) as e:
+                logger.error("failed to write metrics to {0}: {1}".format(self.textfile, e))
+
+    def publish(self, sample):
+        """Replace the metrics served with the contents of `sample`.
+
+        Parameters
+        ----------
+            sample : Sample
+                The metrics to export.
+        """
+        sample.add('lobster_metrics_timestamp_seconds', int(time.time()),
+                   doc='Time the metrics were last updated.')
+        content = str(sample)
+        with self.__lock, PartiallyMutable.unlock():
+            self.__content = content
+        self.__update.set()
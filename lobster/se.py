@@ -503,6 +503,22 @@ class StorageConfiguration(Configurable):
             for the first successful one, which will then be used to access
             the remaining input files.  By using this setting, all input
             URLs will be attempted for all input files.
+        parallel_stage_in : int
+            How many input files a task stages in at the same time.
+        parallel_stage_out : int
+            How many output files a task stages out at the same time.
+        input_cache : int
+            How much disk space, in MB, workers may use to keep copies of
+            input files for other tasks.  Applies to input files copied to
+            the worker, not to files streamed or read from a local file
+            system.  Disabled by default.
+        prefetch_inputs : int
+            How much disk space, in MB, a task with streaming disabled may
+            use for input files copied before processing starts.  With
+            this set, processing starts as soon as the first input file is
+            copied, and the input files not copied by then, or exceeding
+            the disk space, are streamed via `XrootD` instead, if
+            available.  Disabled by default.
     """
     _mutable = {
         'input': ('config.storage.activate', [], False),
@@ -528,7 +544,11 @@ class StorageConfiguration(Configurable):
                  shuffle_inputs=False,
                  shuffle_outputs=False,
                  disable_input_streaming=False,
-                 disable_stage_in_acceleration=False):
+                 disable_stage_in_acceleration=False,
+                 parallel_stage_in=4,
+                 parallel_stage_out=4,
+                 input_cache=0,
+                 prefetch_inputs=0):
         if input is None:
             self.input = []
         else:
@@ -544,6 +564,10 @@ class StorageConfiguration(Configurable):
 
         self.disable_input_streaming = disable_input_streaming
         self.disable_stage_in_acceleration = disable_stage_in_acceleration
+        self.parallel_stage_in = parallel_stage_in
+        self.parallel_stage_out = parallel_stage_out
+        self.input_cache = input_cache
+        self.prefetch_inputs = prefetch_inputs
 
         logger.debug("using input location {0}".format(self.input))
         logger.debug("using output location {0}".format(self.output))
@@ -663,5 +687,9 @@ class StorageConfiguration(Configurable):
         parameters['input'] = self.input if not merge else self.output
         parameters['output'] = self.output
         parameters['disable streaming'] = self.disable_input_streaming
+        parameters['parallel stage-in'] = self.parallel_stage_in
+        parameters['parallel stage-out'] = self.parallel_stage_out
+        parameters['input cache'] = self.input_cache
+        parameters['prefetch inputs'] = self.prefetch_inputs
         if not self.disable_stage_in_acceleration:
             parameters['accelerate stage-in'] = 3
@@ -0,0 +1,579 @@
+"""Discrete-event simulation of the Lobster task scheduling.
+
+The simulation runs the task creation of Lobster, i.e., :class:`~lobster.core.Algo`
+and :class:`~lobster.core.unit.UnitStore`, against a simulated pool of
+workers in virtual time.  Workers join and leave the pool, get evicted,
+process units at different speeds, and tasks fail at random, when
+exceeding the wall time of their category, or when processing one of the
+poison units that never succeed.  Speculative copies, bundles of tasks,
+and the blacklisting of unhealthy hosts follow the policies of real
+projects in :mod:`lobster.core.policy`.  After all units have been
+processed, the simulation reports the makespan, core
+utilization, tail length, and queue depth, to compare scheduling policies
+without running a real project.
+"""
+from collections import defaultdict, deque
+import heapq
+import itertools
+import logging
+import random
+import shutil
+import tempfile
+import time
+
+from lobster.core import failure, policy, unit
+from lobster.core.create import Algo
+from lobster.core.health import HostHealth
+
+logger = logging.getLogger('lobster.sim')
+
+
+class Pool(object):
+
+    """A simulated pool of workers.
+
+    Parameters
+    ----------
+        workers : int
+            How many workers make up the pool.
+        cores : int
+            How many cores each worker has.
+        ramp : float
+            Time in seconds over which the workers join the pool
+            initially.
+        lifetime : float
+            Mean lifetime of a worker in seconds before it is evicted, or
+            `None` for workers to stay until the end.  Lifetimes are
+            exponentially distributed.
+        rejoin : float
+            Time in seconds after which an evicted worker is replaced.
+        speed_spread : float
+            Standard deviation of the logarithm of the relative worker
+            speed.
+        failure_rate : float
+            The fraction of tasks that fail, e.g., due to problems with
+            the infrastructure.
+        black_holes : float
+            The fraction of workers that fail every task within seconds,
+            e.g., due to a broken software installation.
+    """
+
+    def __init__(self, workers=100, cores=4, ramp=600., lifetime=None, rejoin=300.,
+                 speed_spread=0., failure_rate=0., black_holes=0.):
+        self.workers = workers
+        self.cores = cores
+        self.ramp = ramp
+        self.lifetime = lifetime
+        self.rejoin = rejoin
+        self.speed_spread = speed_spread
+        self.failure_rate = failure_rate
+        self.black_holes = black_holes
+
+
+class Runtime(object):
+
+    """Runtime distribution of units.
+
+    The runtime of a unit is drawn from a log-normal distribution.  If the
+    number of events per unit is known, the mean scales with the events.
+
+    Parameters
+    ----------
+        unit_time : float
+            Mean runtime of a unit in seconds.
+        event_time : float
+            Mean runtime per event in seconds.  If set, takes precedence
+            over `unit_time` for units with known events.
+        spread : float
+            Standard deviation of the logarithm of the unit runtime.
+        overhead : float
+            Constant runtime of each task in seconds, e.g., for setup and
+            stage-in, spent before processing the units.
+        poison : float
+            The fraction of units that make every task containing them
+            fail, e.g., due to corrupted input.
+    """
+
+    def __init__(self, unit_time=60., event_time=None, spread=0., overhead=0., poison=0.):
+        self.unit_time = unit_time
+        self.event_time = event_time
+        self.spread = spread
+        self.overhead = overhead
+        self.poison = poison
+
+    def sample(self, rng, events):
+        mean = self.event_time * events if self.event_time and events > 0 else self.unit_time
+        # Shift the log-normal distribution to preserve the mean
+        return mean * rng.lognormvariate(-self.spread ** 2 / 2., self.spread)
+
+
+class Worker(object):
+
+    def __init__(self, id, cores, speed, broken=False):
+        self.id = id
+        self.cores = cores
+        self.free = cores
+        self.speed = speed
+        self.broken = broken
+        self.joined = None
+        self.blacklisted = None
+        self.tasks = set()
+
+
+class Task(object):
+
+    def __init__(self, id, label, category, cores, units, priority=0, wall_time=None):
+        self.id = id
+        self.label = label
+        self.category = category
+        self.cores = cores
+        self.priority = priority
+        self.wall_time = wall_time
+        # list of (unit id, file id, events)
+        self.units = units
+        self.worker = None
+        self.start = None
+        self.end = None
+        self.failed = False
+        self.exhausted = False
+        self.poisoned = False
+        self.broken = False
+        self.attempts = 0
+        # attempts lost to evictions, and their runtime
+        self.evictions = 0
+        self.lost = 0.
+        # tasks run one after another in this one, if a bundle
+        self.parts = []
+
+
+class _Config(object):
+
+    """Proxy of the configuration, with the working directory replaced.
+    """
+
+    def __init__(self, config, workdir):
+        self.__config = config
+        self.workdir = workdir
+
+    def __getattr__(self, attr):
+        return getattr(self.__config, attr)
+
+
+class Simulation(object):
+
+    """Simulate processing the workflows of a configuration.
+
+    Parameters
+    ----------
+        config : Config
+            The Lobster configuration to simulate.  Merging and dependent
+            workflows are not simulated.
+        pool : Pool
+            The worker pool.
+        runtime : Runtime or dict
+            The unit runtime distribution, or a dictionary with workflow
+            labels as keys and distributions as values.
+        interval : float
+            The time between iterations of the Lobster main loop.
+        algo : type
+            The task creation algorithm to use, for comparison with
+            :class:`~lobster.core.Algo`.
+        datasets : dict
+            Dataset information to use instead of querying the datasets
+            of the workflows, with workflow labels as keys.
+        seed : int
+            Seed for the random number generator.
+        start : float
+            The time at which the simulation starts, in seconds since the
+            epoch, to compare deadlines of workflows with.  Defaults to
+            the current time.
+    """
+
+    def __init__(self, config, pool=None, runtime=None, interval=60., algo=Algo, datasets=None, seed=None,
+                 start=None):
+        self.pool = pool or Pool()
+        self.runtime = runtime or Runtime()
+        self.interval = interval
+        self.rng = random.Random(seed)
+
+        self.workdir = tempfile.mkdtemp(prefix='lobster_sim_')
+        self.config = _Config(config, self.workdir)
+        self.workflows = [w for w in config.workflows if not w.parent]
+        if len(self.workflows) < len(config.workflows):
+            logger.warning("not simulating dependent workflows")
+
+        self.store = unit.UnitStore(self.config)
+        self.algo = algo(self.config)
+        self.events = {}
+        self.poison = set()
+        for wflow in self.workflows:
+            info = (datasets or {}).get(wflow.label) or wflow.dataset.get_info()
+            self.store.register_dataset(wflow, info, wflow.category.runtime)
+            self.events[wflow.label] = dict(
+                self.store.db.execute(
+                    "select id, ifnull(events, 0) * 1. / max(units, 1) from files_{0}".format(wflow.label)))
+            poison = self.__distribution(wflow.label).poison
+            if poison:
+                for (id,) in self.store.db.execute("select id from units_{0}".format(wflow.label)):
+                    if self.rng.random() < poison:
+                        self.poison.add((wflow.label, id))
+
+        self.start = time.time() if start is None else start
+        self.now = 0.
+        self.__events = []
+        self.__sequence = itertools.count()
+        self.__ids = itertools.count()
+        self.workers = {}
+        self.waiting = deque()
+        self.finished = []
+        # tasks waiting or running, by id
+        self.active = {}
+
+        self.health = HostHealth()
+
+        self.stats = defaultdict(int)
+        self.__busy = 0.
+        self.__provisioned = 0.
+        self.__last = 0.
+        self.__depth = []
+        self.__last_waiting = 0.
+        self.__finished = {}
+
+    def cleanup(self):
+        self.store.disconnect()
+        shutil.rmtree(self.workdir)
+
+    def schedule(self, when, action, *args):
+        heapq.heappush(self.__events, (when, next(self.__sequence), action, args))
+
+    def __account(self):
+        """Integrate used and available cores up to the current time.
+        """
+        dt = self.now - self.__last
+        for worker in self.workers.values():
+            self.__provisioned += dt * worker.cores
+            self.__busy += dt * (worker.cores - worker.free)
+        self.__last = self.now
+
+    def join(self):
+        speed = self.rng.lognormvariate(0, self.pool.speed_spread) if self.pool.speed_spread else 1.
+        broken = self.pool.black_holes > 0 and self.rng.random() < self.pool.black_holes
+        worker = Worker(next(self.__ids), self.pool.cores, speed, broken)
+        worker.joined = self.now
+        self.workers[worker.id] = worker
+        self.stats['workers joined'] += 1
+        if self.pool.lifetime:
+            self.schedule(self.now + self.rng.expovariate(1. / self.pool.lifetime), self.evict, worker)
+        self.dispatch()
+
+    def evict(self, worker):
+        del self.workers[worker.id]
+        self.stats['workers evicted'] += 1
+        for task in worker.tasks:
+            # Work Queue resubmits tasks of evicted workers transparently
+            task.evictions += 1
+            task.lost += self.now - task.start
+            task.worker = None
+            task.end = None
+            self.stats['tasks evicted'] += 1
+            self.waiting.appendleft(task)
+        worker.tasks = set()
+        self.prioritize()
+        self.schedule(self.now + self.pool.rejoin, self.join)
+        self.dispatch()
+
+    def finish(self, task, worker):
+        if task.worker is not worker or task.end != self.now:
+            # evicted in the meantime
+            return
+        worker.tasks.remove(task)
+        worker.free += task.cores
+        del self.active[task.id]
+        for part in self.__unbundle(task):
+            part.failed = part.exhausted or part.poisoned or part.broken or self.rng.random() < self.pool.failure_rate
+            self.finished.append(part)
+        self.dispatch()
+
+    def __unbundle(self, task):
+        """Return the tasks run in a task, with the time spent on the worker
+        divided evenly between them, like `TaskProvider.unbundle` does.
+        """
+        if not task.parts:
+            return [task]
+        share = (task.end - task.start) / len(task.parts)
+        for i, part in enumerate(task.parts):
+            part.worker = task.worker
+            part.start = task.start + i * share
+            part.end = part.start + share
+            part.broken = task.broken
+            part.exhausted = task.exhausted
+            part.evictions = task.evictions
+            part.lost = task.lost / len(task.parts)
+        return task.parts
+
+    def cancel(self, id):
+        """Remove a waiting or running task, like `WorkQueue` does when a
+        speculative copy finished first.
+        """
+        task = self.active.pop(id, None)
+        if task is None:
+            # finished at the same time
+            return
+        if task.worker:
+            task.worker.tasks.remove(task)
+            task.worker.free += task.cores
+            task.worker = None
+        else:
+            self.waiting.remove(task)
+        self.stats['tasks cancelled'] += 1
+
+    def prioritize(self):
+        """Order waiting tasks by priority, like `WorkQueue` does.
+        """
+        self.waiting = deque(sorted(self.waiting, key=lambda t: -t.priority))
+
+    def dispatch(self):
+        """Assign waiting tasks to workers with free cores, by priority,
+        and first come, first served within the same priority.
+        """
+        workers = sorted((w for w in self.workers.values() if not w.blacklisted or w.blacklisted <= self.now),
+                         key=lambda w: -w.free)
+        skipped = deque()
+        while self.waiting and workers:
+            task = self.waiting.popleft()
+            for worker in workers:
+                if worker.free >= task.cores:
+                    break
+            else:
+                skipped.append(task)
+                continue
+
+            runtime = self.__runtime(task) / worker.speed
+            task.broken = worker.broken
+            task.exhausted = not task.broken and task.wall_time is not None and runtime > task.wall_time
+            if task.broken:
+                runtime = 10.
+            elif task.exhausted:
+                # Work Queue kills tasks exceeding their wall time
+                runtime = task.wall_time
+            worker.free -= task.cores
+            worker.tasks.add(task)
+            task.worker = worker
+            task.start = self.now
+            task.end = self.now + runtime
+            task.attempts += 1
+            self.schedule(task.end, self.finish, task, worker)
+            workers = [w for w in workers if w.free > 0]
+        self.waiting.extendleft(reversed(skipped))
+
+    def __distribution(self, label):
+        return self.runtime.get(label, Runtime()) if isinstance(self.runtime, dict) else self.runtime
+
+    def __runtime(self, task):
+        dist = self.__distribution(task.label)
+        return dist.overhead + sum(dist.sample(self.rng, events) for _, _, events in task.units)
+
+    def obtain(self):
+        """Create tasks, following `TaskProvider.obtain`.
+        """
+        have = dict((w.category.name, {'running': 0, 'queued': 0}) for w in self.workflows)
+        for task in self.waiting:
+            have[task.category]['queued'] += 1
+        for worker in self.workers.values():
+            for task in worker.tasks:
+                have[task.category]['running'] += 1
+
+        total = sum(w.cores for w in self.workers.values())
+        remaining = dict((w, self.store.work_left(w.label)) for w in self.workflows)
+
+        taskinfos = []
+        for label, ntasks, taper in self.algo.run(total, have, remaining, now=self.start + self.now):
+            taskinfos += self.store.pop_units(label, ntasks, taper)
+
+        if len(taskinfos) == 0 and self.config.advanced.speculation:
+            taskinfos = policy.speculate(self.config, self.store, total, have)
+            self.stats['tasks speculative'] += len(taskinfos)
+
+        for group in policy.bundle(self.config, self.store, taskinfos):
+            self.__enqueue(group)
+
+        if taskinfos:
+            self.prioritize()
+        self.stats['tasks created'] += len(taskinfos)
+        return len(taskinfos)
+
+    def __enqueue(self, infos):
+        """Queue tasks, running them in a bundle if more than one.
+        """
+        parts = []
+        for (id, label, files, units, arg, merge) in infos:
+            wflow = getattr(self.config.workflows, label)
+            events = self.events[label]
+            wall_time = wflow.category.wq().get('wall_time')
+            if wall_time:
+                wall_time /= 10. ** 6
+            task = Task(id, label, wflow.category.name, wflow.category.cores or 1,
+                        [(u, f, events.get(f, 0)) for (u, f, r, l) in units], self.algo.priority(wflow), wall_time)
+            task.poisoned = any((label, u) in self.poison for (u, _, _, _) in units)
+            parts.append(task)
+
+        task = parts[0]
+        if len(parts) > 1:
+            # the resources of the category apply to the whole bundle, and
+            # the overhead is shared
+            task = Task('+'.join(p.id for p in parts), task.label, task.category, task.cores,
+                        [u for p in parts for u in p.units], task.priority, task.wall_time)
+            task.parts = parts
+            self.stats['tasks bundled'] += len(parts)
+        self.active[task.id] = task
+        self.waiting.append(task)
+
+    def release(self):
+        """Return finished tasks to the unit store, following
+        `TaskProvider.release`.
+        """
+        update = defaultdict(list)
+        for task in self.finished:
+            files = defaultdict(int)
+            for _, fid, events in task.units:
+                files[fid] += events
+            status = unit.FAILED if task.failed else unit.SUCCESSFUL
+            exit_code = 0
+            if task.broken:
+                exit_code = 65
+            elif task.exhausted:
+                exit_code = 10030
+            elif task.poisoned:
+                exit_code = 8001
+            elif task.failed:
+                exit_code = 10001
+            kind = failure.UNCLASSIFIED
+            if task.failed:
+                # poisoned tasks as classified from the fatal exception in
+                # the log
+                kind = failure.DETERMINISTIC if exit_code == 8001 else failure.classify(exit_code)
+            task_update = unit.TaskUpdate(
+                id=task.id,
+                status=status,
+                units_processed=0 if task.failed else len(task.units),
+                events_read=0 if task.failed else int(sum(files.values())),
+                exit_code=exit_code,
+                failure=kind,
+                host='worker{0}'.format(task.worker.id),
+                cores=task.cores,
+                time_submit=int(task.start),
+                time_stage_in_end=int(task.start + min(self.__distribution(task.label).overhead, task.end - task.start)),
+                time_epilogue_end=int(task.end),
+                time_retrieved=int(self.now),
+                time_on_worker=int(task.end - task.start),
+                time_total_on_worker=int(task.end - task.start + task.lost),
+                time_total_until_worker_failure=int(task.lost),
+                evictions=task.evictions)
+            file_update = [(0 if task.failed else int(events), 0, fid) for fid, events in files.items()]
+            failed, file_update, unit_update, other = policy.resolve(
+                self.store, task.label, task.id, task.failed, task_update, file_update, [])
+            if other:
+                self.cancel(other)
+            policy.record(self.health, (task.label, 'units_' + task.label), failed, task_update)
+            update[(task.label, 'units_' + task.label)].append((task_update, file_update, unit_update))
+            if task_update.status == unit.ABORTED:
+                self.stats['tasks superseded'] += 1
+            elif task.exhausted:
+                self.stats['tasks exhausted'] += 1
+            else:
+                self.stats['tasks failed' if task.failed else 'tasks successful'] += 1
+        self.finished = []
+        self.check_hosts(update)
+        if update:
+            self.store.update_units(update)
+
+    def check_hosts(self, update):
+        """Blacklist unhealthy workers, following `TaskProvider.check_hosts`.
+        """
+        timeout = self.config.advanced.blacklist_timeout
+        for host in policy.check_hosts(self.health, update, self.now, timeout):
+            worker = self.workers.get(int(host[len('worker'):]))
+            if worker:
+                worker.blacklisted = self.now + timeout
+            self.stats['workers blacklisted'] += 1
+            if worker and worker.broken:
+                self.stats['workers blacklisted broken'] += 1
+
+    def iterate(self):
+        """One iteration of the Lobster main loop.
+        """
+        self.release()
+        for label, in self.store.db.execute(
+                "select label from workflows where units_done + units_stuck + units_masked >= units"):
+            self.__finished.setdefault(label, self.now)
+        self.obtain()
+        self.dispatch()
+        if self.waiting:
+            self.__last_waiting = self.now
+        self.__depth.append(len(self.waiting))
+
+        running = sum(len(w.tasks) for w in self.workers.values())
+        if self.store.unfinished_units() > 0 or running > 0 or self.finished:
+            self.schedule(self.now + self.interval, self.iterate)
+        else:
+            self.__done = self.now
+
+    def run(self, until=None):
+        """Run the simulation.
+
+        Parameters
+        ----------
+            until : float
+                Maximum time to simulate, in seconds.
+
+        Returns
+        -------
+            report : dict
+                Statistics of the simulated processing.
+        """
+        self.__done = None
+        for i in range(self.pool.workers):
+            self.schedule(self.pool.ramp * i / max(1, self.pool.workers), self.join)
+        self.schedule(0., self.iterate)
+
+        while self.__events and self.__done is None:
+            when, _, action, args = heapq.heappop(self.__events)
+            if until and when > until:
+                logger.warning("stopping simulation after {0} s".format(until))
+                break
+            self.now = when
+            self.__account()
+            action(*args)
+
+        return self.report()
+
+    def report(self):
+        units = self.store.db.execute("select sum(units), sum(units_done), sum(units_stuck) from workflows").fetchone()
+        depth = self.__depth or [0]
+        report = {
+            'makespan': self.now,
+            'utilization': self.__busy / self.__provisioned if self.__provisioned else 0.,
+            'tail': self.now - self.__last_waiting,
+            'queue depth mean': sum(depth) / float(len(depth)),
+            'queue depth max': max(depth),
+            'units': units[0],
+            'units done': units[1],
+            'units stuck': units[2],
+            'complete': self.__done is not None
+        }
+        for label, when in self.__finished.items():
+            report['finished ' + label] = when
+        report.update(self.stats)
+        return report
+
+    @staticmethod
+    def format(report):
+        lines = []
+        for key in sorted(report):
+            value = report[key]
+            if key in ('makespan', 'tail') or key.startswith('finished '):
+                value = "{0:.0f} s ({1:.1f} h)".format(value, value / 3600.)
+            elif isinstance(value, float):
+                value = "{0:.3f}".format(value)
+            lines.append("{0:<20} {1}".format(key, value))
+        return "\n".join(lines)
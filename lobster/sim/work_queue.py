@@ -0,0 +1,493 @@
+"""A pure-Python stand-in for the `work_queue` module of cctools.
+
+Implements the subset of the `WorkQueue` and `Task` API used by the Lobster
+master.  Tasks are not executed: each submitted task occupies a simulated
+core for a configurable latency, and returns with a configurable failure
+rate and result codes.  For every successful output named `report.json`, a
+synthetic task report is written, so that the returned tasks can be
+processed by the task handlers of Lobster.
+
+Use :func:`setup` to configure the behavior of queues created afterwards,
+and :func:`patch` to have Lobster use this module instead of the real
+`work_queue`.
+"""
+from contextlib import contextmanager
+import collections
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+WORK_QUEUE_DEFAULT_PORT = 9123
+WORK_QUEUE_RANDOM_PORT = 0
+
+WORK_QUEUE_NOCACHE = 0
+WORK_QUEUE_CACHE = 1
+
+WORK_QUEUE_SCHEDULE_UNSET = 0
+WORK_QUEUE_SCHEDULE_FCFS = 1
+WORK_QUEUE_SCHEDULE_FILES = 2
+WORK_QUEUE_SCHEDULE_TIME = 3
+WORK_QUEUE_SCHEDULE_RAND = 4
+WORK_QUEUE_SCHEDULE_WORST = 5
+
+WORK_QUEUE_ALLOCATION_MODE_FIXED = 0
+WORK_QUEUE_ALLOCATION_MODE_MAX = 1
+WORK_QUEUE_ALLOCATION_MODE_MIN_WASTE = 2
+WORK_QUEUE_ALLOCATION_MODE_MAX_THROUGHPUT = 3
+
+WORK_QUEUE_RESULT_SUCCESS = 0
+WORK_QUEUE_RESULT_INPUT_MISSING = 1
+WORK_QUEUE_RESULT_OUTPUT_MISSING = 2
+WORK_QUEUE_RESULT_STDOUT_MISSING = 4
+WORK_QUEUE_RESULT_SIGNAL = 8
+WORK_QUEUE_RESULT_RESOURCE_EXHAUSTION = 16
+WORK_QUEUE_RESULT_TASK_TIMEOUT = 32
+WORK_QUEUE_RESULT_UNKNOWN = 64
+WORK_QUEUE_RESULT_FORSAKEN = 128
+WORK_QUEUE_RESULT_MAX_RETRIES = 256
+WORK_QUEUE_RESULT_TASK_MAX_RUN_TIME = 512
+
+WORK_QUEUE_TASK_UNKNOWN = 0
+WORK_QUEUE_TASK_READY = 1
+WORK_QUEUE_TASK_RUNNING = 2
+WORK_QUEUE_TASK_WAITING_RETRIEVAL = 3
+WORK_QUEUE_TASK_RETRIEVED = 4
+WORK_QUEUE_TASK_DONE = 5
+WORK_QUEUE_TASK_CANCELED = 6
+
+_settings = {
+    'cores': 100,
+    'latency': 0.,
+    'failure_rate': 0.,
+    'failures': [(1, WORK_QUEUE_RESULT_SUCCESS)],
+    'seed': None
+}
+
+
+def setup(cores=100, latency=0., failure_rate=0., failures=None, seed=None):
+    """Configure the behavior of queues created afterwards.
+
+    Parameters
+    ----------
+        cores : int
+            How many cores the simulated pool provides.
+        latency : float or function
+            The time a task occupies a core, in seconds, or a function
+            without arguments returning the time.
+        failure_rate : float
+            The fraction of tasks that fail.
+        failures : list
+            A list of tuples with the exit code of the task and the
+            `WorkQueue` result code, one of which is picked at random for
+            failed tasks.
+        seed : int
+            Seed for the random number generator.
+    """
+    _settings.update(
+        cores=cores,
+        latency=latency,
+        failure_rate=failure_rate,
+        failures=failures or [(1, WORK_QUEUE_RESULT_SUCCESS)],
+        seed=seed
+    )
+
+
+@contextmanager
+def patch(*modules):
+    """Replace the `work_queue` module used by `modules` with this one.
+    """
+    this = sys.modules[__name__]
+    previous = [getattr(m, 'wq') for m in modules]
+    for m in modules:
+        m.wq = this
+    try:
+        yield this
+    finally:
+        for m, p in zip(modules, previous):
+            m.wq = p
+
+
+def cctools_debug_flags_set(flags):
+    pass
+
+
+def cctools_debug_config_file(fn):
+    pass
+
+
+def cctools_debug_config_file_size(size):
+    pass
+
+
+class work_queue_stats(object):
+    workers_connected = 0
+    workers_init = 0
+    workers_idle = 0
+    workers_busy = 0
+    workers_able = 0
+    workers_ready = 0
+    workers_joined = 0
+    workers_removed = 0
+    workers_released = 0
+    workers_idled_out = 0
+    workers_fast_aborted = 0
+    workers_blacklisted = 0
+    workers_lost = 0
+    tasks_waiting = 0
+    tasks_on_workers = 0
+    tasks_running = 0
+    tasks_with_results = 0
+    tasks_submitted = 0
+    tasks_dispatched = 0
+    tasks_done = 0
+    tasks_failed = 0
+    tasks_cancelled = 0
+    tasks_exhausted_attempts = 0
+    time_when_started = 0
+    time_send = 0
+    time_receive = 0
+    time_send_good = 0
+    time_receive_good = 0
+    time_status_msgs = 0
+    time_internal = 0
+    time_polling = 0
+    time_application = 0
+    time_workers_execute = 0
+    time_workers_execute_good = 0
+    time_workers_execute_exhaustion = 0
+    bytes_sent = 0
+    bytes_received = 0
+    bandwidth = 0
+    total_cores = 0
+    total_memory = 0
+    total_disk = 0
+    committed_cores = 0
+    committed_memory = 0
+    committed_disk = 0
+
+
+class Resources(object):
+
+    def __init__(self, cores=1, memory=0, disk=0):
+        self.cores = cores
+        self.memory = memory
+        self.disk = disk
+        self.total_files = 0
+        self.swap_memory = 0
+        self.virtual_memory = 0
+        self.bandwidth = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.limits_exceeded = collections.namedtuple('Limits', 'wall_time memory disk')(0, 0, 0)
+
+
+class Task(object):
+
+    def __init__(self, command):
+        self.command = command
+        self.category = 'default'
+        self.tag = None
+        self.env = {}
+        self.inputs = []
+        self.outputs = []
+        self.end_time = None
+        self.priority = 0
+
+        self.return_status = None
+        self.result = None
+        self.output = ''
+        self.hostname = None
+        self.total_bytes_received = 0
+        self.total_bytes_sent = 0
+        self.submit_time = 0
+        self.send_input_start = 0
+        self.send_input_finish = 0
+        self.receive_output_start = 0
+        self.receive_output_finish = 0
+        self.finish_time = 0
+        self.cmd_execution_time = 0
+        self.total_cmd_execution_time = 0
+        self.total_cmd_exhausted_execute_time = 0
+        self.exhausted_attempts = 0
+        self.total_time_until_worker_failure = 0
+        self.total_submissions = 0
+        self.resources_allocated = None
+        self.resources_measured = None
+
+    def specify_category(self, category):
+        self.category = category
+
+    def specify_tag(self, tag):
+        self.tag = tag
+
+    def specify_max_retries(self, retries):
+        pass
+
+    def specify_monitor_output(self, path):
+        pass
+
+    def specify_environment_variable(self, name, value):
+        self.env[name] = value
+
+    def specify_input_file(self, local, remote=None, flags=WORK_QUEUE_CACHE):
+        self.inputs.append((local, remote))
+
+    def specify_output_file(self, local, remote=None, flags=WORK_QUEUE_NOCACHE):
+        self.outputs.append((local, remote))
+
+    def specify_end_time(self, microseconds):
+        self.end_time = microseconds
+
+    def specify_priority(self, priority):
+        self.priority = priority
+
+
+def report(task, start, end, exit_code, taskdir=''):
+    """Create a synthetic task report, based on the task parameters.  For
+    bundled tasks, `taskdir` is the directory of the task in the bundle.
+    """
+    parameters = {}
+    for local, remote in task.inputs:
+        if remote == os.path.join(taskdir, 'parameters.json'):
+            with open(local) as f:
+                parameters = json.load(f)
+
+    mask = parameters.get('mask', {})
+    lumis = []
+    for run, ranges in (mask.get('lumis') or {}).items():
+        for first, last in ranges:
+            lumis += [(int(run), lumi) for lumi in range(first, last + 1)]
+
+    return {
+        'cache': {'type': 2, 'sandbox': 2, 'start_size': 0, 'end_size': 0},
+        'cpu_time': end - start,
+        'events_written': 0,
+        'exe_exit_code': exit_code,
+        'files': {
+            'info': dict((fn, (0, lumis)) for fn in mask.get('files') or []),
+            'output_info': dict(
+                (fn, {'runs': {-1: [-1]}, 'events': 0, 'adler32': '0'}) for fn, _ in parameters.get('output files', [])
+            ),
+            'skipped': []
+        },
+        'output_bare_size': 0,
+        'output_size': 0,
+        'stageout_exit_code': 0,
+        'task_exit_code': exit_code,
+        'task_timing': dict(
+            [(k, int(start)) for k in ('wrapper_start', 'wrapper_ready', 'stage_in_end', 'prologue_end')] +
+            [(k, int(end)) for k in ('processing_end', 'epilogue_end', 'stage_out_end')]
+        ),
+        'transfers': {}
+    }
+
+
+class WorkQueue(object):
+
+    def __init__(self, port=WORK_QUEUE_DEFAULT_PORT, name=None, shutdown=False):
+        self.port = port
+        self.name = name
+        self.stats = work_queue_stats()
+        self.stats.time_when_started = int(time.time() * 1e6)
+
+        self._task_table = {}
+        self.__cores = _settings['cores']
+        self.__latency = _settings['latency']
+        self.__failure_rate = _settings['failure_rate']
+        self.__failures = _settings['failures']
+        self.__random = random.Random(_settings['seed'])
+
+        self.__ids = itertools.count(1)
+        # heap of (-priority, id, task): higher priorities first, then
+        # first come, first served
+        self.__waiting = []
+        self.__running = []
+        self.__done = collections.deque()
+        self.__categories = collections.defaultdict(work_queue_stats)
+        self.__blacklist = set()
+
+    def specify_min_taskid(self, taskid):
+        self.__ids = itertools.count(taskid)
+
+    def specify_log(self, fn):
+        pass
+
+    def specify_transactions_log(self, fn):
+        pass
+
+    def specify_name(self, name):
+        self.name = name
+
+    def specify_keepalive_timeout(self, timeout):
+        pass
+
+    def tune(self, name, value):
+        pass
+
+    def specify_algorithm(self, algorithm):
+        pass
+
+    def enable_monitoring(self, dirname=None):
+        pass
+
+    def enable_monitoring_full(self, dirname=None):
+        pass
+
+    def specify_category_mode(self, category, mode):
+        pass
+
+    def specify_category_max_resources(self, category, resources):
+        pass
+
+    def specify_category_first_allocation_guess(self, category, resources):
+        pass
+
+    def activate_fast_abort(self, multiplier):
+        pass
+
+    def activate_fast_abort_category(self, category, multiplier):
+        pass
+
+    def specify_num_tasks_left(self, ntasks):
+        pass
+
+    def blacklist(self, host):
+        self.__blacklist.add(host)
+        self.stats.workers_blacklisted = len(self.__blacklist)
+
+    def blacklist_with_timeout(self, host, timeout):
+        self.blacklist(host)
+
+    def __latency_of(self, task):
+        if callable(self.__latency):
+            return self.__latency()
+        return self.__latency
+
+    def __update(self, now):
+        while self.__running and self.__running[0][0] <= now:
+            end, _, task = heapq.heappop(self.__running)
+            self.__finish(task, end)
+            self.__done.append(task)
+
+        while self.__waiting and len(self.__running) < self.__cores:
+            _, _, task = heapq.heappop(self.__waiting)
+            task.send_input_start = task.send_input_finish = int(now * 1e6)
+            task.hostname = 'worker{0}.sim'.format(self.__random.randint(1, max(1, self.__cores)))
+            heapq.heappush(self.__running, (now + self.__latency_of(task), task.id, task))
+
+        for stats in [self.stats] + self.__categories.values():
+            stats.tasks_running = 0
+            stats.tasks_waiting = 0
+        for _, _, task in self.__running:
+            self.__categories[task.category].tasks_running += 1
+        for _, _, task in self.__waiting:
+            self.__categories[task.category].tasks_waiting += 1
+
+        self.stats.tasks_running = len(self.__running)
+        self.stats.tasks_on_workers = len(self.__running)
+        self.stats.tasks_waiting = len(self.__waiting)
+        self.stats.tasks_with_results = len(self.__done)
+        self.stats.total_cores = self.__cores
+        self.stats.committed_cores = len(self.__running)
+        self.stats.workers_connected = self.__cores
+        self.stats.workers_busy = len(self.__running)
+        self.stats.workers_idle = self.__cores - len(self.__running)
+        self.stats.workers_ready = self.stats.workers_idle
+        self.stats.workers_able = self.__cores
+
+    def __finish(self, task, end):
+        start = task.send_input_finish / 1e6
+        if self.__random.random() < self.__failure_rate:
+            task.return_status, task.result = self.__random.choice(self.__failures)
+            self.stats.tasks_failed += 1
+        else:
+            task.return_status, task.result = 0, WORK_QUEUE_RESULT_SUCCESS
+        self.stats.tasks_done += 1
+        self.stats.time_workers_execute += int((end - start) * 1e6)
+        if task.return_status == 0:
+            self.stats.time_workers_execute_good += int((end - start) * 1e6)
+
+        task.cmd_execution_time = task.total_cmd_execution_time = int((end - start) * 1e6)
+        task.receive_output_start = task.receive_output_finish = task.finish_time = int(end * 1e6)
+        task.resources_allocated = Resources()
+        task.resources_measured = Resources()
+
+        if task.result == WORK_QUEUE_RESULT_SUCCESS:
+            reports = [(local, os.path.dirname(remote)) for local, remote in task.outputs
+                       if os.path.basename(remote) == 'report.json' and os.path.isdir(os.path.dirname(local))]
+            # the tasks of a bundle run one after another
+            step = (end - start) / max(len(reports), 1)
+            for n, (local, taskdir) in enumerate(reports):
+                with open(local, 'w') as f:
+                    json.dump(report(task, start + n * step, start + (n + 1) * step, task.return_status, taskdir), f)
+
+    def submit(self, task):
+        task.id = next(self.__ids)
+        if task.tag is None:
+            task.tag = str(task.id)
+        task.submit_time = int(time.time() * 1e6)
+        task.total_submissions += 1
+        self._task_table[task.id] = task
+        heapq.heappush(self.__waiting, (-task.priority, task.id, task))
+        self.stats.tasks_submitted += 1
+        self.__update(time.time())
+        return task.id
+
+    def cancel_by_tasktag(self, tag):
+        for queue in (self.__waiting, self.__running):
+            for entry in queue:
+                if entry[2].tag == tag:
+                    queue.remove(entry)
+                    heapq.heapify(queue)
+                    return self.__cancel(entry[2])
+        for task in self.__done:
+            if task.tag == tag:
+                self.__done.remove(task)
+                return self.__cancel(task)
+        return None
+
+    def __cancel(self, task):
+        del self._task_table[task.id]
+        self.stats.tasks_cancelled += 1
+        self.__update(time.time())
+        return task
+
+    def empty(self):
+        return not (self.__waiting or self.__running or self.__done)
+
+    def wait(self, timeout=5):
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            self.__update(now)
+            if self.__done:
+                task = self.__done.popleft()
+                del self._task_table[task.id]
+                self.__update(now)
+                return task
+            if not self.__running or now >= deadline:
+                return None
+            time.sleep(max(0, min(deadline, self.__running[0][0]) - now))
+
+    def task_state(self, taskid):
+        task = self._task_table.get(taskid)
+        if task is None:
+            return WORK_QUEUE_TASK_UNKNOWN
+        elif any(t is task for _, _, t in self.__waiting):
+            return WORK_QUEUE_TASK_READY
+        elif task in self.__done:
+            return WORK_QUEUE_TASK_WAITING_RETRIEVAL
+        return WORK_QUEUE_TASK_RUNNING
+
+    @property
+    def stats_hierarchy(self):
+        self.__update(time.time())
+        return self.stats
+
+    def stats_category(self, category):
+        self.__update(time.time())
+        return self.__categories[category]
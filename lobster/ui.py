@@ -53,9 +53,9 @@ def boil():
         except Exception as e:
             parser.error("the configuration '{0}' is not valid: {1}".format(args.checkpoint, e))
 
-        if util.checkpoint(cfg.workdir, 'version'):
+        if util.checkpoints(cfg.workdir).get('version'):
             cfg = config.Config.load(cfg.workdir)
-        elif args.plugin.__class__.__name__.lower() == 'process':
+        elif args.plugin.__class__.__name__.lower() in ('process', 'bench', 'simulate'):
             # This is the original configuration file!
             with util.PartiallyMutable.unlock():
                 cfg.base_directory = os.path.abspath(os.path.dirname(args.checkpoint))
@@ -337,6 +337,26 @@ def findpath(dirs, path):
     raise KeyError("Can't find '{0}' in {1}".format(path, dirs))
 
 
+def parse_deadline(deadline):
+    """Convert a deadline into seconds since the epoch.
+
+    Parameters
+    ----------
+        deadline : str, int, or float
+            The deadline in local time, as a string of the form
+            `YYYY-MM-DD HH:MM` or `YYYY-MM-DD` (midnight), or as seconds
+            since the epoch.  `None` is passed through.
+    """
+    if deadline is None or isinstance(deadline, (int, float)):
+        return deadline
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return time.mktime(time.strptime(deadline, fmt))
+        except (TypeError, ValueError):
+            pass
+    raise ValueError("malformed deadline '{0}', expected 'YYYY-MM-DD HH:MM'".format(deadline))
+
+
 def which(name):
     paths = os.getenv('PATH')
     for path in paths.split(os.path.pathsep):
@@ -354,7 +374,7 @@ def verify(workdir):
     major, head, status = my_version.split('-')
     my_version = major
 
-    stored_version = checkpoint(workdir, 'version')
+    stored_version = checkpoints(workdir).get('version')
     major, head, status = stored_version.split('-')
     stored_version = major
 
@@ -363,27 +383,103 @@ def verify(workdir):
             my_version, stored_version))
 
 
-def checkpoint(workdir, key):
-    statusfile = os.path.join(workdir, 'status.json')
-    if os.path.exists(statusfile):
-        with open(statusfile, 'r') as f:
-            s = json.load(f)
-            return s.get(key)
+class CheckpointStore(object):
 
+    """
+    Cached access to the checkpoints of a project.
+
+    Checkpoints are stored in the file `status.json` in the working
+    directory.  Its contents are cached and only read again when the
+    inode, modification time, or size of the file change.  Updates are
+    written to a temporary file first, which then atomically replaces the
+    status file, so that a crash can not leave a partially written file
+    behind.
+
+    Flags are represented by the presence of a file in the working
+    directory, and can be checked for with a single `stat`.
+
+    Parameters
+    ----------
+        workdir : str
+            The working directory of the project.
+    """
 
-def register_checkpoint(workdir, key, value):
-    statusfile = os.path.join(workdir, 'status.json')
-    if not os.path.exists(statusfile):
-        with open(statusfile, 'w') as f:
-            json.dump({key: value}, f)
-            f.write('\n')
-    else:
-        with open(statusfile, 'r') as f:
-            s = json.load(f)
-            s[key] = value
-        with open(statusfile, 'w') as f:
-            json.dump(s, f, sort_keys=True, indent=4)
+    def __init__(self, workdir):
+        self.__workdir = workdir
+        self.__path = os.path.join(workdir, 'status.json')
+        self.__signature = None
+        self.__data = {}
+
+    def __stat(self):
+        try:
+            info = os.stat(self.__path)
+        except OSError:
+            return None
+        return (info.st_ino, info.st_mtime, info.st_size)
+
+    def __refresh(self):
+        signature = self.__stat()
+        if signature is None:
+            self.__data = {}
+        elif signature != self.__signature:
+            with open(self.__path, 'r') as f:
+                self.__data = json.load(f)
+        self.__signature = signature
+
+    def get(self, key, default=None):
+        """Returns the value of the checkpoint `key`, or `default` if not
+        set.
+        """
+        self.__refresh()
+        return self.__data.get(key, default)
+
+    def set(self, key, value):
+        """Sets the checkpoint `key` to `value` and saves all checkpoints.
+        """
+        self.__refresh()
+        data = dict(self.__data)
+        data[key] = value
+
+        tmpfile = '{0}.{1}.tmp'.format(self.__path, os.getpid())
+        with open(tmpfile, 'w') as f:
+            json.dump(data, f, sort_keys=True, indent=4)
             f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmpfile, self.__path)
+
+        self.__data = data
+        self.__signature = self.__stat()
+
+    def __flag(self, key):
+        return os.path.join(self.__workdir, '{0}.flag'.format(key.lower().replace(' ', '_')))
+
+    def flagged(self, key):
+        """Returns `True` if the flag `key` is raised.
+        """
+        return os.path.exists(self.__flag(key))
+
+    def raise_flag(self, key):
+        with open(self.__flag(key), 'a'):
+            pass
+
+    def lower_flag(self, key):
+        try:
+            os.unlink(self.__flag(key))
+        except OSError:
+            pass
+
+
+_checkpoint_stores = {}
+
+
+def checkpoints(workdir):
+    """Returns the shared :class:`CheckpointStore` for `workdir`.
+    """
+    path = os.path.abspath(workdir)
+    if path not in _checkpoint_stores:
+        _checkpoint_stores[path] = CheckpointStore(path)
+    return _checkpoint_stores[path]
 
 
 def sendemail(emailmsg, config):
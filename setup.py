@@ -17,7 +17,8 @@ setup(
         'lobster.core',
         'lobster.commands',
         'lobster.monitor',
-        'lobster.monitor.elk'
+        'lobster.monitor.elk',
+        'lobster.sim'
     ],
     package_data={'lobster': [
         'core/data/task.py',
@@ -653,6 +653,203 @@ class TestSQLBackend(object):
         assert ew == 100
         # }}}
 
+    def test_exhausted_split(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_exhausted_split', 4, 4))
+
+        (id, label, files, lumis, arg, _) = self.interface.pop_units('test_exhausted_split', 1)[0]
+        assert len(lumis) == 4
+
+        task_update = TaskUpdate(exit_code=10040, host='hostname', id=id, status=3)
+        self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+
+        tasks = self.interface.pop_units('test_exhausted_split', 1)
+        assert [len(lumis) for (_, _, _, lumis, _, _) in tasks] == [2]
+
+        (id, label, files, lumis, arg, _) = tasks[0]
+        task_update = TaskUpdate(exit_code=10030, host='hostname', id=id, status=3)
+        self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+
+        tasks = self.interface.pop_units('test_exhausted_split', 2)
+        assert [len(lumis) for (_, _, _, lumis, _, _) in tasks] == [1, 1]
+
+        (id, label, files, lumis, arg, _) = tasks[0]
+        task_update = TaskUpdate(exit_code=10050, host='hostname', id=id, status=3)
+        self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+
+        failed = self.interface.db.execute(
+            "select sum(failed), max(failed) from units_test_exhausted_split").fetchone()
+
+        assert failed == (1, 1)
+        # }}}
+
+    def test_eviction_scale(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_eviction_scale', 40, 20))
+
+        (id, label, files, lumis, arg, _) = self.interface.pop_units('test_eviction_scale', 1)[0]
+        assert len(lumis) == 20
+
+        # 60 s per unit and 300 s of setup, but workers are evicted after
+        # 600 s on average
+        task_update = TaskUpdate(host='hostname', id=id, status=2, units_processed=20,
+                                 time_stage_in_end=300, time_epilogue_end=1500,
+                                 time_on_worker=1500, time_total_on_worker=7500,
+                                 time_total_until_worker_failure=6000, evictions=10)
+        self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+
+        scale, loss = self.interface.db.execute(
+            "select evictionscale, evictionloss from workflows where label='test_eviction_scale'").fetchone()
+        assert abs(scale - 9 / 20.) < 1e-6
+        assert 0 < loss < .6
+
+        tasks = self.interface.pop_units('test_eviction_scale', 2)
+        assert [len(lumis) for (_, _, _, lumis, _, _) in tasks] == [9, 9]
+        # }}}
+
+    def test_poison_bisection(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_poison_bisection', 4, 4))
+
+        def fail(task, exit_code):
+            (id, label, files, lumis, arg, _) = task
+            task_update = TaskUpdate(exit_code=exit_code, host='hostname', id=id, status=3)
+            self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+
+        # infrastructure failures are retried at the same size, and not
+        # counted
+        fail(self.interface.pop_units('test_poison_bisection', 1)[0], 10001)
+        tasks = self.interface.pop_units('test_poison_bisection', 1)
+        assert [len(lumis) for (_, _, _, lumis, _, _) in tasks] == [4]
+
+        fail(tasks[0], 8001)
+        tasks = self.interface.pop_units('test_poison_bisection', 2)
+        assert [len(lumis) for (_, _, _, lumis, _, _) in tasks] == [2, 2]
+
+        (id, label, files, lumis, arg, _) = tasks[0]
+        task_update = TaskUpdate(host='hostname', id=id, status=2)
+        self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+        fail(tasks[1], 8001)
+
+        tasks = self.interface.pop_units('test_poison_bisection', 2)
+        assert [len(lumis) for (_, _, _, lumis, _, _) in tasks] == [1, 1]
+        fail(tasks[0], 8001)
+
+        failed = self.interface.db.execute(
+            "select failed from units_test_poison_bisection order by id").fetchall()
+
+        assert sorted(failed) == [(0,), (0,), (0,), (1,)]
+        # }}}
+
+    def test_failure_classes(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_failure_classes', 1, 1))
+
+        def fail(exit_code):
+            (id, label, files, lumis, arg, _) = self.interface.pop_units('test_failure_classes', 1)[0]
+            task_update = TaskUpdate(exit_code=exit_code, host='hostname', id=id, status=3)
+            self.interface.update_units({(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+            return self.interface.db.execute("select failed from units_test_failure_classes").fetchone()[0]
+
+        # transient failures are not counted, deterministic ones use up
+        # all but `threshold_for_deterministic_failure` attempts
+        assert fail(210) == 0
+        assert fail(10001) == 0
+        assert self.interface.db.execute("select transient from units_test_failure_classes").fetchone()[0] == 2
+        assert fail(65) == 1
+        assert fail(8006) == self.interface.config.advanced.threshold_for_failure - \
+            self.interface.config.advanced.threshold_for_deterministic_failure + 1
+        assert fail(8006) == self.interface.config.advanced.threshold_for_failure - \
+            self.interface.config.advanced.threshold_for_deterministic_failure + 2
+        assert self.interface.deterministic_units('test_failure_classes')[0] == 1
+        # }}}
+
+    def test_transient_budget(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_transient_budget', 1, 1))
+        advanced = self.interface.config.advanced
+        threshold = advanced.threshold_for_transient_failure
+        advanced.threshold_for_transient_failure = 2
+
+        try:
+            for _ in range(3):
+                (id, label, files, lumis, arg, _) = self.interface.pop_units('test_transient_budget', 1)[0]
+                task_update = TaskUpdate(exit_code=179, host='hostname', id=id, status=3)
+                self.interface.update_units(
+                    {(label, "units_" + label): [(task_update, [(0, 0, f) for (f, _) in files], [])]})
+        finally:
+            advanced.threshold_for_transient_failure = threshold
+
+        # units exceeding the transient budget are given up
+        assert self.interface.db.execute("select failed from units_test_transient_budget").fetchone()[0] == \
+            advanced.threshold_for_failure + 1
+        assert self.interface.pop_units('test_transient_budget', 1) == []
+        # }}}
+
+    def test_speculative_won(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_speculative_won', 3, 3))
+
+        assert self.interface.pop_speculative('test_speculative_won', 5) == []
+
+        (id, label, files, lumis, arg, _) = self.interface.pop_units('test_speculative_won', 1)[0]
+        copies = self.interface.pop_speculative('test_speculative_won', 5)
+        assert len(copies) == 1
+        (copy, _, copy_files, copy_lumis, _, _) = copies[0]
+        assert copy != id
+        assert sorted(copy_files) == sorted(files)
+        assert sorted(copy_lumis) == sorted(lumis)
+        assert self.interface.pop_speculative('test_speculative_won', 5) == []
+
+        assert self.interface.resolve_speculation(label, copy, False) == ('won', int(id))
+        assert self.interface.resolve_speculation(label, id, False) == ('lost', int(copy))
+
+        tasks = self.interface.db.execute(
+            "select distinct task from units_test_speculative_won").fetchall()
+        status = self.interface.db.execute("select status from tasks where id=?", (id,)).fetchone()[0]
+
+        assert tasks == [(int(copy),)]
+        assert status == 4
+        # }}}
+
+    def test_speculative_handover(self):
+        # {{{
+        self.interface.register_dataset(
+            *self.create_file_dataset(
+                'test_speculative_handover', 3, 3))
+
+        (id, label, files, lumis, arg, _) = self.interface.pop_units('test_speculative_handover', 1)[0]
+        (copy, _, _, _, _, _) = self.interface.pop_speculative('test_speculative_handover', 1)[0]
+
+        assert self.interface.resolve_speculation(label, id, True) == ('handover', int(copy))
+
+        task_update = TaskUpdate(exit_code=1234, host='hostname', id=id, status=3)
+        self.interface.update_units({(label, "units_" + label): [(task_update, [], [])]})
+
+        (jr, jd) = self.interface.db.execute(
+            "select units_running, units_done from workflows where label=?", (label,)).fetchone()
+        units = self.interface.db.execute(
+            "select distinct task, status, failed from units_test_speculative_handover").fetchall()
+
+        assert jr == 3
+        assert jd == 0
+        assert units == [(int(copy), 1, 0)]
+
+        assert self.interface.resolve_speculation(label, copy, False) == (None, int(id))
+        # }}}
+
 
 class TestCMSSWProvider(object):
 
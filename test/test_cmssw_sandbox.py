@@ -5,6 +5,7 @@ import tempfile
 import unittest
 
 import lobster.cmssw.sandbox
+import lobster.core.sandbox
 
 
 class TestSandbox(unittest.TestCase):
@@ -48,3 +49,14 @@ class TestSandbox(unittest.TestCase):
 
         assert version2 == version
         assert arch2 == arch
+
+    def test_key(self):
+        sandbox = lobster.cmssw.sandbox.Sandbox(release='data/sandbox/CMSSW_1_2_3')
+        version, arch, box = sandbox.package([os.path.dirname(__file__)], self.workdir)
+
+        key = lobster.core.sandbox.key(box)
+        assert key.startswith(os.path.basename(box)[:-len('.tar.bz2')] + '-')
+        assert lobster.core.sandbox.key(box) == key
+
+        os.utime(box, (0, 0))
+        assert lobster.core.sandbox.key(box) != key
@@ -0,0 +1,61 @@
+from lobster.core.create import Algo
+
+
+class Dummy(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TestAlgo(object):
+
+    def setup(self):
+        self.algo = Algo(Dummy(advanced=Dummy(payload=10)))
+        self.category = Dummy(name='processing', cores=1, priority=1, deadline=None, tasks_min=None, tasks_max=None)
+
+    def workflow(self, label, priority=1, deadline=None):
+        return Dummy(label=label, category=self.category, priority=priority, deadline=deadline)
+
+    def test_proportional(self):
+        a = self.workflow('a')
+        b = self.workflow('b')
+        remaining = {a: (True, 300, 300., None), b: (True, 100, 100., None)}
+        shares = self.algo.shares(100, {a: 300., b: 100.}, remaining, 0)
+        assert abs(shares[a] - 75) < 1e-6
+        assert abs(shares[b] - 25) < 1e-6
+
+        data = self.algo.run(100, {'processing': {'running': 0, 'queued': 0}}, remaining, 0)
+        assert sorted(label for label, n, taper in data) == ['a', 'b']
+
+    def test_priority(self):
+        a = self.workflow('a')
+        b = self.workflow('b', priority=3)
+        remaining = {a: (True, 300, 300., None), b: (True, 100, 100., None)}
+        shares = self.algo.shares(100, {a: 300., b: 100.}, remaining, 0)
+        assert abs(shares[a] - 50) < 1e-6
+        assert abs(shares[b] - 50) < 1e-6
+        assert self.algo.priority(b) == 3
+
+    def test_deadline(self):
+        a = self.workflow('a')
+        # 10 hours of work left for 5 hours until the deadline: the fair
+        # share suffices
+        b = self.workflow('b', deadline=5 * 3600)
+        remaining = {a: (True, 900, 900., None), b: (True, 100, 100., 10 * 3600.)}
+        shares = self.algo.shares(100, {a: 900., b: 100.}, remaining, 0)
+        assert abs(shares[b] - 10) < 1e-6
+        assert abs(shares[a] - 90) < 1e-6
+        assert self.algo.priority(b) == self.algo.priority(a)
+
+        # 10 hours of work left for half an hour until the deadline
+        shares = self.algo.shares(100, {a: 900., b: 100.}, remaining, 4.5 * 3600)
+        assert abs(shares[b] - 20) < 1e-6
+        assert abs(shares[a] - 80) < 1e-6
+        assert self.algo.priority(b) > self.algo.priority(a)
+
+        # overdue or unknown remaining work: as many cores as possible
+        shares = self.algo.shares(100, {a: 900., b: 100.}, remaining, 6 * 3600)
+        assert abs(shares[b] - 100) < 1e-6
+        remaining[b] = (True, 100, 100., None)
+        shares = self.algo.shares(100, {a: 900., b: 100.}, remaining, 0)
+        assert abs(shares[b] - 100) < 1e-6
@@ -1,7 +1,12 @@
+from collections import Counter, defaultdict
+import logging
 import os
+import shutil
 import sys
+import tempfile
 
-from mock import Mock
+from mock import Mock, patch
+from nose.tools import assert_raises
 
 sys.modules['ROOT'] = Mock()
 
@@ -24,3 +29,250 @@ class TestDiscovery(object):
     def test_xrootd_server(self):
         fn = os.path.join(os.path.dirname(__file__), 'data', 'siteconf', 'PhEDEx', 'storage.xml')
         assert task.find_xrootd_server(fn) == 'root://ndcms.crc.nd.edu/'
+
+
+class TestChecksum(object):
+
+    def test_adler32(self):
+        assert task.adler32(['Wiki', 'pedia']) == ('11e60398', 9)
+        assert task.adler32([]) == ('00000001', 0)
+
+
+class TestInputCache(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        task.logger = logging.getLogger('prawn')
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def write(self, name, size):
+        fn = os.path.join(self.workdir, name)
+        with open(fn, 'wb') as f:
+            f.write('x' * size)
+        return fn
+
+    def test_fetch(self):
+        cache = task.InputCache(os.path.join(self.workdir, 'cache'), 1)
+        target = os.path.join(self.workdir, 'target')
+
+        assert not cache.fetch('root://a/', '/store/foo.root', target)
+        cache.store('root://a/', '/store/foo.root', self.write('foo.root', 100))
+        assert cache.fetch('root://a', '/store/foo.root', target)
+        assert os.path.getsize(target) == 100
+        assert not cache.fetch('root://a/', '/store/bar.root', target + '2')
+        assert not cache.fetch('root://b/', '/store/foo.root', target + '3')
+
+    def test_size(self):
+        cache = task.InputCache(os.path.join(self.workdir, 'cache'), 1)
+        cache.store('root://a/', '/store/big.root', self.write('big.root', 1024 * 1024 + 1))
+        assert os.listdir(os.path.join(self.workdir, 'cache', 'files')) == []
+
+        cache.store('root://a/', '/store/foo.root', self.write('foo.root', 100))
+        blob = os.path.join(self.workdir, 'cache', 'files', os.listdir(os.path.join(self.workdir, 'cache', 'files'))[0])
+        with open(blob, 'ab') as f:
+            f.write('x')
+        assert not cache.fetch('root://a/', '/store/foo.root', os.path.join(self.workdir, 'target'))
+        assert not os.path.exists(os.path.join(self.workdir, 'target'))
+        assert os.listdir(os.path.join(self.workdir, 'cache', 'files')) == []
+
+    def test_eviction(self):
+        cache = task.InputCache(os.path.join(self.workdir, 'cache'), 1)
+        for i in range(2):
+            cache.store('root://a/', '/store/{0}.root'.format(i), self.write('{0}.root'.format(i), 400 * 1024 + i))
+        for fn in os.listdir(os.path.join(self.workdir, 'cache', 'files')):
+            os.utime(os.path.join(self.workdir, 'cache', 'files', fn), (0, 0))
+        cache.fetch('root://a/', '/store/0.root', os.path.join(self.workdir, 'target'))
+        cache.store('root://a/', '/store/2.root', self.write('2.root', 400 * 1024 + 2))
+
+        cached = [cache.fetch('root://a/', '/store/{0}.root'.format(i), os.path.join(self.workdir, 'out{0}'.format(i)))
+                  for i in range(3)]
+        assert cached == [True, False, True]
+
+
+class TestStaging(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.workdir)
+
+        task.logger = logging.getLogger('prawn')
+        task.mangler = task.Mangler()
+
+    def teardown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def test_parallel(self):
+        indir = os.path.join(self.workdir, 'input')
+        os.makedirs(indir)
+        files = ['file{0}.root'.format(i) for i in range(10)]
+        for fn in files:
+            open(os.path.join(indir, fn), 'w').close()
+
+        data = {
+            'files': {'stage_in': {}},
+            'task_timing': {},
+            'transfers': defaultdict(Counter)
+        }
+        config = {
+            'mask': {'files': files + ['missing.root']},
+            'input': ['file://' + indir],
+            'executable': 'foo',
+            'parallel stage-in': 4
+        }
+        with patch.object(task, 'find_xrootd_server', return_value='root://localhost/'):
+            task.copy_inputs(data, config, os.environ)
+
+        assert config['mask']['files'] == ['file:' + os.path.join(indir, fn) for fn in files]
+        assert config['file map']['file:' + os.path.join(indir, files[3])] == files[3]
+        assert data['transfers']['file']['stage-in success'] == 10
+        assert data['transfers']['file']['stage-in failure'] == 1
+        assert data['files']['stage_in']['missing.root']['input'] is None
+        assert data['files']['stage_in'][files[0]]['input'] == 'file://' + indir
+
+    def test_prefetch(self):
+        def run(args, **kwargs):
+            if 'xrdcp' in args:
+                with open(args[-1], 'w') as f:
+                    f.write('spam')
+            return Mock(returncode=0)
+
+        files = ['file{0}.root'.format(i) for i in range(3)]
+        data = {
+            'files': {'stage_in': {}},
+            'task_timing': {},
+            'transfers': defaultdict(Counter)
+        }
+        config = {
+            'mask': {'files': files},
+            'input': ['root://localhost//store'],
+            'executable': 'foo',
+            'disable streaming': True,
+            'parallel stage-in': 1,
+            'prefetch inputs': 1
+        }
+        with patch.object(task, 'find_xrootd_server', return_value='root://localhost/'):
+            with patch.object(task, 'run_subprocess', side_effect=run):
+                task.copy_inputs(data, config, os.environ)
+
+        assert config['mask']['files'] == ['file:' + files[0]] + ['root://localhost//store/' + fn for fn in files[1:]]
+        assert data['transfers']['xrdcp']['stage-in success'] == 1
+        assert data['transfers']['root']['stage-in success'] == 2
+
+    def test_parallel_stage_out(self):
+        outdir = os.path.join(self.workdir, 'output')
+        os.makedirs(outdir)
+        files = ['file{0}.root'.format(i) for i in range(5)]
+        for fn in files:
+            with open(fn, 'w') as f:
+                f.write('spam')
+
+        data = {
+            'exe_exit_code': 0,
+            'files': {'output_info': dict((fn, {}) for fn in files), 'stage_out': {}},
+            'task_timing': {},
+            'transfers': defaultdict(Counter)
+        }
+        config = {
+            'output files': [(fn, 'out_' + fn) for fn in files],
+            'output': ['file://' + outdir],
+            'default se': 'default',
+            'parallel stage-out': 3
+        }
+        with patch.object(task, 'get_bare_size', side_effect=IOError):
+            task.copy_outputs(data, config, os.environ)
+
+        assert sorted(os.listdir(outdir)) == ['out_' + fn for fn in files]
+        assert data['output_size'] == 20
+        assert data['transfers']['file']['stageout success'] == 5
+        assert data['files']['stage_out'][files[0]]['output'] == 'file://' + outdir
+        assert data['files']['output_info'][files[0]]['adler32'] == '044f01b2'
+
+    def test_stage_out_failure(self):
+        with open('spam.root', 'w') as f:
+            f.write('spam')
+
+        data = {
+            'exe_exit_code': 0,
+            'files': {'output_info': {}, 'stage_out': {}},
+            'task_timing': {},
+            'transfers': defaultdict(Counter)
+        }
+        config = {
+            'output files': [('spam.root', 'spam.root')],
+            'output': ['file://' + os.path.join(self.workdir, 'missing')],
+            'default se': 'default',
+            'parallel stage-out': 3
+        }
+        with patch.object(task, 'get_bare_size', side_effect=IOError):
+            assert_raises(SystemExit, task.copy_outputs, data, config, os.environ)
+        assert data['task_exit_code'] == 210
+        assert data['files']['stage_out']['spam.root']['output'] is None
+
+
+class TestPilot(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        os.chdir(self.workdir)
+
+        task.logger = logging.getLogger('prawn')
+        task.mangler = task.Mangler()
+
+    def teardown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def test_run(self):
+        for fn in ('report.json.in', 't_wrapper_start', 't_wrapper_ready'):
+            with open(fn, 'w') as f:
+                f.write('0\n')
+        configfiles = []
+        for name in ('a', 'b'):
+            os.mkdir(name)
+            configfiles.append(os.path.join(name, 'parameters.json'))
+            open(configfiles[-1], 'w').close()
+
+        taskdirs = []
+
+        def run(configfile):
+            taskdirs.append(os.getcwd())
+            assert configfile == 'parameters.json'
+            assert os.path.isfile('report.json.in')
+            raise SystemExit(185)
+
+        with patch.object(task, 'run_task', side_effect=run):
+            task.run_pilot(configfiles)
+
+        assert os.getcwd() == self.workdir
+        assert taskdirs == [os.path.join(self.workdir, name) for name in ('a', 'b')]
+        assert os.path.islink(os.path.join('a', 't_wrapper_start'))
+        assert not os.path.islink(os.path.join('b', 't_wrapper_start'))
+        assert not os.path.lexists(os.path.join('a', 'b'))
+        assert os.path.isfile(os.path.join('b', 'task.log'))
+
+    def test_exception(self):
+        configfiles = []
+        for name in ('a', 'b'):
+            os.mkdir(name)
+            configfiles.append(os.path.join(name, 'parameters.json'))
+            open(configfiles[-1], 'w').close()
+
+        taskdirs = []
+
+        def run(configfile):
+            taskdirs.append(os.getcwd())
+            if len(taskdirs) == 1:
+                raise IOError("no such file")
+
+        with patch.object(task, 'run_task', side_effect=run):
+            task.run_pilot(configfiles)
+
+        assert os.getcwd() == self.workdir
+        assert taskdirs == [os.path.join(self.workdir, name) for name in ('a', 'b')]
+        with open(os.path.join('a', 'task.log')) as f:
+            assert 'IOError' in f.read()
@@ -0,0 +1,27 @@
+from lobster.core import failure
+
+
+class TestClassify(object):
+
+    def test_exit_codes(self):
+        assert failure.classify(211) == failure.TRANSIENT
+        assert failure.classify(10020) == failure.TRANSIENT
+        assert failure.classify(10040) == failure.RESOURCES
+        assert failure.classify(8006) == failure.DETERMINISTIC
+        assert failure.classify(65) == failure.UNCLASSIFIED
+
+    def test_log(self):
+        log = """
+----- Begin Fatal Exception 01-Jan-2017 00:00:00 CET-----------------------
+An exception of category 'ProductNotFound' occurred while
+   [0] Processing run: 1 lumi: 2 event: 3
+Exception Message:
+Principal::getByToken: Found zero products matching all criteria
+----- End Fatal Exception -------------------------------------------------
+"""
+        assert failure.classify(8001, log) == failure.DETERMINISTIC
+        assert failure.classify(8001, log.replace('ProductNotFound', 'FileReadError')) == failure.TRANSIENT
+        assert failure.classify(8001, log.replace('ProductNotFound', 'Unknown')) == failure.UNCLASSIFIED
+        assert failure.classify(8001, "no exception") == failure.UNCLASSIFIED
+        # exit codes take precedence
+        assert failure.classify(211, log) == failure.TRANSIENT
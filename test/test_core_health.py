@@ -0,0 +1,53 @@
+from lobster.core.health import HostHealth, binomial_tail
+
+
+class TestHostHealth(object):
+
+    def setup(self):
+        self.health = HostHealth(window=20, minimum=5)
+
+    def fill(self, hosts, n, failed=False, exit_code=0, runtime=60.):
+        for host in hosts:
+            for _ in range(n):
+                self.health.record(host, 'a', failed, exit_code, runtime, 1)
+
+    def test_binomial_tail(self):
+        assert abs(binomial_tail(0, 10, .3) - 1.) < 1e-9
+        assert abs(binomial_tail(10, 10, .5) - .5 ** 10) < 1e-12
+
+    def test_black_hole(self):
+        self.fill(['good1', 'good2', 'good3'], 20)
+        self.fill(['good1'], 1, failed=True, exit_code=65)
+        self.fill(['bad'], 15, failed=True, exit_code=65)
+        unhealthy = self.health.diagnose(['good1', 'good2', 'good3', 'bad'])
+        assert unhealthy.keys() == ['bad']
+
+    def test_without_pool(self):
+        # no healthy hosts to compare with yet
+        self.fill(['bad1', 'bad2', 'bad3'], 20, failed=True, exit_code=65)
+        self.fill(['new'], 3, failed=True, exit_code=65)
+        unhealthy = self.health.diagnose(['bad1', 'bad2', 'bad3', 'new'])
+        assert sorted(unhealthy.keys()) == ['bad1', 'bad2', 'bad3']
+
+    def test_stage_in(self):
+        self.fill(['good1', 'good2', 'good3'], 20)
+        self.fill(['bad'], 10)
+        self.fill(['bad'], 10, failed=True, exit_code=179)
+        unhealthy = self.health.diagnose(['good1', 'good2', 'good3', 'bad'])
+        assert 'input' in unhealthy['bad']
+
+    def test_slow(self):
+        self.fill(['good1', 'good2', 'good3'], 20)
+        self.fill(['slow'], 10, runtime=300.)
+        self.fill(['good4'], 10, runtime=90.)
+        unhealthy = self.health.diagnose(['good1', 'good2', 'good3', 'good4', 'slow'])
+        assert unhealthy.keys() == ['slow']
+
+    def test_blacklist(self):
+        self.fill(['good1', 'good2', 'good3'], 20)
+        self.fill(['bad'], 15, failed=True, exit_code=65)
+        self.health.blacklist('bad', 100.)
+        assert self.health.blacklisted('bad', 50.)
+        assert not self.health.blacklisted('bad', 150.)
+        # judged afresh after the blacklisting expires
+        assert self.health.diagnose(['bad']) == {}
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+
+from lobster.core.locality import Locality
+
+
+class TestLocality(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        self.locality = Locality(os.path.join(self.workdir, 'locality'), size=2, window=2)
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_token(self):
+        local, remote, cache = self.locality.token('/store/foo.root')
+        assert cache
+        assert os.path.isfile(local)
+        assert os.path.getsize(local) > 0
+        assert self.locality.token('/store/foo.root') == (local, remote, cache)
+        assert self.locality.token('/store/bar.root')[1] != remote
+
+    def test_record(self):
+        assert not self.locality.record(['a'], 'host1')
+        assert not self.locality.record(['a'], 'host2')
+        assert self.locality.record(['a', 'b'], 'host1')
+        assert self.locality.hosts('a') == ['host1', 'host2']
+        assert abs(self.locality.hit_rate - 1. / 3) < 1e-9
+
+        self.locality.record(['a'], 'host3')
+        assert self.locality.hosts('a') == ['host3', 'host1']
+
+        self.locality.record(['c'], 'host1')
+        assert self.locality.hosts('b') == []
+        assert self.locality.hosts('a') == ['host3', 'host1']
@@ -0,0 +1,61 @@
+from mock import Mock
+
+from lobster.core import failure, policy, unit
+from lobster.core.health import HostHealth
+
+
+class TestPolicy(object):
+
+    def setup(self):
+        self.config = Mock()
+        self.config.workflows.a = Mock(bundle_size=1, category=Mock(runtime=None))
+        self.config.workflows.b = Mock(bundle_size=2, category=Mock(runtime=None))
+
+    def test_bundle(self):
+        infos = [(str(i), label, [], [], None, merge)
+                 for i, (label, merge) in enumerate([('b', False), ('a', False), ('b', True), ('b', False), ('b', False)])]
+        groups = policy.bundle(self.config, Mock(), infos)
+        assert [[id for (id, _, _, _, _, _) in group] for group in groups] == [['1'], ['2'], ['0', '3'], ['4']]
+
+    def test_bundle_runtime(self):
+        self.config.workflows.b = Mock(bundle_size=3, category=Mock(runtime=3600))
+        store = Mock()
+        store.predicted_runtimes.return_value = {'0': 1000, '1': 2000, '2': 1000, '3': 0, '4': 500}
+        infos = [(str(i), 'b', [], [], None, False) for i in range(6)]
+        groups = policy.bundle(self.config, store, infos)
+        # tasks without a prediction take up the whole runtime
+        assert [[id for (id, _, _, _, _, _) in group] for group in groups] == [['0', '1'], ['2'], ['3'], ['4'], ['5']]
+
+    def test_resolve(self):
+        store = Mock()
+        task_update = unit.TaskUpdate(status=unit.SUCCESSFUL)
+
+        store.resolve_speculation.return_value = ('won', 5)
+        assert policy.resolve(store, 'a', 1, False, task_update, ['f'], ['u']) == (False, ['f'], ['u'], '5')
+
+        store.resolve_speculation.return_value = ('lost', 5)
+        assert policy.resolve(store, 'a', 1, False, task_update, ['f'], ['u']) == (True, [], [], None)
+        assert task_update.status == unit.ABORTED
+
+    def test_check_hosts(self):
+        health = HostHealth(window=20, minimum=5)
+        for host in ('good1', 'good2', 'good3'):
+            for _ in range(20):
+                policy.record(health, 'a', False, unit.TaskUpdate(host=host, time_on_worker=60, units_processed=1))
+        updates = []
+        for _ in range(15):
+            task_update = unit.TaskUpdate(host='bad', status=unit.FAILED, exit_code=65, time_on_worker=10)
+            policy.record(health, 'a', True, task_update)
+            updates.append((task_update, [], []))
+        # failures caused by the units are not held against the host
+        policy.record(health, 'a', True, unit.TaskUpdate(host='good1', status=unit.FAILED, exit_code=8006,
+                                                         failure=failure.DETERMINISTIC, time_on_worker=60))
+
+        # failures caused by the units remain counted on blacklisted hosts
+        payload = unit.TaskUpdate(host='bad', status=unit.FAILED, exit_code=8006, failure=failure.DETERMINISTIC)
+
+        assert policy.check_hosts(health, {'a': updates}, 0., 0) == {}
+        assert policy.check_hosts(health, {'a': updates + [(payload, [], [])]}, 0., 3600).keys() == ['bad']
+        assert health.blacklisted('bad', 1.)
+        assert all(task_update.failure == failure.TRANSIENT for (task_update, _, _) in updates)
+        assert payload.failure == failure.DETERMINISTIC
@@ -0,0 +1,79 @@
+import math
+import random
+
+from lobster.core.runtime import RuntimeModel, SurvivalModel
+
+
+class TestRuntimeModel(object):
+
+    def test_not_ready(self):
+        model = RuntimeModel(minimum=10)
+        for i in range(9):
+            model.update(10, 1000, 1e8, 100)
+        assert not model.ready
+        model.update(10, 1000, 1e8, 100)
+        assert model.ready
+
+    def test_fit(self):
+        rng = random.Random(42)
+        model = RuntimeModel(decay=1., ridge=1e-9)
+        for i in range(200):
+            units = rng.randint(1, 20)
+            events = units * rng.randint(100, 5000)
+            bytes = events * rng.uniform(1e4, 2e4)
+            model.update(units, events, bytes, 60 + 2 * units + .05 * events + .1 * bytes / 1e6)
+        c = model.coefficients
+        assert abs(c['overhead'] - 60) < 1
+        assert abs(c['units'] - 2) < .1
+        assert abs(c['events'] - .05) < .001
+        assert abs(model.predict(10, 20000, 3e8) - (60 + 20 + 1000 + 30)) < 5
+        assert abs(model.unit_cost(2000, 3e7) - (2 + 100 + 3)) < 1
+        assert model.error < .01
+
+    def test_decay(self):
+        model = RuntimeModel(decay=.9)
+        for i in range(100):
+            model.update(10, 0, 0, 100)
+        for i in range(100):
+            model.update(10, 0, 0, 200)
+        assert abs(model.predict(10, 0, 0) - 200) < 1
+
+
+class TestSurvivalModel(object):
+
+    def simulate(self, model, rng, runtime, lifetime, tasks=2000):
+        # evictions of workers with exponentially distributed lifetimes
+        for i in range(tasks):
+            evictions = 0
+            lost = 0.
+            while True:
+                evicted = rng.expovariate(1. / lifetime)
+                if evicted >= runtime:
+                    break
+                evictions += 1
+                lost += evicted
+            model.update(runtime, evictions, lost)
+
+    def test_not_ready(self):
+        model = SurvivalModel(minimum=5)
+        model.update(3600, 4, 1000)
+        assert not model.ready
+        model.update(3600, 1, 1000)
+        assert model.ready
+
+    def test_hazard(self):
+        rng = random.Random(42)
+        model = SurvivalModel(decay=1.)
+        self.simulate(model, rng, 3 * 3600, 2 * 3600)
+        # completed attempts are censored, and must not bias the hazard
+        assert abs(model.hazard * 2 * 3600 - 1) < .05
+        assert abs(model.survival(3600) - math.exp(-.5)) < .02
+
+    def test_goodput(self):
+        rng = random.Random(42)
+        model = SurvivalModel(decay=1.)
+        self.simulate(model, rng, 3600, 2 * 3600)
+        assert model.goodput(3600) < model.goodput(1800)
+        # overhead penalizes short tasks
+        assert model.goodput(60, 300) < model.goodput(1800, 300)
+        assert model.loss(3 * 3600) > model.loss(3600) > 0
@@ -2,7 +2,7 @@ from collections import defaultdict, Counter
 import os
 import unittest
 
-from lobster.core.task import TaskHandler
+from lobster.core.task import BundledTask, TaskHandler
 from lobster.core.source import ReleaseSummary
 
 
@@ -36,3 +36,13 @@ class TestTask(unittest.TestCase):
                                  (1, 276), (1, 277), (1, 278), (1, 279), (1, 280)]
         assert outinfo.events == 4000
         assert outinfo.size == 15037503
+
+    def test_bundled(self):
+        task = DummyTask(tag='1+2')
+        task.cmd_execution_time = 120
+        task.output = 'wrapper output'
+        bundled = BundledTask(task, '2', 2, os.path.join(os.path.dirname(__file__), 'missing.log'))
+        assert bundled.tag == '2'
+        assert bundled.hostname == 'fake'
+        assert bundled.cmd_execution_time == 60
+        assert bundled.output == 'wrapper output'
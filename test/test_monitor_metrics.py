@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import time
+import urllib2
+
+from lobster.monitor.metrics import MetricsExporter, Sample
+
+
+class TestMetrics(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def sample(self):
+        sample = Sample()
+        sample.add('lobster_units_left', 10)
+        sample.add('lobster_workflow_units', 3, {'workflow': 'ttH', 'state': 'done'}, doc='Units per workflow.')
+        sample.add('lobster_workflow_units', 7, {'workflow': 'ttH', 'state': 'left'}, doc='Units per workflow.')
+        return sample
+
+    def test_format(self):
+        lines = str(self.sample()).splitlines()
+        assert lines == [
+            '# TYPE lobster_units_left gauge',
+            'lobster_units_left 10',
+            '# HELP lobster_workflow_units Units per workflow.',
+            '# TYPE lobster_workflow_units gauge',
+            'lobster_workflow_units{state="done",workflow="ttH"} 3',
+            'lobster_workflow_units{state="left",workflow="ttH"} 7'
+        ]
+
+    def test_scrape(self):
+        exporter = MetricsExporter(port=0)
+        exporter.start()
+        try:
+            exporter.publish(self.sample())
+            host, port = exporter.address
+            content = urllib2.urlopen('http://{0}:{1}/metrics'.format(host, port)).read()
+            assert 'lobster_units_left 10\n' in content
+            assert 'lobster_metrics_timestamp_seconds' in content
+        finally:
+            exporter.stop()
+
+    def test_textfile(self):
+        textfile = os.path.join(self.workdir, 'lobster.prom')
+        exporter = MetricsExporter(textfile=textfile)
+        exporter.start()
+        try:
+            exporter.publish(self.sample())
+            for _ in range(50):
+                if os.path.exists(textfile):
+                    break
+                time.sleep(.1)
+            with open(textfile) as f:
+                assert 'lobster_units_left 10\n' in f.read()
+        finally:
+            exporter.stop()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+
+from lobster import se
+from lobster.core.config import Config, AdvancedOptions
+from lobster.core.dataset import EmptyDataset
+from lobster.core.workflow import Category, Workflow
+from lobster.sim.simulator import Pool, Runtime, Simulation
+
+
+class TestSimulation(object):
+
+    def setup(self):
+        os.environ['LOCALRT'] = ''
+        self.workdir = tempfile.mkdtemp()
+        self.sims = []
+
+    def teardown(self):
+        for sim in self.sims:
+            sim.cleanup()
+        shutil.rmtree(self.workdir)
+
+    def simulate(self, tasks, pool, runtime, category=None, bundle_size=1, **kwargs):
+        config = Config(
+            label='test',
+            workdir=self.workdir,
+            storage=se.StorageConfiguration(output=['file://' + self.workdir]),
+            workflows=[
+                Workflow(
+                    label='sim',
+                    dataset=EmptyDataset(number_of_tasks=tasks),
+                    category=category or Category('processing', cores=1),
+                    command='true',
+                    bundle_size=bundle_size)
+            ],
+            advanced=AdvancedOptions(proxy=False, dashboard=False, osg_version="3.3")
+        )
+        sim = Simulation(config, pool, runtime, seed=1, **kwargs)
+        self.sims.append(sim)
+        return sim.run()
+
+    def test_complete(self):
+        report = self.simulate(100, Pool(workers=10, cores=2, ramp=0.), Runtime(unit_time=100.))
+        assert report['complete']
+        assert report['units done'] == 100
+        assert report['tasks successful'] == 100
+        assert report.get('tasks failed', 0) == 0
+        # 100 units of 100 s on 20 cores, with 60 s between iterations
+        assert 500 <= report['makespan'] <= 1000
+        assert 0 < report['utilization'] <= 1
+
+    def test_evictions(self):
+        report = self.simulate(100, Pool(workers=10, cores=2, ramp=0., lifetime=600., rejoin=60.,
+                                         failure_rate=.1),
+                               Runtime(unit_time=100., spread=.5))
+        assert report['complete']
+        assert report['units done'] == 100
+        assert report['workers evicted'] > 0
+        assert report['tasks failed'] > 0
+
+    def test_bundle_runtime(self):
+        # bundles must not exceed the wall time of their category
+        report = self.simulate(100, Pool(workers=10, cores=2, ramp=0.), Runtime(unit_time=1500.),
+                               category=Category('processing', cores=1, runtime=3600), bundle_size=4)
+        assert report['complete']
+        assert report['units done'] == 100
+        assert report.get('tasks exhausted', 0) == 0
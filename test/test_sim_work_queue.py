@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import tempfile
+
+from lobster.sim import work_queue as wq
+
+
+class TestWorkQueue(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+        wq.setup()
+
+    def task(self, tag):
+        params = os.path.join(self.workdir, tag + '.json')
+        with open(params, 'w') as f:
+            json.dump({'mask': {'files': ['a.root'], 'lumis': {'1': [[1, 3]]}}, 'output files': []}, f)
+        task = wq.Task('true')
+        task.specify_category('processing')
+        task.specify_tag(tag)
+        task.specify_input_file(params, 'parameters.json', wq.WORK_QUEUE_CACHE)
+        task.specify_output_file(os.path.join(self.workdir, tag + '.report'), 'report.json')
+        return task
+
+    def test_submit_wait(self):
+        wq.setup(cores=2, latency=0.01)
+        queue = wq.WorkQueue(0)
+        for i in range(5):
+            queue.submit(self.task(str(i)))
+        assert queue.stats.tasks_running == 2
+        assert queue.stats_category('processing').tasks_waiting == 3
+
+        tasks = []
+        while len(tasks) < 5:
+            task = queue.wait(1)
+            assert task is not None
+            tasks.append(task)
+        assert queue.wait(1) is None
+        assert sorted(t.tag for t in tasks) == ['0', '1', '2', '3', '4']
+        assert all(t.return_status == 0 for t in tasks)
+
+        with open(os.path.join(self.workdir, '0.report')) as f:
+            report = json.load(f)
+        assert report['files']['info']['a.root'][1] == [[1, 1], [1, 2], [1, 3]]
+
+    def test_failures(self):
+        wq.setup(cores=10, failure_rate=1., failures=[(0, wq.WORK_QUEUE_RESULT_TASK_TIMEOUT)])
+        queue = wq.WorkQueue(0)
+        queue.submit(self.task('0'))
+        task = queue.wait(1)
+        assert task.result == wq.WORK_QUEUE_RESULT_TASK_TIMEOUT
+        assert queue.stats_hierarchy.tasks_failed == 1
+        assert not os.path.exists(os.path.join(self.workdir, '0.report'))
+
+    def test_priority(self):
+        wq.setup(cores=1, latency=0.01)
+        queue = wq.WorkQueue(0)
+        for i, priority in enumerate([0, 0, 5, 1]):
+            task = self.task(str(i))
+            task.specify_priority(priority)
+            queue.submit(task)
+
+        order = []
+        while len(order) < 4:
+            order.append(queue.wait(1).tag)
+        assert order == ['0', '2', '3', '1']
+
+    def test_bundle(self):
+        wq.setup(cores=1, latency=0.01)
+        queue = wq.WorkQueue(0)
+        task = wq.Task('true')
+        for tag, lumi in (('0', 1), ('1', 2)):
+            params = os.path.join(self.workdir, tag + '.json')
+            with open(params, 'w') as f:
+                json.dump({'mask': {'files': ['a.root'], 'lumis': {'1': [[lumi, lumi]]}}, 'output files': []}, f)
+            task.specify_input_file(params, os.path.join(tag, 'parameters.json'), wq.WORK_QUEUE_CACHE)
+            task.specify_output_file(os.path.join(self.workdir, tag + '.report'), os.path.join(tag, 'report.json'))
+        queue.submit(task)
+        assert queue.wait(1) is task
+
+        reports = []
+        for tag in ('0', '1'):
+            with open(os.path.join(self.workdir, tag + '.report')) as f:
+                reports.append(json.load(f))
+        assert [r['files']['info']['a.root'][1] for r in reports] == [[[1, 1]], [[1, 2]]]
+        assert reports[0]['task_timing']['stage_out_end'] <= reports[1]['task_timing']['wrapper_start']
@@ -0,0 +1,62 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from nose.tools import raises
+
+from lobster.util import CheckpointStore, parse_deadline
+
+
+class TestCheckpoints(object):
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def test_roundtrip(self):
+        store = CheckpointStore(self.workdir)
+        assert store.get('version') is None
+        store.set('version', '1.9')
+        store.set('KILLED', 'PENDING')
+
+        other = CheckpointStore(self.workdir)
+        assert other.get('version') == '1.9'
+        assert other.get('KILLED') == 'PENDING'
+        assert os.listdir(self.workdir) == ['status.json']
+
+    def test_external_update(self):
+        store = CheckpointStore(self.workdir)
+        store.set('id', 'foo')
+        assert store.get('id') == 'foo'
+
+        CheckpointStore(self.workdir).set('KILLED', 'PENDING')
+        assert store.get('KILLED') == 'PENDING'
+
+        with open(os.path.join(self.workdir, 'status.json')) as f:
+            assert json.load(f) == {'id': 'foo', 'KILLED': 'PENDING'}
+
+    def test_flags(self):
+        store = CheckpointStore(self.workdir)
+        assert not store.flagged('KILLED')
+        store.raise_flag('KILLED')
+        assert CheckpointStore(self.workdir).flagged('KILLED')
+        store.lower_flag('KILLED')
+        store.lower_flag('KILLED')
+        assert not store.flagged('KILLED')
+
+
+class TestDeadline(object):
+
+    def test_parse(self):
+        assert parse_deadline(None) is None
+        assert parse_deadline(1234) == 1234
+        assert parse_deadline('2016-05-01 12:30') == time.mktime((2016, 5, 1, 12, 30, 0, 0, 0, -1))
+        assert parse_deadline('2016-05-01') == time.mktime((2016, 5, 1, 0, 0, 0, 0, 0, -1))
+
+    @raises(ValueError)
+    def test_malformed(self):
+        parse_deadline('friday')